@@ -0,0 +1,453 @@
+"""
+Benchmark harness for fRAGme.
+
+Runs the FastAPI app in-process with the hashing embedding backend and the
+fake completion backend, so the numbers measure fRAGme itself rather than the
+OpenAI API, and writes the results as JSON:
+
+* ``ingest_texts``: ``add_texts`` throughput per collection size.
+* ``ingest_pdfs``: ``add_pdfs`` throughput of synthetic PDFs.
+* ``get_texts`` and ``get_pdfs``: lookup latency per collection size.
+* ``retrieval``: ``build_question`` latency per k.
+* ``ask_question``: end-to-end p50/p95/p99 latency and throughput per
+  number of concurrent clients.
+
+Usage::
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --quick --compare results.json
+
+Answer and retrieval caches are disabled unless ``--with-caches`` is given,
+so repeated questions measure the full path. With ``--chroma-mode http`` the
+collections are stored on a local ``chroma run`` server standing in for a
+shared one.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+VOCABULARY = [
+    "pump", "valve", "sensor", "pressure", "motor", "error", "code", "reset",
+    "manual", "install", "temperature", "warning", "filter", "cable", "power",
+    "voltage", "service", "interval", "replace", "check", "display", "module",
+    "firmware", "update", "calibrate", "flow", "rate", "leak", "seal", "bearing",
+]  # fmt: skip
+
+
+def make_text(rng: random.Random, words: int = 120) -> str:
+    """Return a random text with a unique part number."""
+    body = " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return f"Part P-{rng.randrange(10**6):06d}. {body}."
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Return a minimal PDF with one line of text per page."""
+    count = len(pages)
+    font = 3 + 2 * count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (" ".join(f"{3 + 2 * i} 0 R" for i in range(count)), count),
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 10 Tf 40 760 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {4 + 2 * i} 0 R /Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return out
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Return the mean and the p50/p95/p99 of latencies in milliseconds."""
+    ordered = sorted(latencies)
+
+    def at(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+    }
+
+
+async def timed(function: Callable, repeat: int) -> Dict[str, float]:
+    """Await a coroutine function repeatedly and return its latency."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await function()
+        latencies.append(time.perf_counter() - start)
+    return percentiles(latencies)
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.url}: {response.text}")
+    return response
+
+
+async def bench_ingest_texts(client, sizes: List[int], batch: int, rng) -> List[Dict]:
+    results = []
+    for size in sizes:
+        identifier = f"bench_texts_{size}"
+        start = time.perf_counter()
+        chunks = 0
+        for offset in range(0, size, batch):
+            texts = [{"text": make_text(rng)} for _ in range(min(batch, size - offset))]
+            check(
+                await client.post(
+                    "/data/v1/add_texts",
+                    json={"identifier": identifier, "texts": texts},
+                )
+            )
+            chunks += len(texts)
+        seconds = time.perf_counter() - start
+        results.append(
+            {"size": size, "seconds": seconds, "chunks_per_second": chunks / seconds}
+        )
+    return results
+
+
+async def bench_ingest_pdfs(client, pdfs: int, pages: int, rng) -> Dict:
+    identifier = "bench_pdfs"
+    files = [
+        (
+            "pdfs",
+            (
+                f"manual_{i}.pdf",
+                make_pdf([make_text(rng, 60) for _ in range(pages)]),
+                "application/pdf",
+            ),
+        )
+        for i in range(pdfs)
+    ]
+    start = time.perf_counter()
+    response = check(
+        await client.post(f"/data/v1/add_pdfs?identifier={identifier}", files=files)
+    )
+    seconds = time.perf_counter() - start
+    return {
+        "pdfs": pdfs,
+        "pages": pdfs * pages,
+        "seconds": seconds,
+        "pages_per_second": pdfs * pages / seconds,
+        "stats": response.json().get("stats"),
+    }
+
+
+async def bench_lookups(client, sizes: List[int], repeat: int) -> Dict[str, List]:
+    get_texts, get_pdfs = [], []
+    for size in sizes:
+        identifier = f"bench_texts_{size}"
+        page = await timed(
+            lambda: client.post(
+                "/data/v1/get_texts",
+                json={"identifier": identifier, "limit": 100, "fields": "metadata"},
+            ),
+            repeat,
+        )
+        full = await timed(
+            lambda: client.post("/data/v1/get_texts", json={"identifier": identifier}),
+            max(1, repeat // 10),
+        )
+        get_texts.append({"size": size, "page_of_100": page, "all": full})
+        pdfs = await timed(
+            lambda: client.post("/data/v1/get_pdfs", json={"identifier": identifier}),
+            repeat,
+        )
+        get_pdfs.append({"size": size, **pdfs})
+    return {"get_texts": get_texts, "get_pdfs": get_pdfs}
+
+
+async def bench_retrieval(identifier: str, ks: List[int], repeat: int, rng) -> List:
+    from fRAGme.models.v1.cmd import Question
+    from fRAGme.util.v1.chroma_handler import build_question
+
+    results = []
+    for k in ks:
+
+        async def retrieve():
+            question = Question(
+                chat_history=[],
+                question=make_text(rng, 12),
+                k_similar_text_snippets=k,
+            )
+            await asyncio.to_thread(build_question, question, identifier)
+
+        results.append({"k": k, **await timed(retrieve, repeat)})
+    return results
+
+
+async def bench_ask_question(
+    client, identifier: str, concurrencies: List[int], requests: int, k: int, rng
+) -> List:
+    results = []
+    for concurrency in concurrencies:
+        latencies = []
+        queue = list(range(requests))
+
+        async def worker():
+            while queue:
+                queue.pop()
+                body = {
+                    "identifier": identifier,
+                    "info": {
+                        "chat_history": [],
+                        "question": make_text(rng, 12),
+                        "k_similar_text_snippets": k,
+                    },
+                }
+                start = time.perf_counter()
+                check(await client.post("/cmd/v1/ask_question", json=body))
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+        results.append(
+            {
+                "concurrency": concurrency,
+                "requests": requests,
+                "requests_per_second": requests / seconds,
+                **percentiles(latencies),
+            }
+        )
+    return results
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    import fRAGme
+    from fRAGme.app import app
+    from fRAGme.models.v1.auth import User
+    from fRAGme.util.v1.auth import get_current_active_user
+
+    # The app loads .env on import, which may point DATA_PATH elsewhere. The
+    # OpenAI client is created at startup even though no request reaches it.
+    os.environ["DATA_PATH"] = args.data_path
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") or "benchmark"
+    app.dependency_overrides[get_current_active_user] = lambda: User(
+        username="benchmark"
+    )
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            print("ingest_texts ...", file=sys.stderr)
+            results["ingest_texts"] = await bench_ingest_texts(
+                client, args.sizes, args.batch, rng
+            )
+            print("ingest_pdfs ...", file=sys.stderr)
+            results["ingest_pdfs"] = await bench_ingest_pdfs(
+                client, args.pdfs, args.pages, rng
+            )
+            print("get_texts / get_pdfs ...", file=sys.stderr)
+            results.update(await bench_lookups(client, args.sizes, args.repeat))
+            identifier = f"bench_texts_{max(args.sizes)}"
+            print("retrieval ...", file=sys.stderr)
+            results["retrieval"] = await bench_retrieval(
+                identifier, args.ks, args.repeat, rng
+            )
+            print("ask_question ...", file=sys.stderr)
+            results["ask_question"] = await bench_ask_question(
+                client, identifier, args.concurrency, args.requests, args.k, rng
+            )
+
+    return {
+        "version": fRAGme.__version__,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "data_path")
+        },
+        "results": results,
+    }
+
+
+# Fields telling apart the entries of a list of results.
+LABELS = ("size", "k", "concurrency")
+
+
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results into dotted metric names."""
+    metrics = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            metrics.update(flatten(item, f"{prefix}{key}."))
+    elif isinstance(value, list):
+        for item in value:
+            key = next((key for key in LABELS if key in item), None)
+            if key is None:
+                continue
+            rest = {name: field for name, field in item.items() if name != key}
+            metrics.update(flatten(rest, f"{prefix}{key}={item[key]}."))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        metrics[prefix[:-1]] = float(value)
+    return metrics
+
+
+def compare(baseline: Dict, current: Dict):
+    """Print the relative change of every metric against a baseline."""
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    print(f"\nChange against {baseline.get('version')}:")
+    for name in sorted(before.keys() & after.keys()):
+        if before[name] and not name.endswith((".requests", ".pdfs", ".pages")):
+            change = (after[name] - before[name]) / before[name] * 100
+            print(
+                f"  {name:60s} {before[name]:12.2f} -> {after[name]:12.2f} "
+                f"({change:+.1f}%)"
+            )
+
+
+@contextmanager
+def chroma_server(path: str, timeout: float = 60.0) -> Iterator[int]:
+    """Run a local Chroma server in a subprocess and yield its port."""
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    chroma = shutil.which("chroma") or os.path.join(
+        os.path.dirname(sys.executable), "chroma"
+    )
+    process = subprocess.Popen(
+        [chroma, "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"chroma run exited with {process.returncode}")
+            try:
+                httpx.get(
+                    f"http://127.0.0.1:{port}/api/v2/heartbeat"
+                ).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    numbers = lambda value: [int(item) for item in value.split(",")]  # noqa: E731
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--quick", action="store_true", help="small sizes for CI")
+    parser.add_argument("--sizes", type=numbers, default=[1000, 10000])
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--ks", type=numbers, default=[1, 5, 10, 20])
+    parser.add_argument("--k", type=int, default=10, help="k of ask_question")
+    parser.add_argument("--concurrency", type=numbers, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--embedding-dimension", type=int, default=384)
+    parser.add_argument("--with-caches", action="store_true")
+    parser.add_argument(
+        "--chroma-mode",
+        choices=["embedded", "http"],
+        default="embedded",
+        help="store collections in DATA_PATH or on a local Chroma server",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.pdfs, args.pages = [200, 1000], 2, 10
+        args.concurrency, args.requests, args.repeat = [1, 8], 40, 10
+    return args
+
+
+def main():
+    args = parse_args()
+    args.output = os.path.abspath(args.output)
+    if args.compare:
+        args.compare = os.path.abspath(args.compare)
+    args.data_path = tempfile.mkdtemp(prefix="fragme-benchmark-")
+    os.environ.update(
+        {
+            "DATA_PATH": args.data_path,
+            "AUTH": "false",
+            "EMBEDDING_BACKEND": "hash",
+            "EMBEDDING_MODEL": f"hash-{args.embedding_dimension}",
+            "LLM_BACKEND": "fake",
+            "FAKE_LLM_LATENCY": str(args.llm_latency),
+            "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+        }
+    )
+    if not args.with_caches:
+        os.environ.update({"ANSWER_CACHE_SIZE": "0", "RETRIEVAL_CACHE_SIZE": "0"})
+    os.chdir(args.data_path)
+
+    if args.chroma_mode == "http":
+        with chroma_server(os.path.join(args.data_path, "chroma")) as port:
+            os.environ.update(
+                {
+                    "CHROMA_MODE": "http",
+                    "CHROMA_HOST": "127.0.0.1",
+                    "CHROMA_PORT": str(port),
+                }
+            )
+            report = asyncio.run(run(args))
+    else:
+        report = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
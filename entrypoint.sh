@@ -1,7 +1,14 @@
 #!/bin/sh
 
+# Workers only share the databases through a Chroma server; several workers
+# opening the same embedded store would corrupt it.
+if [ "${WORKERS:-1}" -gt 1 ] && [ "$CHROMA_MODE" != "http" ]; then
+    echo "WORKERS=$WORKERS needs CHROMA_MODE=http, see docs/docker.rst" >&2
+    exit 1
+fi
+
 if [ -z "$PROXY_PATH" ]; then
-    uvicorn fRAGme.app:app --host $HOST --port $PORT
+    uvicorn fRAGme.app:app --host $HOST --port $PORT --workers ${WORKERS:-1}
 else
-    uvicorn fRAGme.app:app --host $HOST --port $PORT --root-path $PROXY_PATH
-fi
\ No newline at end of file
+    uvicorn fRAGme.app:app --host $HOST --port $PORT --workers ${WORKERS:-1} --root-path $PROXY_PATH
+fi
@@ -6,7 +6,8 @@ It includes the following functionalities:
 
 - **Login for Access Token**: A POST endpoint that allows users to authenticate
   and receive an access token. The endpoint requires the user's credentials
-  (username and password) and validates them against a fake user database.
+  (username and password) and validates them against the user database, with
+  the password hash checked in a thread pool off the event loop.
   Upon successful authentication, it generates an access token that can be
   used for subsequent requests.
 
@@ -21,7 +22,8 @@ Functions:
 
 Constants:
 - `ACCESS_TOKEN_EXPIRE_MINUTES`: The duration in minutes for which the access token is valid.
-- `fake_users_db`: A mock database containing user credentials for authentication.
+- `users_db`: The user database loaded at startup, containing user credentials
+  for authentication.
 
 Usage:
 Import this module into the FastAPI application and include the router to enable
@@ -36,10 +38,10 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from fRAGme.models.v1.auth import Token
 from fRAGme.util.v1.auth import (
-    authenticate_user,
+    aauthenticate_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     create_access_token,
-    fake_users_db,
+    users_db,
 )
 
 router = APIRouter()
@@ -68,7 +70,7 @@ async def login_for_access_token(
         HTTPException: If the username or password is incorrect, an HTTP 401
         Unauthorized error is raised with a relevant message.
     """
-    user = authenticate_user(fake_users_db(), form_data.username, form_data.password)
+    user = await aauthenticate_user(users_db(), form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
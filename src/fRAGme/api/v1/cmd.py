@@ -1,33 +1,90 @@
 """
 This module provides an API endpoint to ask questions against a vector store
-using OpenAI's language model.
+using a language model.
 """
 
-from typing import Annotated
+import asyncio
+import json
+import os
+import time
+from typing import Annotated, List, Tuple
 
-from fastapi import APIRouter, HTTPException, Depends
-from openai import OpenAI
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 
 from fRAGme.models.v1.auth import User
 from fRAGme.util.v1.auth import get_current_active_user
-from fRAGme.util.v1.chroma_handler import build_question
+from fRAGme.util.v1.answer_cache import answer_cache
+from fRAGme.util.v1.chroma_handler import (
+    aembed_question,
+    aembed_questions,
+    aretrieve_snippets,
+    aretrieve_snippets_many,
+    awrite_version,
+    llm_model,
+)
+from fRAGme.util.v1.embedding_cache import get_embedding_cache
+from fRAGme.util.v1.errors import http_exception
+from fRAGme.util.v1.completion_backends import get_completion_backend
+from fRAGme.util.v1.metrics import stage
+from fRAGme.util.v1.prompt_builder import build_prompt
+from fRAGme.util.v1.retrieval_cache import retrieval_cache
 from fRAGme.models.v1.cmd import (
     CmdAskQuestionRequest,
     CmdAskQuestionResponse,
+    CmdAskQuestionsRequest,
+    CmdAskQuestionsResult,
+    CmdAskQuestionStreamSnippets,
+    CmdAskQuestionStreamDelta,
+    CmdAskQuestionStreamDone,
+    CmdGetCacheStatsResponse,
     ChatAction,
+    PromptUsage,
+    Question,
     RoleEnum,
+    Snippet,
 )
 
+ASK_QUESTIONS_CONCURRENCY = int(os.getenv("ASK_QUESTIONS_CONCURRENCY", "16"))
+
 router = APIRouter()
 
 
+async def _complete(
+    question: Question, snippets: List[Snippet], model: str
+) -> Tuple[ChatAction, PromptUsage]:
+    """Answer a question from its snippets with a chat completion."""
+    with stage("prompt"):
+        messages, prompt = await asyncio.to_thread(build_prompt, question, snippets)
+    with stage("llm"):
+        answer, _ = await get_completion_backend().complete(model, messages)
+    return answer, prompt
+
+
+def _sse_event(event: str, data: BaseModel) -> str:
+    """Encode a model as a server-sent event."""
+    return f"event: {event}\ndata: {data.model_dump_json()}\n\n"
+
+
+def _json_response(data: BaseModel) -> Response:
+    """Serialize a model into a JSON response, timed as its own stage."""
+    with stage("serialize"):
+        return Response(data.model_dump_json(), media_type="application/json")
+
+
 @router.post("/ask_question", response_model=CmdAskQuestionResponse)
-def cmd_ask_question(
+async def cmd_ask_question(
     request: CmdAskQuestionRequest,
     current_user: Annotated[User, Depends(get_current_active_user)],
 ):
     """Endpoint to ask a question against a vector store.
 
+    Answers are cached per identifier until its vector store changes. A
+    question is answered from the cache if it matches a cached question
+    exactly, up to case and whitespace, or if semantic matching is enabled and
+    a cached question is similar enough.
+
     Args:
         request: A request object containing parameters.
 
@@ -35,26 +92,247 @@ def cmd_ask_question(
         A ChatAction element with the role and the content of the answer.
 
     Raises:
-        HTTPException: Generic internal server error.
+        HTTPException: 404 if the database does not exist, 429 if the
+            language model is rate limited, 502 or 504 if it fails or times
+            out, 400 for invalid input, otherwise a generic internal server
+            error.
     """
     try:
-        prompt = build_question(request.info, request.identifier)
-        client = OpenAI()
+        # Drops cached answers if another worker wrote to the store.
+        await awrite_version(request.identifier)
+        generation = answer_cache.generation(request.identifier)
+        embedding = None
+        if answer_cache.similarity > 0:
+            embedding = await aembed_question(request.info, request.identifier)
+            result = await asyncio.to_thread(
+                answer_cache.get, request.identifier, request.info, embedding
+            )
+        else:
+            result = answer_cache.get(request.identifier, request.info)
+        if result is not None:
+            return _json_response(CmdAskQuestionResponse(result=result, cached=True))
+
+        snippets = await aretrieve_snippets(request.info, request.identifier, embedding)
+        model = await asyncio.to_thread(llm_model, request.identifier)
+        result, prompt = await _complete(request.info, snippets, model)
+        answer_cache.put(
+            request.identifier, request.info, result, embedding, generation
+        )
+    except Exception as e:
+        raise http_exception(e) from e
+
+    return _json_response(CmdAskQuestionResponse(result=result, prompt=prompt))
+
+
+@router.post("/ask_questions")
+async def cmd_ask_questions(
+    request: CmdAskQuestionsRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to ask a batch of questions against a vector store.
+
+    Questions not answered from the answer cache are embedded in one
+    embedding call and searched in one batched similarity search. Their
+    completions run concurrently, at most `ASK_QUESTIONS_CONCURRENCY` at a
+    time. The answers are streamed as NDJSON, one line per question with its
+    `index` in the request, either in request order or, if `ordered` is
+    false, as soon as they are finished. A failed completion is reported in
+    the `error` field of its line.
+
+    Args:
+        request: A request object containing parameters.
+
+    Returns:
+        An `application/x-ndjson` response.
+
+    Raises:
+        HTTPException: 404 if the database does not exist, 429 if the
+            language model is rate limited, 502 or 504 if it fails or times
+            out, 400 for invalid input, otherwise a generic internal server
+            error.
+    """
+    identifier = request.identifier
+    questions = request.questions
+    try:
+        await awrite_version(identifier)
+        generation = answer_cache.generation(identifier)
+        embeddings = [None] * len(questions)
+        if answer_cache.similarity > 0:
+            embeddings = await aembed_questions(questions, identifier)
+
+        def cached() -> List[ChatAction | None]:
+            return [
+                answer_cache.get(identifier, question, embedding)
+                for question, embedding in zip(questions, embeddings)
+            ]
+
+        if answer_cache.similarity > 0:
+            answers = await asyncio.to_thread(cached)
+        else:
+            answers = cached()
+        results = {}
+        for index, result in enumerate(answers):
+            if result is not None:
+                results[index] = CmdAskQuestionsResult(
+                    index=index, result=result, cached=True
+                )
+        pending = [index for index in range(len(questions)) if index not in results]
+        embeddings = [embeddings[index] for index in pending]
+
+        snippets = await aretrieve_snippets_many(
+            [questions[index] for index in pending], identifier, embeddings
+        )
+        model = await asyncio.to_thread(llm_model, identifier)
+    except Exception as e:
+        raise http_exception(e) from e
 
-        chat_history = [
-            {"role": element.role, "content": element.content}
-            for element in request.info.chat_history
-        ]
-        chat_history.append({"role": RoleEnum.USER, "content": prompt})
+    semaphore = asyncio.Semaphore(ASK_QUESTIONS_CONCURRENCY)
 
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini", messages=chat_history
+    async def answer(index: int, question_snippets: List[Snippet], embedding):
+        async with semaphore:
+            try:
+                result, prompt = await _complete(
+                    questions[index], question_snippets, model
+                )
+            except Exception as e:
+                return CmdAskQuestionsResult(index=index, error=str(e))
+        answer_cache.put(identifier, questions[index], result, embedding, generation)
+        return CmdAskQuestionsResult(index=index, result=result, prompt=prompt)
+
+    tasks = {
+        index: asyncio.ensure_future(answer(index, question_snippets, embedding))
+        for index, question_snippets, embedding in zip(pending, snippets, embeddings)
+    }
+
+    async def lines():
+        try:
+            if request.ordered:
+                for index in range(len(questions)):
+                    result = results.get(index) or await tasks[index]
+                    yield result.model_dump_json(exclude_none=True) + "\n"
+            else:
+                for result in results.values():
+                    yield result.model_dump_json(exclude_none=True) + "\n"
+                for task in asyncio.as_completed(tasks.values()):
+                    result = await task
+                    yield result.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/get_cache_stats", response_model=CmdGetCacheStatsResponse)
+def cmd_get_cache_stats(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to get the statistics of the embedding, answer and retrieval
+    caches.
+
+    Returns:
+        The number of entries and the counters of every cache.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        return CmdGetCacheStatsResponse(
+            embedding=get_embedding_cache().stats(),
+            answer=answer_cache.stats(),
+            retrieval=retrieval_cache.stats(),
         )
+    except Exception as e:
+        raise http_exception(e) from e
 
-        answer = completion.choices[0].message
+
+@router.post("/ask_question_stream")
+async def cmd_ask_question_stream(
+    request: CmdAskQuestionRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to ask a question against a vector store and stream the answer.
+
+    The answer is sent as server-sent events: one `snippets` event with the
+    ids and metadata of the retrieved snippets, one `delta` event per token
+    chunk of the answer and a final `done` event with the complete answer,
+    the token usage and the timing. Failures after the stream has started are
+    reported as an `error` event.
+
+    Args:
+        request: A request object containing parameters.
+
+    Returns:
+        A `text/event-stream` response.
+
+    Raises:
+        HTTPException: 404 if the database does not exist, 429 if the
+            language model is rate limited, 502 or 504 if it fails or times
+            out, 400 for invalid input, otherwise a generic internal server
+            error.
+    """
+    start = time.perf_counter()
+    try:
+        snippets = await aretrieve_snippets(request.info, request.identifier)
+        with stage("prompt"):
+            messages, prompt = await asyncio.to_thread(
+                build_prompt, request.info, snippets
+            )
+        model = await asyncio.to_thread(llm_model, request.identifier)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
+    retrieval_time = time.perf_counter() - start
+
+    async def events():
+        yield _sse_event(
+            "snippets",
+            CmdAskQuestionStreamSnippets(
+                snippets=[snippet.model_dump(exclude={"text"}) for snippet in snippets]
+            ),
+        )
+        first_token_time = None
+        role = RoleEnum.ASSISTANT
+        content = []
+        usage = None
+        try:
+            with stage("llm"):
+                async for chunk in get_completion_backend().stream(model, messages):
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.role:
+                        role = chunk.role
+                    if not chunk.content:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start
+                    content.append(chunk.content)
+                    yield _sse_event(
+                        "delta",
+                        CmdAskQuestionStreamDelta(
+                            delta=ChatAction(role=role, content=chunk.content)
+                        ),
+                    )
+        except Exception as e:
+            detail = {"detail": str(e), "status": http_exception(e).status_code}
+            yield f"event: error\ndata: {json.dumps(detail)}\n\n"
+            return
+
+        yield _sse_event(
+            "done",
+            CmdAskQuestionStreamDone(
+                result=ChatAction(role=role, content="".join(content)),
+                usage=usage,
+                prompt=prompt,
+                timing={
+                    "retrieval": retrieval_time,
+                    "first_token": first_token_time or 0.0,
+                    "total": time.perf_counter() - start,
+                },
+            ),
+        )
 
-    return CmdAskQuestionResponse(
-        result=ChatAction(role=answer.role, content=answer.content)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -2,31 +2,46 @@
 This module provides API endpoints for managing text snippets and PDFs in a vector store.
 """
 
+import itertools
+import json
 from typing import List, Annotated
 from fastapi import APIRouter, HTTPException, File, UploadFile, Depends
+from fastapi.responses import StreamingResponse
 
 from fRAGme.models.v1.auth import User
 from fRAGme.util.v1.auth import get_current_active_user
 from fRAGme.util.v1.chroma_handler import (
     add_texts,
     add_pdfs,
-    get_texts,
+    create_database,
+    get_text_page,
+    iter_texts,
     get_pdfs,
     get_databases,
+    get_database_catalog,
     update_texts,
     delete_texts,
     delete_pdfs,
     delete_databases,
+    vector_stores,
 )
+from fRAGme.util.v1.errors import http_exception
+from fRAGme.util.v1.jobs import job_manager
+from fRAGme.util.v1.store_manifest import StoreMismatchError
 from fRAGme.models.v1.data import (
     DataAddTextsRequest,
     DataAddTextsResponse,
     DataAddPDFsResponse,
     DataGetTextsRequest,
     DataGetTextsResponse,
+    DataCreateDatabaseRequest,
+    DataCreateDatabaseResponse,
+    DataExportTextsRequest,
     DataGetPDFsRequest,
     DataGetPDFsResponse,
     DataGetDatabasesResponse,
+    DataGetCatalogResponse,
+    DataGetVectorStoreStatsResponse,
     DataUploadTextsRequest,
     DataUploadTextsResponse,
     DataDeleteTextsRequest,
@@ -35,6 +50,11 @@ from fRAGme.models.v1.data import (
     DataDeletePDFsResponse,
     DataDeleteDatabasesRequest,
     DataDeleteDatabasesResponse,
+    DataAddJobResponse,
+    DataGetJobRequest,
+    DataGetJobResponse,
+    DataGetJobsRequest,
+    DataGetJobsResponse,
 )
 
 router = APIRouter()
@@ -57,11 +77,11 @@ def data_add_texts(
         HTTPException: Generic internal server error.
     """
     try:
-        add_texts(request.texts, request.identifier)
+        stats = add_texts(request.texts, request.identifier)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
 
-    return DataAddTextsResponse(status=True)
+    return DataAddTextsResponse(status=True, stats=stats)
 
 
 @router.post("/add_pdfs", response_model=DataAddPDFsResponse)
@@ -83,34 +103,203 @@ def data_add_pdfs(
         HTTPException: Generic internal server error.
     """
     try:
-        add_pdfs(identifier, pdfs)
+        stats = add_pdfs(identifier, pdfs)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
 
-    return DataAddPDFsResponse(status=True)
+    return DataAddPDFsResponse(status=True, stats=stats)
 
 
-@router.post("/get_texts", response_model=DataGetTextsResponse)
+@router.post("/add_texts_job", response_model=DataAddJobResponse)
+def data_add_texts_job(
+    request: DataAddTextsRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to add text snippets to a vector store in a background job.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        Return the queued job.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        job = job_manager.submit_texts(request.identifier, request.texts)
+    except Exception as e:
+        raise http_exception(e) from e
+
+    return DataAddJobResponse(job=job)
+
+
+@router.post("/add_pdfs_job", response_model=DataAddJobResponse)
+def data_add_pdfs_job(
+    identifier: str,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    pdfs: List[UploadFile] = File(...),
+):
+    """Endpoint to add pdfs to a vector store in a background job.
+
+    Args:
+        identifier: Name of the vector store.
+        pdfs: PDF objects to upload.
+
+    Returns:
+        Return the queued job.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        job = job_manager.submit_pdfs(identifier, pdfs)
+    except Exception as e:
+        raise http_exception(e) from e
+
+    return DataAddJobResponse(job=job)
+
+
+@router.post("/get_job", response_model=DataGetJobResponse)
+def data_get_job(
+    request: DataGetJobRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to get the status and progress of an ingestion job.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        Return the requested job.
+
+    Raises:
+        HTTPException: Not found if the job does not exist.
+    """
+    try:
+        job = job_manager.get(request.job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail="Job not found") from e
+    return DataGetJobResponse(job=job)
+
+
+@router.post("/get_jobs", response_model=DataGetJobsResponse)
+def data_get_jobs(
+    request: DataGetJobsRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to list ingestion jobs.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        Return the jobs matching the optional identifier and status filters.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        jobs = job_manager.list(request.identifier, request.status)
+    except Exception as e:
+        raise http_exception(e) from e
+    return DataGetJobsResponse(jobs=jobs)
+
+
+@router.post("/cancel_job", response_model=DataGetJobResponse)
+def data_cancel_job(
+    request: DataGetJobRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to cancel an ingestion job.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        Return the job after the cancellation request.
+
+    Raises:
+        HTTPException: Not found if the job does not exist.
+    """
+    try:
+        job = job_manager.cancel(request.job_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail="Job not found") from e
+    return DataGetJobResponse(job=job)
+
+
+@router.post(
+    "/get_texts",
+    response_model=DataGetTextsResponse,
+    response_model_exclude_none=True,
+)
 def data_get_texts(
     request: DataGetTextsRequest,
     current_user: Annotated[User, Depends(get_current_active_user)],
 ):
-    """Endpoint to get text snippets from specified vector store.
+    """Endpoint to get a page of text snippets from specified vector store.
+
+    Without `limit` all matching text snippets are returned at once. Fields
+    that were not requested are omitted from the text snippets.
 
     Args:
         request: An request object to fill with parameters.
 
     Returns:
-        Return dictionary of Text objects.
+        Return dictionary of Text objects and the offset of the next page.
 
     Raises:
-        HTTPException: Generic internal server error.
+        HTTPException: Not found if the database does not exist, generic
+            internal server error otherwise.
     """
     try:
-        documents = get_texts(request.identifier, request.ids)
+        documents, next_offset = get_text_page(
+            request.identifier,
+            request.ids,
+            offset=request.offset,
+            limit=request.limit,
+            fields=request.fields,
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
-    return DataGetTextsResponse(documents=documents)
+        raise http_exception(e) from e
+    return DataGetTextsResponse(documents=documents, next_offset=next_offset)
+
+
+@router.post("/export_texts")
+def data_export_texts(
+    request: DataExportTextsRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to export all text snippets of a vector store as NDJSON.
+
+    The collection is read in pages of `page_size` entries and every text
+    snippet is streamed as one JSON line with its `id` and the requested
+    fields, so memory use does not grow with the collection size.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        An `application/x-ndjson` response.
+
+    Raises:
+        HTTPException: Not found if the database does not exist, generic
+            internal server error otherwise.
+    """
+    try:
+        texts = iter_texts(request.identifier, request.fields, request.page_size)
+        first = next(texts, None)
+    except Exception as e:
+        raise http_exception(e) from e
+
+    def lines():
+        if first is None:
+            return
+        for id_, text in itertools.chain([first], texts):
+            yield json.dumps({"id": id_, **text.model_dump(exclude_none=True)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.post("/get_pdfs", response_model=DataGetPDFsResponse)
@@ -127,15 +316,52 @@ def data_get_pdfs(
         Return a list with pdf filenames.
 
     Raises:
-        HTTPException: Generic internal server error.
+        HTTPException: Not found if the database does not exist, generic
+            internal server error otherwise.
     """
     try:
         documents = get_pdfs(request.identifier)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
     return DataGetPDFsResponse(documents=documents)
 
 
+@router.post("/create_database", response_model=DataCreateDatabaseResponse)
+def data_create_database(
+    request: DataCreateDatabaseRequest,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to create a database with a chosen embedding backend and model.
+
+    Databases that are first used by another endpoint are created with the
+    default backend and model. Creating an existing database succeeds if it
+    uses the requested backend and model, if any are requested. A requested
+    language model answers the questions about the database from then on.
+
+    Args:
+        request: An request object to fill with parameters.
+
+    Returns:
+        Return the backend, model and dimension of the database's embeddings.
+
+    Raises:
+        HTTPException: Conflict if the database exists with another backend
+            or model, generic internal server error otherwise.
+    """
+    try:
+        manifest = create_database(
+            request.identifier,
+            request.embedding_backend,
+            request.embedding_model,
+            request.llm_model,
+        )
+    except StoreMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except Exception as e:
+        raise http_exception(e) from e
+    return DataCreateDatabaseResponse(manifest=manifest)
+
+
 @router.get("/get_databases", response_model=DataGetDatabasesResponse)
 def data_get_databases(current_user: Annotated[User, Depends(get_current_active_user)]):
     """Endpoint to get all present database names.
@@ -151,10 +377,52 @@ def data_get_databases(current_user: Annotated[User, Depends(get_current_active_
     try:
         databases = get_databases()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
     return DataGetDatabasesResponse(databases=databases)
 
 
+@router.get("/get_catalog", response_model=DataGetCatalogResponse)
+def data_get_catalog(current_user: Annotated[User, Depends(get_current_active_user)]):
+    """Endpoint to get the statistics of all databases.
+
+    The statistics are read from the catalog, which is kept up to date by
+    every write, so no vector store is opened.
+
+    Returns:
+        Return the number of chunks and PDFs, the size on disk, the embedding
+        model and the time of the last write of every database.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        databases = get_database_catalog()
+    except Exception as e:
+        raise http_exception(e) from e
+    return DataGetCatalogResponse(databases=databases)
+
+
+@router.get("/get_vector_store_stats", response_model=DataGetVectorStoreStatsResponse)
+def data_get_vector_store_stats(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+):
+    """Endpoint to get statistics about the open vector stores.
+
+    Args:
+
+    Returns:
+        Return the number of open stores and the registry counters.
+
+    Raises:
+        HTTPException: Generic internal server error.
+    """
+    try:
+        stats = vector_stores.stats()
+    except Exception as e:
+        raise http_exception(e) from e
+    return DataGetVectorStoreStatsResponse(**stats)
+
+
 @router.put("/update_texts", response_model=DataUploadTextsResponse)
 def data_update_texts(
     request: DataUploadTextsRequest,
@@ -162,20 +430,24 @@ def data_update_texts(
 ):
     """Endpoint to update text snippets.
 
+    Only texts that changed are re-embedded; updates of the metadata alone
+    are written without embedding calls.
+
     Args:
         request: An request object to fill with parameters.
 
     Returns:
-        Return true if the process was successful.
+        Return true if the process was successful, the outcome per ID and the
+        throughput of re-embedding changed texts.
 
     Raises:
         HTTPException: Generic internal server error.
     """
     try:
-        update_texts(request.identifier, request.updates)
+        outcomes, stats = update_texts(request.identifier, request.updates)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
-    return DataUploadTextsResponse(status=True)
+        raise http_exception(e) from e
+    return DataUploadTextsResponse(status=True, outcomes=outcomes, stats=stats)
 
 
 @router.delete("/delete_texts", response_model=DataDeleteTextsResponse)
@@ -197,7 +469,7 @@ def data_delete_texts(
     try:
         delete_texts(request.identifier, request.ids)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
     return DataDeleteTextsResponse(status=True)
 
 
@@ -220,7 +492,7 @@ def data_delete_pdfs(
     try:
         delete_pdfs(request.identifier, request.pdf_names)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
     return DataDeletePDFsResponse(status=True)
 
 
@@ -243,5 +515,5 @@ def data_delete_databases(
     try:
         delete_databases(request.identifiers)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+        raise http_exception(e) from e
     return DataDeleteDatabasesResponse(status=True)
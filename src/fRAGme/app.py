@@ -10,19 +10,57 @@ from dotenv import load_dotenv
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from fRAGme.api.v1.data import router as data_router
 from fRAGme.api.v1.cmd import router as cmd_router
 from fRAGme.api.v1.auth import router as auth_router
-from fRAGme.util.v1.chroma_handler import get_vector_store
+from fRAGme.util.v1.answer_cache import answer_cache
+from fRAGme.util.v1.auth import load_users_db
+from fRAGme.util.v1.chroma_client import close_chroma_client
+from fRAGme.util.v1.chroma_handler import sync_catalog, vector_stores
+from fRAGme.util.v1.embedding_cache import get_embedding_cache
+from fRAGme.util.v1.metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    register_collector,
+    render,
+)
+from fRAGme.util.v1.retrieval_cache import retrieval_cache
+from fRAGme.util.v1.openai_client import init_openai_client, close_openai_client
+from fRAGme.util.v1.jobs import job_manager
+from fRAGme.util.v1.pdf_parser import shutdown_pdf_executor
+from fRAGme.util.v1.tombstones import reaper
 
 # Load environment variables from a .env file
 load_dotenv(verbose=True, override=True)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        init_openai_client()
+        load_users_db()
+        sync_catalog()
+        job_manager.start()
+        reaper.start()
+        yield
+    except Exception as e:
+        raise e
+    finally:
+        job_manager.shutdown()
+        reaper.shutdown()
+        shutdown_pdf_executor()
+        await close_openai_client()
+        vector_stores.close_all()
+        close_chroma_client()
+
+
 # Initialize the FastAPI app
 app = FastAPI(
     title="fRAGme",
     description="Retrieval Augmented Generation (RAG) Service.",
+    lifespan=lifespan,
 )
 
 # Include the API routers
@@ -42,18 +80,18 @@ app.add_middleware(
     allow_credentials=allow_credentials,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(MetricsMiddleware)
 
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    try:
-        get_vector_store("base")
-        yield
-    except Exception as e:
-        raise e
-    finally:
-        pass
+register_collector(
+    lambda: {
+        "embedding": get_embedding_cache().stats(),
+        "answer": answer_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "vector_store": vector_stores.stats(),
+    }
+)
 
 
 @app.get("/")
@@ -64,3 +102,14 @@ def healthcheck():
         bool: Returns `True` if the webservice is healthy.
     """
     return True
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Endpoint for Prometheus to scrape the metrics of the service.
+
+    Returns:
+        The stage latencies, ingestion counters and cache statistics in the
+        Prometheus text format.
+    """
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
@@ -3,7 +3,7 @@ This module contains models and enums used for the command API.
 """
 
 from enum import Enum
-from typing import List
+from typing import Any, Dict, List
 from pydantic import BaseModel
 
 BASE_PROMPT = (
@@ -46,6 +46,32 @@ class Question(BaseModel):
     chat_history: List[ChatAction]
     question: str
     k_similar_text_snippets: int = 10
+    max_prompt_tokens: int | None = None
+
+
+class SnippetReference(BaseModel):
+    """Model referencing a text snippet retrieved for a question."""
+
+    id: str
+    metadata: Dict[str, Any] = {}
+    score: float | None = None
+
+
+class Snippet(SnippetReference):
+    """Model representing a text snippet retrieved for a question."""
+
+    text: str
+
+
+class PromptUsage(BaseModel):
+    """Model representing the token usage of the prompt for a question."""
+
+    budget: int
+    tokens: int
+    snippet_tokens: int
+    snippets: int
+    deduplicated: int = 0
+    over_budget: int = 0
 
 
 class CmdAskQuestionRequest(BaseModel):
@@ -59,3 +85,52 @@ class CmdAskQuestionResponse(BaseModel):
     """Model representing a response to the asked question."""
 
     result: ChatAction
+    cached: bool = False
+    prompt: PromptUsage | None = None
+
+
+class CmdAskQuestionsRequest(BaseModel):
+    """Model representing a request to ask a batch of questions."""
+
+    questions: List[Question]
+    identifier: str
+    ordered: bool = True
+
+
+class CmdAskQuestionsResult(BaseModel):
+    """Model representing the answer to one question of a batch."""
+
+    index: int
+    result: ChatAction | None = None
+    cached: bool = False
+    prompt: PromptUsage | None = None
+    error: str | None = None
+
+
+class CmdAskQuestionStreamSnippets(BaseModel):
+    """Model representing the `snippets` event of a streamed answer."""
+
+    snippets: List[SnippetReference]
+
+
+class CmdAskQuestionStreamDelta(BaseModel):
+    """Model representing a `delta` event of a streamed answer."""
+
+    delta: ChatAction
+
+
+class CmdAskQuestionStreamDone(BaseModel):
+    """Model representing the final `done` event of a streamed answer."""
+
+    result: ChatAction
+    usage: Dict[str, int] | None = None
+    prompt: PromptUsage | None = None
+    timing: Dict[str, float]
+
+
+class CmdGetCacheStatsResponse(BaseModel):
+    """Model representing the statistics of the caches used for questions."""
+
+    embedding: Dict[str, int]
+    answer: Dict[str, int]
+    retrieval: Dict[str, int]
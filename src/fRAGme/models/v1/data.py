@@ -3,8 +3,9 @@ This module contains Pydantic models for handling data requests and responses
 related to texts and PDFs in the fRAGme application.
 """
 
+from enum import Enum
 from typing import Dict, Any, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Text(BaseModel):
@@ -16,15 +17,45 @@ class Text(BaseModel):
     metadata: Dict[str, Any] = {"source": "text input"}
 
 
+class TextFieldsEnum(str, Enum):
+    """
+    Enum representing which fields of a text entry are returned.
+    """
+
+    IDS = "ids"
+    METADATA = "metadata"
+    ALL = "all"
+
+
+class TextView(BaseModel):
+    """
+    Model representing a text entry of which only some fields may be returned.
+    """
+
+    text: str | None = None
+    metadata: Dict[str, Any] | None = None
+
+
 class TextUpdate(BaseModel):
     """
-    Model representing an update to a text entry.
+    Model representing an update to a text entry. The text is kept if no new
+    text is given.
     """
 
-    new_text: str
+    new_text: str | None = None
     new_metadata: Dict[str, Any]
 
 
+class UpdateOutcomeEnum(str, Enum):
+    """
+    Enum representing what an update did to a text entry.
+    """
+
+    REEMBEDDED = "reembedded"
+    METADATA_ONLY = "metadata_only"
+    NOT_FOUND = "not_found"
+
+
 class DataAddTextsRequest(BaseModel):
     """
     Request model for adding multiple text entries.
@@ -34,12 +65,39 @@ class DataAddTextsRequest(BaseModel):
     identifier: str
 
 
+class IngestionStats(BaseModel):
+    """
+    Model reporting the throughput of an ingestion.
+    """
+
+    chunks: int = 0
+    batches: int = 0
+    tokens: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    chunks_per_second: float = 0.0
+    tokens_per_second: float = 0.0
+
+
+class PdfIngestionStats(IngestionStats):
+    """
+    Model reporting the throughput of a PDF ingestion and how many chunks were
+    added, skipped because they were unchanged, and removed because they
+    vanished from a new revision of a PDF.
+    """
+
+    added: int = 0
+    skipped: int = 0
+    removed: int = 0
+
+
 class DataAddTextsResponse(BaseModel):
     """
     Response model indicating the status of adding text entries.
     """
 
     status: bool = False
+    stats: IngestionStats | None = None
 
 
 class DataAddPDFsResponse(BaseModel):
@@ -48,23 +106,40 @@ class DataAddPDFsResponse(BaseModel):
     """
 
     status: bool = False
+    stats: PdfIngestionStats | None = None
 
 
 class DataGetTextsRequest(BaseModel):
     """
-    Request model for retrieving specific text entries by their IDs.
+    Request model for retrieving a page of text entries, optionally restricted
+    to specific IDs and projected to some fields.
     """
 
     identifier: str
     ids: List[str] = None
+    offset: int = Field(default=0, ge=0)
+    limit: int | None = Field(default=None, ge=1)
+    fields: TextFieldsEnum = TextFieldsEnum.ALL
 
 
 class DataGetTextsResponse(BaseModel):
     """
-    Response model containing the requested text entries.
+    Response model containing the requested text entries and the offset of the
+    next page, if there is one.
     """
 
-    documents: Dict[str, Text]
+    documents: Dict[str, TextView]
+    next_offset: int | None = None
+
+
+class DataExportTextsRequest(BaseModel):
+    """
+    Request model for exporting all text entries as NDJSON.
+    """
+
+    identifier: str
+    fields: TextFieldsEnum = TextFieldsEnum.ALL
+    page_size: int = Field(default=1000, ge=1)
 
 
 class DataGetPDFsRequest(BaseModel):
@@ -83,6 +158,47 @@ class DataGetPDFsResponse(BaseModel):
     documents: List[str]
 
 
+class EmbeddingBackendEnum(str, Enum):
+    """
+    Enum representing the backend computing the embeddings of a vector store.
+    """
+
+    OPENAI = "openai"
+    LOCAL = "local"
+    HASH = "hash"
+
+
+class StoreManifest(BaseModel):
+    """
+    Model representing the settings a vector store was created with.
+    """
+
+    embedding_backend: EmbeddingBackendEnum
+    embedding_model: str
+    embedding_dimension: int
+    llm_model: str | None = None
+
+
+class DataCreateDatabaseRequest(BaseModel):
+    """
+    Request model for creating a database with a chosen embedding backend and
+    language model.
+    """
+
+    identifier: str
+    embedding_backend: EmbeddingBackendEnum | None = None
+    embedding_model: str | None = None
+    llm_model: str | None = None
+
+
+class DataCreateDatabaseResponse(BaseModel):
+    """
+    Response model containing the settings of the created database.
+    """
+
+    manifest: StoreManifest
+
+
 class DataGetDatabasesResponse(BaseModel):
     """
     Response model containing the list of available databases.
@@ -91,6 +207,46 @@ class DataGetDatabasesResponse(BaseModel):
     databases: List[str]
 
 
+class CatalogEntry(BaseModel):
+    """
+    Model representing the statistics of a database in the catalog. Chunk and
+    PDF counts are None for stores that have not been opened since they were
+    created by an older version.
+    """
+
+    identifier: str
+    chunks: int | None = None
+    pdfs: int | None = None
+    bytes: int = 0
+    embedding_backend: EmbeddingBackendEnum
+    embedding_model: str
+    llm_model: str | None = None
+    last_write: float
+
+
+class DataGetCatalogResponse(BaseModel):
+    """
+    Response model containing the catalog entries of all databases.
+    """
+
+    databases: List[CatalogEntry]
+
+
+class DataGetVectorStoreStatsResponse(BaseModel):
+    """
+    Response model containing the statistics of the open vector stores.
+    """
+
+    open: int
+    leased: int
+    retired: int
+    max_open: int
+    hits: int
+    misses: int
+    creations: int
+    evictions: int
+
+
 class DataUploadTextsRequest(BaseModel):
     """
     Request model for uploading updates to text entries.
@@ -102,10 +258,13 @@ class DataUploadTextsRequest(BaseModel):
 
 class DataUploadTextsResponse(BaseModel):
     """
-    Response model indicating the status of uploading text updates.
+    Response model indicating the status of uploading text updates, the
+    outcome per ID and the throughput of re-embedding changed texts.
     """
 
     status: bool = False
+    outcomes: Dict[str, UpdateOutcomeEnum] = {}
+    stats: IngestionStats | None = None
 
 
 class DataDeleteTextsRequest(BaseModel):
@@ -156,3 +315,84 @@ class DataDeleteDatabasesResponse(BaseModel):
     """
 
     status: bool = False
+
+
+class JobKindEnum(str, Enum):
+    """
+    Enum representing the kind of an ingestion job.
+    """
+
+    ADD_TEXTS = "add_texts"
+    ADD_PDFS = "add_pdfs"
+
+
+class JobStatusEnum(str, Enum):
+    """
+    Enum representing the state of an ingestion job.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job(BaseModel):
+    """
+    Model representing a background ingestion job and its progress.
+    """
+
+    id: str
+    kind: JobKindEnum
+    identifier: str
+    status: JobStatusEnum = JobStatusEnum.PENDING
+    processed: int = 0
+    total: int = 0
+    filenames: List[str] = []
+    error: str | None = None
+    cancel_requested: bool = False
+    created: float
+    started: float | None = None
+    finished: float | None = None
+
+
+class DataAddJobResponse(BaseModel):
+    """
+    Response model containing a newly submitted ingestion job.
+    """
+
+    job: Job
+
+
+class DataGetJobRequest(BaseModel):
+    """
+    Request model for retrieving or cancelling an ingestion job by its ID.
+    """
+
+    job_id: str
+
+
+class DataGetJobResponse(BaseModel):
+    """
+    Response model containing the requested ingestion job.
+    """
+
+    job: Job
+
+
+class DataGetJobsRequest(BaseModel):
+    """
+    Request model for listing ingestion jobs, optionally filtered.
+    """
+
+    identifier: str | None = None
+    status: JobStatusEnum | None = None
+
+
+class DataGetJobsResponse(BaseModel):
+    """
+    Response model containing the matching ingestion jobs.
+    """
+
+    jobs: List[Job]
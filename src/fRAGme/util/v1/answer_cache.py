@@ -0,0 +1,280 @@
+"""
+This module provides an in-memory cache of answers to questions.
+
+Answers are keyed by the identifier, the normalized question and a hash of
+everything else that shapes the prompt: the chat history, the base prompt, the
+number of retrieved snippets and the prompt token budget. If
+``ANSWER_CACHE_SIMILARITY`` is set, a question that misses the exact key is
+also answered from a cached question of the same identifier and context whose
+embedding has at least that cosine similarity. Entries expire after
+``ANSWER_CACHE_TTL`` seconds, at most ``ANSWER_CACHE_SIZE`` entries are kept
+and all entries of an identifier are dropped whenever its vector store
+changes.
+
+The normalized question embeddings of every identifier and context are kept
+in a matrix, so a similar question is found with one matrix-vector product
+that runs outside the lock of the cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from fRAGme.models.v1.cmd import ChatAction, Question
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so that differences in case and whitespace match.
+    """
+    return " ".join(question.casefold().split())
+
+
+def context_hash(question: Question) -> str:
+    """
+    Hash the parts of a question besides its text that shape the answer.
+    """
+    context = {
+        "base_prompt": question.base_prompt,
+        "chat_history": [
+            [element.role, element.content] for element in question.chat_history
+        ],
+        "k": question.k_similar_text_snippets,
+        "max_prompt_tokens": question.max_prompt_tokens,
+    }
+    return hashlib.sha256(json.dumps(context).encode("utf-8")).hexdigest()
+
+
+_Key = Tuple[str, str, str]
+
+
+def _normalize_vector(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array)) or 1.0
+    return array / norm
+
+
+class _Entry:
+    """A cached answer and its expiry."""
+
+    def __init__(self, answer: ChatAction, ttl: float):
+        self.answer = answer
+        self.expires = time.monotonic() + ttl
+
+
+class _Embeddings:
+    """
+    The normalized question embeddings of the cached answers that share an
+    identifier and context, stacked into a matrix on demand.
+    """
+
+    def __init__(self):
+        self.vectors: Dict[_Key, np.ndarray] = {}
+        self._matrix: Tuple[List[_Key], np.ndarray] | None = None
+
+    def add(self, key: _Key, vector: np.ndarray):
+        if any(other.shape != vector.shape for other in self.vectors.values()):
+            # The store was recreated with another embedding model.
+            self.vectors.clear()
+        self.vectors[key] = vector
+        self._matrix = None
+
+    def remove(self, key: _Key):
+        if self.vectors.pop(key, None) is not None:
+            self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def matrix(self) -> Tuple[List[_Key], np.ndarray]:
+        """
+        Return the keys and the matrix of their embeddings. The matrix is
+        never changed in place, so it can be used after the lock is released.
+        """
+        if self._matrix is None:
+            keys = list(self.vectors)
+            self._matrix = keys, np.stack([self.vectors[key] for key in keys])
+        return self._matrix
+
+
+class AnswerCache:
+    """
+    TTL and LRU bounded cache of answers keyed by identifier and question.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._embeddings: Dict[Tuple[str, str], _Embeddings] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def generation(self, identifier: str) -> int:
+        """
+        Return the generation of an identifier's entries.
+
+        Take it before retrieving the snippets of an answer and pass it to
+        `put`, so answers built from data that changed in the meantime are
+        not cached.
+        """
+        with self._lock:
+            return self._generations.get(identifier, 0)
+
+    def _delete_locked(self, key: _Key):
+        del self._entries[key]
+        embeddings = self._embeddings.get(key[:2])
+        if embeddings is not None:
+            embeddings.remove(key)
+            if not embeddings:
+                del self._embeddings[key[:2]]
+
+    def _pop_locked(self, key: _Key) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            self._delete_locked(key)
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(
+        self,
+        identifier: str,
+        question: Question,
+        embedding: List[float] | None = None,
+    ) -> ChatAction | None:
+        """
+        Return the cached answer to this question, if any.
+
+        If there is no answer to exactly this question and an embedding of the
+        question is given, the answer to the most similar cached question with
+        the same identifier and context is returned if its similarity reaches
+        the threshold.
+        """
+        if not self.enabled:
+            return None
+        context = context_hash(question)
+        key = (identifier, context, normalize_question(question.question))
+        with self._lock:
+            entry = self._pop_locked(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.answer
+            embeddings = self._embeddings.get((identifier, context))
+            if self.similarity > 0 and embedding is not None and embeddings:
+                candidates = embeddings.matrix()
+            else:
+                self.misses += 1
+                return None
+
+        keys, matrix = candidates
+        vector = _normalize_vector(embedding)
+        similar = []
+        if matrix.shape[1] == vector.shape[0]:
+            similarities = matrix @ vector
+            above = np.flatnonzero(similarities >= self.similarity)
+            similar = [keys[i] for i in above[np.argsort(-similarities[above])]]
+        with self._lock:
+            for similar_key in similar:
+                # The entry may have expired or been dropped in the meantime.
+                entry = self._pop_locked(similar_key)
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry.answer
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        identifier: str,
+        question: Question,
+        answer: ChatAction,
+        embedding: List[float] | None,
+        generation: int,
+    ):
+        """
+        Cache the answer to a question unless the identifier has been
+        invalidated since `generation` was taken.
+        """
+        if not self.enabled:
+            return
+        key = (
+            identifier,
+            context_hash(question),
+            normalize_question(question.question),
+        )
+        with self._lock:
+            if self._generations.get(identifier, 0) != generation:
+                return
+            self._entries[key] = _Entry(answer, self.ttl)
+            self._entries.move_to_end(key)
+            if embedding:
+                self._embeddings.setdefault(key[:2], _Embeddings()).add(
+                    key, _normalize_vector(embedding)
+                )
+            elif key[:2] in self._embeddings:
+                self._embeddings[key[:2]].remove(key)
+            while len(self._entries) > self.max_entries:
+                self._delete_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, identifier: str):
+        """
+        Drop all answers of an identifier.
+        """
+        with self._lock:
+            self._generations[identifier] = self._generations.get(identifier, 0) + 1
+            keys = [key for key in self._entries if key[0] == identifier]
+            for key in keys:
+                del self._entries[key]
+            for group in [
+                group for group in self._embeddings if group[0] == identifier
+            ]:
+                del self._embeddings[group]
+            self.invalidations += len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of cached answers and the cache counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+answer_cache = AnswerCache()
@@ -1,11 +1,17 @@
+import asyncio
 import bcrypt
+import hashlib
 import json
 import os
+import threading
+import time
 import jwt
 
 from dotenv import load_dotenv
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
@@ -16,9 +22,18 @@ load_dotenv(verbose=True, override=True)
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+BCRYPT_CONCURRENCY = int(os.getenv("BCRYPT_CONCURRENCY", "2"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt is deliberately slow, so it runs in its own small pool off the event
+# loop, which also caps how many logins are checked at the same time.
+_bcrypt_executor = ThreadPoolExecutor(
+    max_workers=BCRYPT_CONCURRENCY, thread_name_prefix="fragme-bcrypt"
+)
+
 
 def fake_users_db():
     """Load and return the fake user database from a JSON file.
@@ -34,6 +49,34 @@ def fake_users_db():
     return db
 
 
+_users_db: dict | None = None
+
+
+def load_users_db() -> dict:
+    """Load the user database once, replacing the one loaded before.
+
+    Tokens validated against the previous user database are forgotten.
+
+    Returns:
+        dict: The loaded user database.
+    """
+    global _users_db
+    _users_db = fake_users_db()
+    token_cache.clear()
+    return _users_db
+
+
+def users_db() -> dict:
+    """Return the user database, loading it on first use.
+
+    Returns:
+        dict: A dictionary containing user data.
+    """
+    if _users_db is None:
+        return load_users_db()
+    return _users_db
+
+
 def verify_password(plain_password, hashed_password):
     """Verify if the provided plain password matches the hashed password.
 
@@ -51,6 +94,22 @@ def verify_password(plain_password, hashed_password):
     )
 
 
+async def averify_password(plain_password, hashed_password):
+    """Verify a password in the bcrypt pool without blocking the event loop.
+
+    Args:
+        plain_password (str): The plain password to verify.
+        hashed_password (str): The hashed password to compare against.
+
+    Returns:
+        bool: True if the passwords match, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _bcrypt_executor, verify_password, plain_password, hashed_password
+    )
+
+
 def get_password_hash(password):
     """Generate a hashed password from the provided plain password.
 
@@ -100,6 +159,92 @@ def authenticate_user(fake_db, username: str, password: str):
     return user
 
 
+async def aauthenticate_user(db, username: str, password: str):
+    """Authenticate a user without blocking the event loop.
+
+    Args:
+        db (dict): The database containing user information.
+        username (str): The username of the user to authenticate.
+        password (str): The password provided by the user.
+
+    Returns:
+        UserInDB: An instance of UserInDB if authentication is successful;
+            False otherwise.
+    """
+    user = get_user(db, username)
+    if not user:
+        return False
+    if not await averify_password(password, user.hashed_password):
+        return False
+    return user
+
+
+class TokenCache:
+    """
+    LRU cache of validated access tokens and the users they resolve to.
+
+    An entry is kept until its token expires, but at most `ttl` seconds.
+    """
+
+    def __init__(
+        self, max_entries: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[UserInDB, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> UserInDB | None:
+        """Return the user of a cached token unless it expired.
+
+        Args:
+            token (str): The JWT access token.
+
+        Returns:
+            UserInDB: The cached user, or None if the token is not cached.
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if time.time() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, token: str, user: UserInDB, expires: float):
+        """Cache the user of a validated token until the token expires.
+
+        Args:
+            token (str): The JWT access token.
+            user (UserInDB): The user the token resolves to.
+            expires (float): The expiry of the token as a UNIX timestamp.
+        """
+        if self.max_entries <= 0:
+            return
+        expires = min(expires, time.time() + self.ttl)
+        with self._lock:
+            self._entries[self._key(token)] = (user, expires)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget all cached tokens."""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """Create an access token with an optional expiration time.
 
@@ -123,6 +268,9 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     """Retrieve the current user based on the provided token.
 
+    Validated tokens are cached, so the token is only decoded on its first
+    use.
+
     Args:
         token (str): The JWT access token.
 
@@ -132,6 +280,9 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     Returns:
         User: The authenticated User instance.
     """
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -145,9 +296,10 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         token_data = TokenData(username=username)
     except Exception as e:
         raise credentials_exception
-    user = get_user(fake_users_db(), username=token_data.username)
+    user = get_user(users_db(), username=token_data.username)
     if user is None:
         raise credentials_exception
+    token_cache.put(token, user, payload.get("exp", 0))
     return user
 
 
@@ -0,0 +1,128 @@
+"""
+This module provides the catalog of all databases.
+
+The catalog is a SQLite database under ``DATA_PATH`` holding the statistics of
+every identifier, such as the number of chunks and PDFs, the size on disk and
+the embedding model. It is updated whenever a database is opened, written or
+deleted, so databases can be listed without scanning ``DATA_PATH`` or opening
+any vector store. It also counts the writes to every database, so processes
+on one host sharing ``DATA_PATH`` notice the writes of each other.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import List
+
+from fRAGme.models.v1.data import CatalogEntry
+
+CATALOG_FILENAME = "fragme_catalog.sqlite3"
+
+
+class Catalog:
+    """
+    SQLite table mapping identifiers to their catalog entries.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS databases ("
+            "identifier TEXT PRIMARY KEY, entry TEXT NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "identifier TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+
+    def put(self, entry: CatalogEntry):
+        """
+        Add or replace the entry of a database.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO databases (identifier, entry) "
+                    "VALUES (?, ?)",
+                    (entry.identifier, entry.model_dump_json()),
+                )
+
+    def remove(self, identifier: str):
+        """
+        Remove the entry of a database.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM databases WHERE identifier = ?", (identifier,)
+                )
+
+    def identifiers(self) -> List[str]:
+        """
+        Return the identifiers of all databases.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT identifier FROM databases ORDER BY identifier"
+            ).fetchall()
+        return [identifier for (identifier,) in rows]
+
+    def entries(self) -> List[CatalogEntry]:
+        """
+        Return the entries of all databases.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT entry FROM databases ORDER BY identifier"
+            ).fetchall()
+        return [CatalogEntry.model_validate_json(entry) for (entry,) in rows]
+
+    def version(self, identifier: str) -> int:
+        """
+        Return the number of writes to a database.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT version FROM versions WHERE identifier = ?", (identifier,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, identifier: str) -> int:
+        """
+        Count a write to a database and return its new version.
+
+        Versions survive the removal of an entry, so a database that is
+        deleted and created again never repeats a version.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT INTO versions (identifier, version) VALUES (?, 1) "
+                    "ON CONFLICT (identifier) DO UPDATE SET version = version + 1",
+                    (identifier,),
+                )
+                (version,) = self._connection.execute(
+                    "SELECT version FROM versions WHERE identifier = ?", (identifier,)
+                ).fetchone()
+        return version
+
+
+_catalog: Catalog | None = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """
+    Return the process-wide catalog, opening it on first use.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            data_path = os.getenv("DATA_PATH")
+            os.makedirs(data_path, exist_ok=True)
+            _catalog = Catalog(os.path.join(data_path, CATALOG_FILENAME))
+    return _catalog
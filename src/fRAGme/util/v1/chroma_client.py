@@ -0,0 +1,75 @@
+"""
+This module selects where the collections of the vector stores are stored.
+
+In the default ``embedded`` mode every database is a local Chroma database in
+its own directory under ``DATA_PATH``, which only a single process can safely
+open. In the ``http`` mode the collections live on a shared Chroma server at
+``CHROMA_HOST:CHROMA_PORT``, such as a ``chroma run`` sidecar or the Chroma
+service of ``docker-compose.yml``, and all vector stores of a process share
+one client with a pool of at most ``CHROMA_MAX_CONNECTIONS`` connections.
+Several uvicorn workers on one host can then serve the same databases, as
+long as they also share a local ``DATA_PATH`` for the manifests, indexes and
+the catalog. These are SQLite databases in WAL mode and files locked with
+``flock``, which are not safe on network filesystems.
+"""
+
+import os
+import threading
+
+import chromadb
+from chromadb.api import ClientAPI
+from chromadb.config import Settings
+
+CHROMA_MODES = ("embedded", "http")
+CHROMA_MODE = os.getenv("CHROMA_MODE", "embedded").lower()
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+CHROMA_SSL = os.getenv("CHROMA_SSL", "false").lower() in ["true"]
+CHROMA_MAX_CONNECTIONS = int(os.getenv("CHROMA_MAX_CONNECTIONS", "32"))
+
+if CHROMA_MODE not in CHROMA_MODES:
+    raise ValueError(
+        f"Unknown CHROMA_MODE '{CHROMA_MODE}', expected one of {CHROMA_MODES}."
+    )
+
+_client: ClientAPI | None = None
+_client_lock = threading.Lock()
+
+
+def shared_storage() -> bool:
+    """
+    Return whether the collections are stored on a shared Chroma server.
+    """
+    return CHROMA_MODE == "http"
+
+
+def get_chroma_client() -> ClientAPI:
+    """
+    Return the process-wide client of the shared Chroma server, connecting
+    on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = chromadb.HttpClient(
+                host=CHROMA_HOST,
+                port=CHROMA_PORT,
+                ssl=CHROMA_SSL,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    chroma_http_max_connections=CHROMA_MAX_CONNECTIONS,
+                    chroma_http_max_keepalive_connections=CHROMA_MAX_CONNECTIONS,
+                ),
+            )
+    return _client
+
+
+def close_chroma_client():
+    """
+    Close the client of the shared Chroma server and its connections.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -2,56 +2,547 @@
 This module provides utility functions to handle vector stores using Chroma.
 """
 
+import asyncio
 import glob
+import hashlib
+import ipaddress
 import os
-import shutil
+import re
+import threading
 import time
-from typing import List, Dict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, ContextManager, Dict, Iterator, List, Tuple
 from uuid import uuid4
-from langchain_openai import OpenAIEmbeddings
+from chromadb.errors import NotFoundError
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.embeddings import Embeddings
 
-from fRAGme.models.v1.cmd import Question
+from fRAGme.models.v1.cmd import Question, Snippet
+from fRAGme.util.v1.answer_cache import answer_cache
+from fRAGme.util.v1.catalog import get_catalog
+from fRAGme.util.v1.chroma_client import get_chroma_client, shared_storage
+from fRAGme.util.v1.completion_backends import LLM_MODEL
+from fRAGme.util.v1.embedding_backends import (
+    DEFAULT_MODELS,
+    EMBEDDING_BACKEND,
+    create_embeddings,
+    default_model,
+    known_dimension,
+)
+from fRAGme.util.v1.embedding_cache import CachedEmbeddings, get_embedding_cache
+from fRAGme.util.v1.embedding_pipeline import EmbeddingPipeline
+from fRAGme.util.v1.errors import InvalidInputError
+from fRAGme.util.v1.keyword_index import KeywordIndex
+from fRAGme.util.v1.metrics import stage
+from fRAGme.util.v1.pdf_parser import parse_pdfs
+from fRAGme.util.v1.prompt_builder import build_prompt
+from fRAGme.util.v1.retrieval_cache import retrieval_cache
+from fRAGme.util.v1.source_index import SOURCE_INDEX_FILENAME, SourceIndex
+from fRAGme.util.v1.store_manifest import (
+    StoreMismatchError,
+    read_manifest,
+    write_manifest,
+)
+from fRAGme.util.v1.tombstones import bury, reaper
+from fRAGme.util.v1.vector_store_registry import (
+    VectorStoreRegistry,
+    close_vector_store,
+)
 from fRAGme.models.v1.data import (
+    CatalogEntry,
+    EmbeddingBackendEnum,
+    IngestionStats,
+    PdfIngestionStats,
+    StoreManifest,
     Text,
+    TextFieldsEnum,
     TextUpdate,
+    TextView,
+    UpdateOutcomeEnum,
 )
 
-vector_stores = {}
+COLLECTION_PAGE_SIZE = int(os.getenv("COLLECTION_PAGE_SIZE", "5000"))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() in ["true"]
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "2"))
+DELETE_DRAIN_TIMEOUT = float(os.getenv("DELETE_DRAIN_TIMEOUT", "30"))
+# Rank offset of reciprocal rank fusion, damping the weight of the top ranks.
+RRF_K = 60
+# Names Chroma accepts for collections.
+_IDENTIFIER_PATTERN = re.compile(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,510}[a-zA-Z0-9]")
 
 
-def create_vector_store(identifier: str) -> Chroma:
+def validate_identifier(identifier: str):
     """
-    Create a vector store for a given identifier.
+    Check that an identifier can name a Chroma collection, before anything of
+    its database is written.
+
+    Raises:
+        InvalidInputError: If the identifier is not 3 to 512 letters, digits,
+            dots, underscores or hyphens starting and ending with a letter or
+            digit, contains two consecutive dots or is an IPv4 address.
+    """
+    if _IDENTIFIER_PATTERN.fullmatch(identifier) and ".." not in identifier:
+        try:
+            ipaddress.IPv4Address(identifier)
+        except ValueError:
+            return
+    raise InvalidInputError(
+        f"Invalid identifier '{identifier}': use 3 to 512 letters, digits, "
+        "dots, underscores or hyphens, starting and ending with a letter or "
+        "digit."
+    )
+
+
+def database_path(identifier: str) -> str:
+    """
+    Return the directory holding the database of a given identifier.
     """
     data_path = os.getenv("DATA_PATH")
-    filename = os.path.join(data_path, f"{identifier}_chroma_langchain_db")
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    vector_store = Chroma(
-        collection_name=identifier,
-        embedding_function=embeddings,
-        persist_directory=filename,
+    return os.path.join(data_path, f"{identifier}_chroma_langchain_db")
+
+
+def _create_embeddings(manifest: StoreManifest) -> Embeddings:
+    """Create the embeddings of a store, cached unless they are hashed."""
+    embeddings = create_embeddings(manifest.embedding_backend, manifest.embedding_model)
+    if manifest.embedding_backend == EmbeddingBackendEnum.HASH:
+        return embeddings
+    # OpenAI vectors keep the bare model name as cache namespace, so vectors
+    # cached before backends were pluggable stay valid.
+    namespace = manifest.embedding_model
+    if manifest.embedding_backend != EmbeddingBackendEnum.OPENAI:
+        namespace = f"{manifest.embedding_backend.value}:{manifest.embedding_model}"
+    return CachedEmbeddings(embeddings, model=namespace, cache=get_embedding_cache())
+
+
+def _new_manifest(backend: EmbeddingBackendEnum, model: str) -> StoreManifest:
+    """
+    Build the manifest of a new store. The dimension of a model that is not
+    known in advance is left at 0 until the store is first opened.
+    """
+    return StoreManifest(
+        embedding_backend=backend,
+        embedding_model=model,
+        embedding_dimension=known_dimension(backend, model) or 0,
     )
+
+
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(
+    identifier: str,
+    backend: EmbeddingBackendEnum | None = None,
+    model: str | None = None,
+) -> StoreManifest:
+    """
+    Return the manifest of an identifier's store, creating it with the given
+    or the default embedding backend and model if the store is new.
+
+    Stores created before manifests existed are recorded as OpenAI
+    `text-embedding-3-large` stores.
+
+    Raises:
+        InvalidInputError: If the identifier cannot name a store.
+        StoreMismatchError: If a backend or model is given that differs from
+            the one the store was created with.
+    """
+    validate_identifier(identifier)
+    directory = database_path(identifier)
+    with _manifest_lock:
+        manifest = read_manifest(directory)
+        if manifest is None:
+            if os.path.isdir(directory):
+                manifest = _new_manifest(
+                    EmbeddingBackendEnum.OPENAI,
+                    DEFAULT_MODELS[EmbeddingBackendEnum.OPENAI],
+                )
+            else:
+                backend = backend or EMBEDDING_BACKEND
+                manifest = _new_manifest(backend, model or default_model(backend))
+            write_manifest(directory, manifest)
+    if (backend is not None and backend != manifest.embedding_backend) or (
+        model is not None and model != manifest.embedding_model
+    ):
+        raise StoreMismatchError(
+            f"Database '{identifier}' uses the {manifest.embedding_backend.value} "
+            f"embedding model '{manifest.embedding_model}'."
+        )
+    return manifest
+
+
+def create_vector_store(identifier: str) -> Chroma:
+    """
+    Create a vector store for a given identifier.
+
+    The store is opened with the embeddings recorded in its manifest. Local
+    embeddings are checked against the recorded dimension, which is recorded
+    now if it was not known when the store was created. With shared
+    storage the collection is opened on the shared Chroma server, otherwise
+    in the directory of the database.
+
+    Raises:
+        StoreMismatchError: If the embeddings no longer have the recorded
+            dimension.
+    """
+    manifest = load_manifest(identifier)
+    embeddings = _create_embeddings(manifest)
+    if shared_storage():
+        # Writes of other processes are only noticed relative to this version.
+        version = get_catalog().version(identifier)
+        with _write_versions_lock:
+            _write_versions.setdefault(identifier, version)
+    if manifest.embedding_backend != EmbeddingBackendEnum.OPENAI:
+        dimension = len(embeddings.embed_query("dimension probe"))
+        if not manifest.embedding_dimension:
+            with _manifest_lock:
+                manifest = read_manifest(database_path(identifier)).model_copy(
+                    update={"embedding_dimension": dimension}
+                )
+                write_manifest(database_path(identifier), manifest)
+        elif dimension != manifest.embedding_dimension:
+            raise StoreMismatchError(
+                f"Database '{identifier}' has {manifest.embedding_dimension} "
+                f"dimensions, but '{manifest.embedding_model}' embeds into "
+                f"{dimension}."
+            )
+    if shared_storage():
+        vector_store = Chroma(
+            collection_name=identifier,
+            embedding_function=embeddings,
+            client=get_chroma_client(),
+        )
+    else:
+        vector_store = Chroma(
+            collection_name=identifier,
+            embedding_function=embeddings,
+            persist_directory=database_path(identifier),
+        )
+    with SourceIndex(database_path(identifier)) as index:
+        if not index.ready:
+            _rebuild_sources(index, vector_store)
+    _update_catalog(identifier)
     return vector_store
 
 
+def _close_vector_store(vector_store: Chroma):
+    """Close a vector store unless it uses the shared Chroma client."""
+    if not shared_storage():
+        close_vector_store(vector_store)
+
+
+def _database_exists(identifier: str) -> bool:
+    """Whether the database of an identifier exists."""
+    return os.path.isdir(database_path(identifier))
+
+
+vector_stores = VectorStoreRegistry(
+    create_vector_store, _close_vector_store, exists=_database_exists
+)
+
+
+def create_database(
+    identifier: str,
+    backend: EmbeddingBackendEnum | None = None,
+    model: str | None = None,
+    llm: str | None = None,
+) -> StoreManifest:
+    """
+    Create the database of an identifier with a chosen embedding backend and
+    model, or check that an existing one uses them. A new database uses the
+    default backend and model unless they are given, an existing one is only
+    checked against those that are given.
+
+    If a language model is given, it answers the questions about the
+    identifier from now on, also if the database already exists.
+
+    Raises:
+        StoreMismatchError: If the database exists with another embedding
+            backend or model.
+    """
+    manifest = load_manifest(identifier, backend, model)
+    if llm is not None and llm != manifest.llm_model:
+        manifest = manifest.model_copy(update={"llm_model": llm})
+        with _manifest_lock:
+            write_manifest(database_path(identifier), manifest)
+        _on_write(identifier)
+    vector_stores.get(identifier)
+    # Opening the store records a dimension that was not known in advance.
+    return read_manifest(database_path(identifier))
+
+
+def llm_model(identifier: str) -> str:
+    """
+    Return the language model answering questions about an identifier.
+    """
+    manifest = read_manifest(database_path(identifier))
+    return (manifest and manifest.llm_model) or LLM_MODEL
+
+
 def get_vector_store(identifier: str) -> Chroma:
     """
     Retrieve the vector store for a given identifier, creating it if necessary.
     """
-    if identifier not in vector_stores or vector_stores[identifier] is None:
-        vector_store = create_vector_store(identifier)
-        vector_stores[identifier] = vector_store
+    return vector_stores.get(identifier)
+
+
+def _collection_pages(
+    vector_store: Chroma, include: List[str], page_size: int = COLLECTION_PAGE_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the whole collection of a vector store in fixed-size pages.
+    """
+    offset = 0
+    while True:
+        page = vector_store.get(limit=page_size, offset=offset, include=include)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+_write_versions: Dict[str, int] = {}
+_write_versions_lock = threading.Lock()
+
+
+def write_version(identifier: str) -> int:
+    """
+    Return the write version of an identifier's vector store, which changes
+    whenever its contents change.
+
+    With shared storage the version is read from the catalog, and answers
+    and the open store of this process are dropped if another process wrote
+    to the store since.
+    """
+    if not shared_storage():
+        with _write_versions_lock:
+            return _write_versions.get(identifier, 0)
+
+    version = get_catalog().version(identifier)
+    _observe_version(identifier, version, version)
+    return version
+
+
+def _observe_version(identifier: str, version: int, expected: int):
+    """
+    Record the shared write version of an identifier and drop what this
+    process derived from its store if it is not the expected one.
+    """
+    with _write_versions_lock:
+        seen = _write_versions.get(identifier)
+        _write_versions[identifier] = version
+    if seen is not None and seen != expected:
+        answer_cache.invalidate(identifier)
+        # The collection may have been deleted and created again.
+        vector_stores.remove(identifier)
+
+
+def _acquire(identifier: str, create: bool = True) -> ContextManager[Chroma]:
+    """
+    Lease the vector store of an identifier. With shared storage, the store
+    is reopened first if another process wrote to it.
+
+    Raises:
+        InvalidInputError: If the identifier cannot name a store.
+        DatabaseNotFoundError: If the database does not exist and `create`
+            is false.
+    """
+    validate_identifier(identifier)
+    if shared_storage():
+        write_version(identifier)
+    return vector_stores.acquire(identifier, create)
+
+
+@asynccontextmanager
+async def _aacquire(identifier: str, create: bool = True) -> AsyncIterator[Chroma]:
+    """
+    Lease the vector store of an identifier without blocking the event loop
+    while it is opened.
+    """
+
+    def enter() -> Tuple[ContextManager[Chroma], Chroma]:
+        lease = _acquire(identifier, create)
+        return lease, lease.__enter__()
+
+    lease, vector_store = await asyncio.to_thread(enter)
+    try:
+        yield vector_store
+    finally:
+        lease.__exit__(None, None, None)
+
+
+async def awrite_version(identifier: str) -> int:
+    """
+    Return the write version of an identifier's vector store without
+    blocking the event loop on the catalog.
+    """
+    if not shared_storage():
+        return write_version(identifier)
+    return await asyncio.to_thread(write_version, identifier)
+
+
+def _on_write(identifier: str):
+    """
+    Invalidate everything derived from the contents of an identifier's
+    vector store after it changed.
+    """
+    if shared_storage():
+        version = get_catalog().bump_version(identifier)
+        _observe_version(identifier, version, version - 1)
     else:
-        vector_store = vector_stores[identifier]
-    return vector_store
+        with _write_versions_lock:
+            _write_versions[identifier] = _write_versions.get(identifier, 0) + 1
+    answer_cache.invalidate(identifier)
+    _update_catalog(identifier, time.time())
+
+
+def _directory_usage(directory: str) -> Tuple[int, float]:
+    """Return the total size and the latest modification time of a directory."""
+    size, modified = 0, 0.0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(root, filename))
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            modified = max(modified, stat.st_mtime)
+    return size, modified
+
+
+def _catalog_entry(
+    identifier: str, last_write: float | None = None
+) -> CatalogEntry | None:
+    """
+    Compute the catalog entry of an identifier from the files of its store,
+    or None if it does not exist.
+    """
+    directory = database_path(identifier)
+    if not os.path.isdir(directory):
+        return None
+    manifest = read_manifest(directory) or StoreManifest(
+        embedding_backend=EmbeddingBackendEnum.OPENAI,
+        embedding_model=DEFAULT_MODELS[EmbeddingBackendEnum.OPENAI],
+        embedding_dimension=0,
+    )
+    chunks = pdfs = None
+    if os.path.isfile(os.path.join(directory, SOURCE_INDEX_FILENAME)):
+        with SourceIndex(directory) as index:
+            if index.ready:
+                chunks, pdfs = index.summary()
+    size, modified = _directory_usage(directory)
+    return CatalogEntry(
+        identifier=identifier,
+        chunks=chunks,
+        pdfs=pdfs,
+        bytes=size,
+        embedding_backend=manifest.embedding_backend,
+        embedding_model=manifest.embedding_model,
+        llm_model=manifest.llm_model,
+        last_write=last_write or modified,
+    )
+
+
+def _update_catalog(identifier: str, last_write: float | None = None):
+    """Refresh the catalog entry of an identifier, removing it if deleted."""
+    entry = _catalog_entry(identifier, last_write)
+    if entry is None:
+        get_catalog().remove(identifier)
+    else:
+        get_catalog().put(entry)
+
+
+def sync_catalog():
+    """
+    Reconcile the catalog with the databases in `DATA_PATH`, adding databases
+    it does not know yet and removing the ones that no longer exist.
+    """
+    data_path = os.getenv("DATA_PATH")
+    directories = glob.glob(os.path.join(data_path, "*_chroma_langchain_db"))
+    on_disk = {
+        os.path.basename(directory).removesuffix("_chroma_langchain_db")
+        for directory in directories
+    }
+    known = set(get_catalog().identifiers())
+    for identifier in on_disk - known:
+        _update_catalog(identifier)
+    for identifier in known - on_disk:
+        get_catalog().remove(identifier)
+
+
+@contextmanager
+def _writing(identifier: str) -> Iterator[None]:
+    """Call `_on_write` once a block that changes a vector store is left."""
+    try:
+        yield
+    finally:
+        _on_write(identifier)
+
+
+def _rebuild_sources(index: SourceIndex, vector_store: Chroma):
+    """Build the source index from the metadata of a collection."""
+    index.rebuild(
+        (page["ids"], page["metadatas"])
+        for page in _collection_pages(vector_store, ["metadatas"])
+    )
+
+
+@contextmanager
+def open_source_index(identifier: str, vector_store: Chroma) -> Iterator[SourceIndex]:
+    """
+    Open the source index of a given identifier, building it from the
+    collection if it does not exist yet.
+
+    The index stays open with the vector store, so the store must be leased
+    while it is used.
+    """
+    index = vector_stores.resource(
+        vector_store, "sources", lambda: SourceIndex(database_path(identifier))
+    )
+    if not index.ready:
+        _rebuild_sources(index, vector_store)
+    yield index
+
+
+@contextmanager
+def open_keyword_index(identifier: str, vector_store: Chroma) -> Iterator[KeywordIndex]:
+    """
+    Open the keyword index of a given identifier, building it from the
+    collection if it does not exist yet.
+
+    The index stays open with the vector store, so the store must be leased
+    while it is used.
+    """
+    keywords = vector_stores.resource(
+        vector_store, "keywords", lambda: KeywordIndex(database_path(identifier))
+    )
+    if not keywords.ready:
+        keywords.rebuild(
+            (page["ids"], page["documents"])
+            for page in _collection_pages(vector_store, ["documents"])
+        )
+    yield keywords
+
 
+def _index_documents(index: SourceIndex, keywords: KeywordIndex):
+    """Return a commit callback adding documents to both indexes."""
 
-def add_texts(texts: List[Text], identifier: str):
+    def on_commit(ids: List[str], documents: List[Document]):
+        index.add(ids, [document.metadata for document in documents])
+        keywords.add(ids, [document.page_content for document in documents])
+
+    return on_commit
+
+
+def add_texts(
+    texts: List[Text], identifier: str, ids: List[str] | None = None
+) -> IngestionStats:
     """
     Add texts to the vector store for a given identifier.
+
+    Texts are stored under random IDs unless IDs are given. Adding texts
+    again under the same IDs replaces them, so a retried call with the same
+    IDs does not duplicate the texts it already committed.
     """
     documents = []
     for element in texts:
@@ -61,44 +552,108 @@ def add_texts(texts: List[Text], identifier: str):
             metadata=element.metadata,
         )
         documents.append(document)
-    uuids = [str(uuid4()) for _ in range(len(documents))]
+    uuids = ids or [str(uuid4()) for _ in range(len(documents))]
 
-    vector_store = get_vector_store(identifier)
-    vector_store.add_documents(documents=documents, ids=uuids)
+    with (
+        _writing(identifier),
+        _acquire(identifier) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+        open_keyword_index(identifier, vector_store) as keywords,
+    ):
+        on_commit = _index_documents(index, keywords)
+        with EmbeddingPipeline(vector_store, on_commit=on_commit) as pipeline:
+            pipeline.add(documents, uuids)
+    return pipeline.stats
 
 
-def add_pdfs(identifier: str, pdfs: List):
+def chunk_ids(filename: str, documents: List[Document]) -> List[str]:
     """
-    Add PDFs to the vector store for a given identifier.
+    Compute deterministic content-hash ids for the chunks of a PDF.
+
+    The id of a chunk hashes the filename, the chunk text and how often the
+    same text already occurred earlier in the PDF, so re-ingesting an
+    unchanged PDF yields the same ids.
     """
-    documents = []
-    for pdf in pdfs:
-        file_path = os.path.join("/tmp", pdf.filename)
-        with open(file_path, "wb") as f:
-            f.write(pdf.file.read())
+    occurrences = {}
+    ids = []
+    for document in documents:
+        occurrence = occurrences.get(document.page_content, 0)
+        occurrences[document.page_content] = occurrence + 1
+        key = f"{filename}\x00{document.page_content}\x00{occurrence}"
+        ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest())
+    return ids
 
-        loader = PyPDFLoader(file_path)
-        pages = loader.load_and_split()
 
-        os.remove(file_path)
+def add_pdfs(identifier: str, pdfs: List) -> PdfIngestionStats:
+    """
+    Add PDFs to the vector store for a given identifier.
 
-        documents.extend(pages)
+    The PDFs are parsed in the PDF process pool. Uploading a new revision of
+    a PDF only embeds the chunks that changed, keeps the unchanged ones and
+    deletes the chunks that vanished from the PDF.
+    """
+    sources = [(pdf.filename, getattr(pdf, "path", None) or pdf.file) for pdf in pdfs]
 
-    if documents:
-        uuids = [str(uuid4()) for _ in range(len(documents))]
+    parsed = 0
+    added = skipped = removed = 0
+    with (
+        _writing(identifier),
+        _acquire(identifier) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+        open_keyword_index(identifier, vector_store) as keywords,
+    ):
+        on_commit = _index_documents(index, keywords)
+        with EmbeddingPipeline(vector_store, on_commit=on_commit) as pipeline:
+            for filename, documents in parse_pdfs(sources):
+                if not documents:
+                    continue
+                parsed += len(documents)
+                ids = chunk_ids(filename, documents)
+                existing = index.chunks([filename])
 
-        vector_store = get_vector_store(identifier)
-        vector_store.add_documents(documents=documents, ids=uuids)
-    else:
-        raise ValueError("PDF has no text pages. (Maybe all pages are images?!)")
+                new_documents, new_ids, moved_ids, moved_metadatas = [], [], [], []
+                for id_, document in zip(ids, documents):
+                    if id_ not in existing:
+                        new_documents.append(document)
+                        new_ids.append(id_)
+                    elif any(
+                        existing[id_][key] != document.metadata.get(key)
+                        for key in ("page", "total_pages")
+                    ):
+                        moved_ids.append(id_)
+                        moved_metadatas.append(document.metadata)
+                pipeline.add(new_documents, new_ids)
+                if moved_ids:
+                    vector_store._collection.update(
+                        ids=moved_ids, metadatas=moved_metadatas
+                    )
+                    index.add(moved_ids, moved_metadatas)
+
+                vanished = list(set(existing) - set(ids))
+                if vanished:
+                    vector_store.delete(vanished)
+                    index.remove(vanished)
+                    keywords.remove(vanished)
+                added += len(new_ids)
+                skipped += len(ids) - len(new_ids)
+                removed += len(vanished)
+
+    if not parsed:
+        raise InvalidInputError("PDF has no text pages. (Maybe all pages are images?!)")
+    return PdfIngestionStats(
+        **pipeline.stats.model_dump(),
+        added=added,
+        skipped=skipped,
+        removed=removed,
+    )
 
 
 def get_texts(identifier: str, ids: List[str] = None) -> Dict[str, Text]:
     """
     Retrieve texts from the vector store for a given identifier.
     """
-    vector_store = get_vector_store(identifier)
-    documents = vector_store.get(ids=ids) if ids else vector_store.get()
+    with _acquire(identifier, create=False) as vector_store:
+        documents = vector_store.get(ids=ids) if ids else vector_store.get()
 
     elements = {}
     for id_, text, metadata in zip(
@@ -109,102 +664,482 @@ def get_texts(identifier: str, ids: List[str] = None) -> Dict[str, Text]:
     return elements
 
 
+def _include(fields: TextFieldsEnum) -> List[str]:
+    if fields == TextFieldsEnum.IDS:
+        return []
+    if fields == TextFieldsEnum.METADATA:
+        return ["metadatas"]
+    return ["documents", "metadatas"]
+
+
+def _text_views(documents: Dict[str, Any]) -> Iterator[Tuple[str, TextView]]:
+    texts = documents.get("documents") or [None] * len(documents["ids"])
+    metadatas = documents.get("metadatas") or [None] * len(documents["ids"])
+    for id_, text, metadata in zip(documents["ids"], texts, metadatas):
+        yield id_, TextView(text=text, metadata=metadata)
+
+
+def get_text_page(
+    identifier: str,
+    ids: List[str] = None,
+    offset: int = 0,
+    limit: int | None = None,
+    fields: TextFieldsEnum = TextFieldsEnum.ALL,
+) -> Tuple[Dict[str, TextView], int | None]:
+    """
+    Retrieve a page of texts from the vector store for a given identifier.
+
+    Returns the texts projected to the requested fields and the offset of the
+    next page, or None if this is the last page.
+    """
+    with _acquire(identifier, create=False) as vector_store:
+        documents = vector_store.get(
+            ids=ids or None, offset=offset, limit=limit, include=_include(fields)
+        )
+
+    elements = dict(_text_views(documents))
+    next_offset = None
+    if limit is not None and len(documents["ids"]) == limit:
+        next_offset = offset + limit
+    return elements, next_offset
+
+
+def iter_texts(
+    identifier: str,
+    fields: TextFieldsEnum = TextFieldsEnum.ALL,
+    page_size: int = COLLECTION_PAGE_SIZE,
+) -> Iterator[Tuple[str, TextView]]:
+    """
+    Iterate over all texts of the vector store for a given identifier, reading
+    the collection in fixed-size pages.
+    """
+    with _acquire(identifier, create=False) as vector_store:
+        for page in _collection_pages(vector_store, _include(fields), page_size):
+            yield from _text_views(page)
+
+
 def get_pdfs(identifier: str) -> List[str]:
     """
     Retrieve PDF filenames from the vector store for a given identifier.
     """
-    documents = get_texts(identifier)
-    filenames = []
-    for element in documents.values():
-        if "source" in element.metadata:
-            source = element.metadata["source"]
-            filename = source.split("/")[-1]
-            extension = filename.split(".")[-1]
-            if extension == "pdf":
-                filenames.append(filename)
-    return list(set(filenames))
+    with (
+        _acquire(identifier, create=False) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+    ):
+        sources = index.sources()
+    return [filename for filename in sources if filename.split(".")[-1] == "pdf"]
 
 
 def get_databases() -> List[str]:
     """
-    Retrieve all database identifiers.
+    Retrieve all database identifiers from the catalog.
     """
-    data_path = os.getenv("DATA_PATH")
-    databases = glob.glob(os.path.join(data_path, "*_chroma_langchain_db"))
-    return [
-        database.split("/")[-1].replace("_chroma_langchain_db", "")
-        for database in databases
-    ]
+    return get_catalog().identifiers()
 
 
-def update_texts(identifier: str, updates: Dict[str, TextUpdate]):
+def get_database_catalog() -> List[CatalogEntry]:
+    """
+    Retrieve the catalog entries of all databases without opening them.
+    """
+    return get_catalog().entries()
+
+
+def update_texts(
+    identifier: str, updates: Dict[str, TextUpdate]
+) -> Tuple[Dict[str, UpdateOutcomeEnum], IngestionStats]:
     """
     Update texts in the vector store for a given identifier.
+
+    Only texts that changed are re-embedded, in batches through the embedding
+    pipeline. Updates that keep the text only replace the metadata, in one
+    bulk update per page of IDs. The new metadata is merged into the
+    existing one, like Chroma does, so keys it leaves out, such as the
+    source and page of a PDF chunk, are kept. IDs that do not exist are
+    reported as not found.
     """
-    vector_store = get_vector_store(identifier)
-    ids = list(updates.keys())
-    documents = vector_store.get(ids=ids)
-    for id_ in documents["ids"]:
-        updates[id_].new_metadata["time_of_creation"] = time.time()
-        document = Document(
-            page_content=updates[id_].new_text,
-            metadata=updates[id_].new_metadata,
-        )
-        vector_store.update_document(id_, document)
+    outcomes = {}
+    ids = list(updates)
+    with (
+        _writing(identifier),
+        _acquire(identifier) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+        open_keyword_index(identifier, vector_store) as keywords,
+    ):
+        on_commit = _index_documents(index, keywords)
+        with EmbeddingPipeline(vector_store, on_commit=on_commit) as pipeline:
+            for start in range(0, len(ids), COLLECTION_PAGE_SIZE):
+                page = ids[start : start + COLLECTION_PAGE_SIZE]
+                existing = vector_store.get(
+                    ids=page, include=["documents", "metadatas"]
+                )
+                texts = dict(zip(existing["ids"], existing["documents"]))
+                metadatas = dict(zip(existing["ids"], existing["metadatas"]))
+
+                changed_documents, changed_ids = [], []
+                relabeled_ids, relabeled_metadatas = [], []
+                for id_ in page:
+                    if id_ not in texts:
+                        outcomes[id_] = UpdateOutcomeEnum.NOT_FOUND
+                        continue
+                    update = updates[id_]
+                    metadata = {
+                        **(metadatas[id_] or {}),
+                        **update.new_metadata,
+                        "time_of_creation": time.time(),
+                    }
+                    if update.new_text is None or update.new_text == texts[id_]:
+                        relabeled_ids.append(id_)
+                        relabeled_metadatas.append(metadata)
+                        outcomes[id_] = UpdateOutcomeEnum.METADATA_ONLY
+                    else:
+                        changed_documents.append(
+                            Document(page_content=update.new_text, metadata=metadata)
+                        )
+                        changed_ids.append(id_)
+                        outcomes[id_] = UpdateOutcomeEnum.REEMBEDDED
+
+                pipeline.add(changed_documents, changed_ids)
+                if relabeled_ids:
+                    vector_store._collection.update(
+                        ids=relabeled_ids, metadatas=relabeled_metadatas
+                    )
+                    index.add(relabeled_ids, relabeled_metadatas)
+    return outcomes, pipeline.stats
 
 
 def delete_texts(identifier: str, ids: List[str]):
     """
     Delete texts from the vector store for a given identifier.
     """
-    vector_store = get_vector_store(identifier)
-    vector_store.delete(ids)
+    with (
+        _writing(identifier),
+        _acquire(identifier) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+        open_keyword_index(identifier, vector_store) as keywords,
+    ):
+        vector_store.delete(ids)
+        index.remove(ids)
+        keywords.remove(ids)
 
 
 def delete_pdfs(identifier: str, pdf_names: List[str]):
     """
     Delete PDFs from the vector store for a given identifier.
     """
-    documents = get_texts(identifier)
-    ids = []
-    for pdf_name in pdf_names:
-        for id_, element in documents.items():
-            if "source" in element.metadata:
-                source = element.metadata["source"]
-                filename = source.split("/")[-1]
-                if pdf_name in filename:
-                    ids.append(id_)
-    if ids:
-        delete_texts(identifier, list(set(ids)))
+    with (
+        _writing(identifier),
+        _acquire(identifier) as vector_store,
+        open_source_index(identifier, vector_store) as index,
+    ):
+        sources = [
+            filename
+            for filename in index.sources()
+            if any(pdf_name in filename for pdf_name in pdf_names)
+        ]
+        ids = list(index.chunks(sources))
+        if ids:
+            vector_store.delete(ids)
+            index.remove(ids)
+            with open_keyword_index(identifier, vector_store) as keywords:
+                keywords.remove(ids)
+
+
+def _delete_collection(identifier: str):
+    """Delete the collection of an identifier from the shared Chroma server."""
+    try:
+        get_chroma_client().delete_collection(identifier)
+    except NotFoundError:
+        pass
 
 
 def delete_databases(identifiers: List[str]):
     """
     Delete databases for given identifiers.
+
+    Every database is taken exclusively: new requests for it wait, requests
+    in flight are drained for at most `DELETE_DRAIN_TIMEOUT` seconds and its
+    store is closed. Its directory is then renamed into the tombstone area
+    and removed from disk in the background. With shared storage its
+    collection is deleted from the shared Chroma server as well.
     """
     for identifier in identifiers:
-        data_path = os.getenv("DATA_PATH")
-        filepath = os.path.join(data_path, f"{identifier}_chroma_langchain_db")
-        if os.path.isdir(filepath):
-            vector_stores[identifier] = None
-            shutil.rmtree(filepath)
+        filepath = database_path(identifier)
+        if not os.path.isdir(filepath):
+            continue
+        with (
+            vector_stores.exclusive(identifier, DELETE_DRAIN_TIMEOUT),
+            _writing(identifier),
+        ):
+            if os.path.isdir(filepath):
+                if shared_storage():
+                    _delete_collection(identifier)
+                bury(filepath)
+    reaper.wake()
 
 
-def build_question(data: Question, identifier: str) -> str:
+def _fuse(rankings: List[List[str]], k: int) -> List[Tuple[str, float]]:
+    """Merge rankings of snippet ids with reciprocal rank fusion."""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def search_snippets_many(
+    identifier: str,
+    embeddings: List[List[float]],
+    ks: List[int],
+    queries: List[str] | None = None,
+) -> List[List[Snippet]]:
     """
-    Build a question template with snippets from the vector store.
+    Search the snippets closest to several embeddings in one batched query,
+    the `ks[i]` closest ones for `embeddings[i]`.
+
+    If hybrid search is enabled and the texts of the queries are given, the
+    closest snippets are fused with the best keyword matches of `queries[i]`
+    by reciprocal rank fusion and scored by their fused rank.
     """
-    # Add question
-    template = f"Question:\n{data.question}\n\n"
+    if not embeddings:
+        return []
+    hybrid = HYBRID_SEARCH and queries is not None
+    n_results = max(ks) * HYBRID_CANDIDATES if hybrid else max(ks)
+    with stage("search"), _acquire(identifier, create=False) as vector_store:
+        results = vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        dense = [
+            [
+                Snippet(
+                    id=id_,
+                    text=text,
+                    metadata=metadata or {},
+                    score=1.0 / (1.0 + distance),
+                )
+                for id_, text, metadata, distance in zip(
+                    results["ids"][i],
+                    results["documents"][i],
+                    results["metadatas"][i],
+                    results["distances"][i],
+                )
+            ]
+            for i in range(len(embeddings))
+        ]
+        if not hybrid:
+            return [snippets[:k] for snippets, k in zip(dense, ks)]
+
+        with open_keyword_index(identifier, vector_store) as keywords:
+            matches = [keywords.search(query, n_results) for query in queries]
+        rankings = [
+            _fuse([[snippet.id for snippet in snippets], [id_ for id_, _ in found]], k)
+            for snippets, found, k in zip(dense, matches, ks)
+        ]
+        known = {snippet.id: snippet for snippets in dense for snippet in snippets}
+        missing = {id_ for ranking in rankings for id_, _ in ranking} - known.keys()
+        if missing:
+            documents = vector_store.get(
+                ids=list(missing), include=["documents", "metadatas"]
+            )
+            for id_, text, metadata in zip(
+                documents["ids"], documents["documents"], documents["metadatas"]
+            ):
+                known[id_] = Snippet(id=id_, text=text, metadata=metadata or {})
+
+    return [
+        [
+            known[id_].model_copy(update={"score": score})
+            for id_, score in ranking
+            if id_ in known
+        ]
+        for ranking in rankings
+    ]
+
+
+def search_snippets(
+    identifier: str, embedding: List[float], k: int, query: str | None = None
+) -> List[Snippet]:
+    """
+    Search the k snippets closest to an embedding in the vector store, fused
+    with the best keyword matches of `query` if hybrid search is enabled.
+    """
+    queries = [query] if query is not None else None
+    return search_snippets_many(identifier, [embedding], [k], queries)[0]
+
+
+def get_snippets(
+    identifier: str, results: List[Tuple[str, float]]
+) -> List[Snippet] | None:
+    """
+    Fetch the snippets for a list of (id, score) pairs in the given order.
 
-    # Add k snippets
-    template += "Info-Snippets:\n"
-    vector_store = get_vector_store(identifier)
-    snippets = vector_store.similarity_search(
-        data.question, k=data.k_similar_text_snippets
+    Returns None if any of the snippets no longer exists.
+    """
+    with _acquire(identifier, create=False) as vector_store:
+        documents = vector_store.get(
+            ids=[id_ for id_, _ in results], include=["documents", "metadatas"]
+        )
+    found = {
+        id_: (text, metadata)
+        for id_, text, metadata in zip(
+            documents["ids"], documents["documents"], documents["metadatas"]
+        )
+    }
+    if len(found) != len(results):
+        return None
+    return [
+        Snippet(id=id_, text=found[id_][0], metadata=found[id_][1] or {}, score=score)
+        for id_, score in results
+    ]
+
+
+def _cached_snippets(
+    data: Question, identifier: str, version: int
+) -> List[Snippet] | None:
+    results = retrieval_cache.get(
+        identifier, data.question, data.k_similar_text_snippets, version
+    )
+    if results is None:
+        return None
+    return get_snippets(identifier, results)
+
+
+def _cache_snippets(
+    data: Question, identifier: str, version: int, snippets: List[Snippet]
+):
+    retrieval_cache.put(
+        identifier,
+        data.question,
+        data.k_similar_text_snippets,
+        version,
+        [(snippet.id, snippet.score) for snippet in snippets],
     )
-    for snippet in snippets:
-        template += f"Text: {snippet.page_content}\n"
-        template += f"Metadata: {snippet.metadata}\n\n"
 
-    return template
+
+def retrieve_snippets(data: Question, identifier: str) -> List[Snippet]:
+    """
+    Retrieve the snippets most similar to a question from the vector store.
+
+    Results are cached until the vector store of the identifier changes.
+    """
+    version = write_version(identifier)
+    snippets = _cached_snippets(data, identifier, version)
+    if snippets is not None:
+        return snippets
+    with stage("embed"), _acquire(identifier, create=False) as vector_store:
+        embedding = vector_store.embeddings.embed_query(data.question)
+    snippets = search_snippets(
+        identifier, embedding, data.k_similar_text_snippets, data.question
+    )
+    _cache_snippets(data, identifier, version, snippets)
+    return snippets
+
+
+async def aembed_question(data: Question, identifier: str) -> List[float]:
+    """
+    Embed a question with the embeddings of an identifier's vector store
+    without blocking the event loop.
+    """
+    async with _aacquire(identifier, create=False) as vector_store:
+        with stage("embed"):
+            return await vector_store.embeddings.aembed_query(data.question)
+
+
+async def aretrieve_snippets(
+    data: Question, identifier: str, embedding: List[float] | None = None
+) -> List[Snippet]:
+    """
+    Retrieve the snippets most similar to a question without blocking the
+    event loop.
+
+    Results are cached until the vector store of the identifier changes. On a
+    cache miss the question is embedded with the async embedding client,
+    unless its embedding is passed in, and the Chroma search runs in a worker
+    thread.
+    """
+    version = await awrite_version(identifier)
+    snippets = await asyncio.to_thread(_cached_snippets, data, identifier, version)
+    if snippets is not None:
+        return snippets
+    if embedding is None:
+        embedding = await aembed_question(data, identifier)
+    snippets = await asyncio.to_thread(
+        search_snippets,
+        identifier,
+        embedding,
+        data.k_similar_text_snippets,
+        data.question,
+    )
+    _cache_snippets(data, identifier, version, snippets)
+    return snippets
+
+
+async def aembed_questions(
+    questions: List[Question], identifier: str
+) -> List[List[float]]:
+    """
+    Embed several questions in one embedding call without blocking the
+    event loop.
+    """
+    if not questions:
+        return []
+    async with _aacquire(identifier, create=False) as vector_store:
+        with stage("embed"):
+            return await vector_store.embeddings.aembed_documents(
+                [data.question for data in questions]
+            )
+
+
+async def aretrieve_snippets_many(
+    questions: List[Question],
+    identifier: str,
+    embeddings: List[List[float] | None] | None = None,
+) -> List[List[Snippet]]:
+    """
+    Retrieve the snippets most similar to each of several questions.
+
+    Cached results are reused. The remaining questions without a given
+    embedding are embedded in one call and searched in one batched query.
+    """
+    version = await awrite_version(identifier)
+    embeddings = list(embeddings or [None] * len(questions))
+
+    def cached() -> List[List[Snippet] | None]:
+        return [_cached_snippets(data, identifier, version) for data in questions]
+
+    snippets = await asyncio.to_thread(cached)
+    missing = [i for i, found in enumerate(snippets) if found is None]
+    unembedded = [i for i in missing if embeddings[i] is None]
+    for i, embedding in zip(
+        unembedded,
+        await aembed_questions([questions[i] for i in unembedded], identifier),
+    ):
+        embeddings[i] = embedding
+
+    found = await asyncio.to_thread(
+        search_snippets_many,
+        identifier,
+        [embeddings[i] for i in missing],
+        [questions[i].k_similar_text_snippets for i in missing],
+        [questions[i].question for i in missing],
+    )
+    for i, question_snippets in zip(missing, found):
+        snippets[i] = question_snippets
+        _cache_snippets(questions[i], identifier, version, question_snippets)
+    return snippets
+
+
+def format_question(data: Question, snippets: List[Snippet]) -> str:
+    """
+    Format a question and its snippets into the user message of the prompt.
+    """
+    messages, _ = build_prompt(data, snippets)
+    return messages[-1]["content"]
+
+
+def build_question(data: Question, identifier: str) -> str:
+    """
+    Build a question template with snippets from the vector store.
+    """
+    return format_question(data, retrieve_snippets(data, identifier))
@@ -0,0 +1,171 @@
+"""
+This module provides the backends answering questions with chat completions.
+
+``openai``
+    The OpenAI chat completions API, or any OpenAI-compatible server such as
+    a local model behind vLLM or llama.cpp when ``OPENAI_BASE_URL`` is set.
+``fake``
+    A built-in stand-in that answers after ``FAKE_LLM_LATENCY`` seconds at
+    ``FAKE_LLM_TOKENS_PER_SECOND`` tokens per second, to load-test and
+    benchmark fRAGme without a model.
+
+The backend is chosen with ``LLM_BACKEND``. The model is ``LLM_MODEL`` unless
+the database of an identifier was created with its own model.
+"""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Tuple
+
+from pydantic import BaseModel
+
+from fRAGme.models.v1.cmd import ChatAction, RoleEnum
+from fRAGme.util.v1.embedding_pipeline import count_tokens
+from fRAGme.util.v1.openai_client import get_openai_client
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.2"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "100"))
+FAKE_LLM_ANSWER_TOKENS = int(os.getenv("FAKE_LLM_ANSWER_TOKENS", "64"))
+
+_USAGE_FIELDS = {"prompt_tokens", "completion_tokens", "total_tokens"}
+
+
+class CompletionChunk(BaseModel):
+    """A piece of a streamed completion: new content, the role or the usage."""
+
+    role: RoleEnum | None = None
+    content: str | None = None
+    usage: Dict[str, int] | None = None
+
+
+class CompletionBackend(ABC):
+    """
+    Interface of the backends answering chat messages.
+    """
+
+    @abstractmethod
+    async def complete(
+        self, model: str, messages: List[dict]
+    ) -> Tuple[ChatAction, Dict[str, int] | None]:
+        """
+        Return the answer to chat messages and the token usage, if known.
+        """
+
+    @abstractmethod
+    def stream(
+        self, model: str, messages: List[dict]
+    ) -> AsyncIterator[CompletionChunk]:
+        """
+        Stream the answer to chat messages chunk by chunk.
+        """
+
+
+class OpenAIBackend(CompletionBackend):
+    """
+    Chat completions of the OpenAI API or an OpenAI-compatible server.
+    """
+
+    async def complete(
+        self, model: str, messages: List[dict]
+    ) -> Tuple[ChatAction, Dict[str, int] | None]:
+        completion = await get_openai_client().chat.completions.create(
+            model=model, messages=messages
+        )
+        answer = completion.choices[0].message
+        usage = None
+        if completion.usage is not None:
+            usage = completion.usage.model_dump(include=_USAGE_FIELDS)
+        return ChatAction(role=answer.role, content=answer.content), usage
+
+    async def stream(
+        self, model: str, messages: List[dict]
+    ) -> AsyncIterator[CompletionChunk]:
+        stream = await get_openai_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in stream:
+            if chunk.usage is not None:
+                yield CompletionChunk(
+                    usage=chunk.usage.model_dump(include=_USAGE_FIELDS)
+                )
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            yield CompletionChunk(role=delta.role or None, content=delta.content)
+
+
+class FakeBackend(CompletionBackend):
+    """
+    Stand-in answering every question with a fixed number of tokens after a
+    fixed latency and at a fixed token rate, without any model.
+    """
+
+    def __init__(
+        self,
+        latency: float = FAKE_LLM_LATENCY,
+        tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+        answer_tokens: int = FAKE_LLM_ANSWER_TOKENS,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+
+    def _tokens(self, messages: List[dict]) -> List[str]:
+        question = messages[-1]["content"] if messages else ""
+        words = question.split()[: self.answer_tokens] or ["answer"]
+        return [words[i % len(words)] + " " for i in range(self.answer_tokens)]
+
+    def _usage(self, messages: List[dict]) -> Dict[str, int]:
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": self.answer_tokens,
+            "total_tokens": prompt_tokens + self.answer_tokens,
+        }
+
+    async def complete(
+        self, model: str, messages: List[dict]
+    ) -> Tuple[ChatAction, Dict[str, int] | None]:
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += self.answer_tokens / self.tokens_per_second
+        await asyncio.sleep(delay)
+        answer = ChatAction(
+            role=RoleEnum.ASSISTANT, content="".join(self._tokens(messages)).strip()
+        )
+        return answer, self._usage(messages)
+
+    async def stream(
+        self, model: str, messages: List[dict]
+    ) -> AsyncIterator[CompletionChunk]:
+        await asyncio.sleep(self.latency)
+        yield CompletionChunk(role=RoleEnum.ASSISTANT)
+        for token in self._tokens(messages):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield CompletionChunk(content=token)
+        yield CompletionChunk(usage=self._usage(messages))
+
+
+_BACKENDS = {"openai": OpenAIBackend, "fake": FakeBackend}
+_backend: CompletionBackend | None = None
+
+
+def get_completion_backend() -> CompletionBackend:
+    """
+    Return the completion backend chosen with ``LLM_BACKEND``.
+    """
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND not in _BACKENDS:
+            raise ValueError(
+                f"Unknown LLM_BACKEND '{LLM_BACKEND}', use one of {sorted(_BACKENDS)}."
+            )
+        _backend = _BACKENDS[LLM_BACKEND]()
+    return _backend
@@ -0,0 +1,160 @@
+"""
+This module provides the embedding backends a vector store can be created with.
+
+``openai``
+    The OpenAI embeddings API, the default.
+``local``
+    A sentence-transformers model running on the local CPU or GPU, for
+    offline deployments without network round-trips. It needs the ``local``
+    extra (``pip install fRAGme[local]``).
+``hash``
+    A deterministic feature-hashing embedder without any model, for tests.
+
+New vector stores use ``EMBEDDING_BACKEND`` and ``EMBEDDING_MODEL`` unless a
+backend is chosen when the database is created.
+"""
+
+import functools
+import hashlib
+import math
+import os
+import re
+import threading
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from fRAGme.models.v1.data import EmbeddingBackendEnum
+
+EMBEDDING_BACKEND = EmbeddingBackendEnum(os.getenv("EMBEDDING_BACKEND", "openai"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+LOCAL_EMBEDDING_DEVICE = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+
+DEFAULT_MODELS = {
+    EmbeddingBackendEnum.OPENAI: "text-embedding-3-large",
+    EmbeddingBackendEnum.LOCAL: "sentence-transformers/all-MiniLM-L6-v2",
+    EmbeddingBackendEnum.HASH: "hash-256",
+}
+
+# Dimensions of the models whose stores are created without embedding a text.
+KNOWN_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def default_model(backend: EmbeddingBackendEnum) -> str:
+    """
+    Return the model used for a backend if none is chosen.
+    """
+    if EMBEDDING_MODEL and backend == EMBEDDING_BACKEND:
+        return EMBEDDING_MODEL
+    return DEFAULT_MODELS[backend]
+
+
+def known_dimension(backend: EmbeddingBackendEnum, model: str) -> int | None:
+    """
+    Return the dimension of a model without embedding anything, or None if it
+    is not known in advance.
+    """
+    if backend == EmbeddingBackendEnum.HASH:
+        return HashEmbeddings(model).dimension
+    return KNOWN_DIMENSIONS.get(model)
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic embeddings hashing the words of a text into a fixed number
+    of signed buckets. The model name ``hash-<dimension>`` sets the dimension.
+    """
+
+    def __init__(self, model: str = "hash-256"):
+        self.dimension = int(model.rsplit("-", 1)[-1])
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in _TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_sentence_transformer(model: str, device: str):
+    """Load a sentence-transformers model once per process."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "The local embedding backend needs sentence-transformers. "
+            "Install it with `pip install fRAGme[local]`."
+        ) from e
+    if LOCAL_EMBEDDING_THREADS > 0:
+        import torch
+
+        torch.set_num_threads(LOCAL_EMBEDDING_THREADS)
+    return SentenceTransformer(model, device=device)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings computed by a local sentence-transformers model in batches.
+
+    Models are loaded once per process and shared by all vector stores. Calls
+    are serialized, since every batch already uses all inference threads.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        model: str,
+        device: str = LOCAL_EMBEDDING_DEVICE,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+    ):
+        self.model = model
+        self.device = device
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encoder = _load_sentence_transformer(self.model, self.device)
+        with self._lock:
+            vectors = encoder.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings(backend: EmbeddingBackendEnum, model: str) -> Embeddings:
+    """
+    Create the embeddings of a backend and model.
+    """
+    if backend == EmbeddingBackendEnum.OPENAI:
+        return OpenAIEmbeddings(model=model)
+    if backend == EmbeddingBackendEnum.LOCAL:
+        return LocalEmbeddings(model)
+    return HashEmbeddings(model)
@@ -0,0 +1,253 @@
+"""
+This module provides a batched, concurrent embedding pipeline for ingestion.
+
+Documents are grouped into batches of at most ``EMBEDDING_BATCH_SIZE`` chunks
+and ``EMBEDDING_BATCH_TOKENS`` tokens. Up to ``EMBEDDING_CONCURRENCY`` batches
+are embedded at the same time and every batch is written to Chroma as soon as
+its embeddings arrive, so a failure only loses the batches still in flight.
+Rate limits halve the number of batches in flight and are retried with
+exponential backoff; successful batches raise the limit again.
+"""
+
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import openai
+import tiktoken
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from fRAGme.models.v1.data import IngestionStats
+from fRAGme.util.v1.metrics import (
+    EMBEDDING_RETRIES,
+    INGESTED_CHUNKS,
+    INGESTED_TOKENS,
+)
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "250000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "8"))
+EMBEDDING_MAX_BACKOFF = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(name: str):
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # The encoding is downloaded on first use unless it is cached in
+        # TIKTOKEN_CACHE_DIR, which fails offline.
+        logger.warning(
+            "Cannot load the tiktoken encoding %s, estimating token counts "
+            "from the text length instead: %s",
+            name,
+            e,
+        )
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = "cl100k_base") -> int:
+    """
+    Count the tokens of a text, by default for the OpenAI embedding models.
+
+    Falls back to an estimate of four characters per token, with a warning,
+    if the encoding cannot be loaded.
+    """
+    encoding = _encoding(encoding_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(
+        error,
+        (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        ),
+    )
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _AdaptiveLimit:
+    """Limit of batches in flight that halves on rate limits and grows back."""
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def decrease(self):
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+
+    def increase(self):
+        with self._condition:
+            if self.limit < self.maximum:
+                self.limit += 1
+                self._condition.notify_all()
+
+
+class EmbeddingPipeline:
+    """
+    Embed documents in concurrent batches and commit each batch to a vector store.
+
+    Use it as a context manager: documents passed to `add` are batched and
+    submitted as the batches fill up, and leaving the block flushes the last
+    batch, waits for all batches and raises the first error that occurred.
+    `on_commit` is called with the ids and documents of every committed batch.
+    """
+
+    def __init__(
+        self,
+        vector_store: Chroma,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        on_commit: Callable[[List[str], List[Document]], None] | None = None,
+    ):
+        self.vector_store = vector_store
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_retries = max_retries
+        self.stats = IngestionStats()
+        self._limit = _AdaptiveLimit(concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="fragme-embed"
+        )
+        self._lock = threading.Lock()
+        self._error: Exception | None = None
+        self._documents: List[Document] = []
+        self._ids: List[str] = []
+        self._tokens = 0
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc is None and self._error is None:
+                self.flush()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=exc is not None)
+            self._finish_stats()
+        if exc is None and self._error is not None:
+            raise self._error
+
+    def add(self, documents: List[Document], ids: List[str]):
+        """
+        Queue documents with their ids for embedding.
+        """
+        for document, id_ in zip(documents, ids):
+            tokens = count_tokens(document.page_content)
+            if self._documents and (
+                len(self._documents) >= self.batch_size
+                or self._tokens + tokens > self.batch_tokens
+            ):
+                self.flush()
+            self._documents.append(document)
+            self._ids.append(id_)
+            self._tokens += tokens
+
+    def flush(self):
+        """
+        Submit the current partial batch.
+        """
+        if self._error is not None:
+            raise self._error
+        if not self._documents:
+            return
+        batch = (self._documents, self._ids, self._tokens)
+        self._documents, self._ids, self._tokens = [], [], 0
+        self._limit.acquire()
+        self._executor.submit(self._process, *batch)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                embeddings = self.vector_store.embeddings.embed_documents(texts)
+                self._limit.increase()
+                return embeddings
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if isinstance(e, openai.RateLimitError):
+                    self._limit.decrease()
+                delay = _retry_after(e)
+                if delay is None:
+                    backoff = min(EMBEDDING_MAX_BACKOFF, 2**attempt)
+                    delay = backoff * random.uniform(0.5, 1.5)
+                with self._lock:
+                    self.stats.retries += 1
+                EMBEDDING_RETRIES.inc()
+                attempt += 1
+                time.sleep(delay)
+
+    def _process(self, documents: List[Document], ids: List[str], tokens: int):
+        try:
+            if self._error is not None:
+                return
+            embeddings = self._embed([document.page_content for document in documents])
+            self.vector_store._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[document.page_content for document in documents],
+                metadatas=[document.metadata or None for document in documents],
+            )
+            if self.on_commit is not None:
+                self.on_commit(ids, documents)
+            with self._lock:
+                self.stats.chunks += len(documents)
+                self.stats.batches += 1
+                self.stats.tokens += tokens
+            INGESTED_CHUNKS.inc(len(documents))
+            INGESTED_TOKENS.inc(tokens)
+        except Exception as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+        finally:
+            self._limit.release()
+
+    def _finish_stats(self):
+        seconds = time.perf_counter() - self._start
+        self.stats.seconds = seconds
+        if seconds > 0:
+            self.stats.chunks_per_second = self.stats.chunks / seconds
+            self.stats.tokens_per_second = self.stats.tokens / seconds
@@ -0,0 +1,52 @@
+"""
+This module maps the errors raised while handling a request to HTTP errors.
+
+Failures of the OpenAI API are passed on with a status telling clients
+whether to back off (429), retry later (502, 504) or fix their request (400),
+instead of a generic internal server error. Reading a database that does not
+exist is reported as 404, input fRAGme refuses to process as 400.
+"""
+
+import openai
+from fastapi import HTTPException
+
+from fRAGme.util.v1.metrics import counter
+from fRAGme.util.v1.store_manifest import DatabaseNotFoundError, StoreMismatchError
+
+ERRORS = counter("fragme_errors", "Failed requests by HTTP status and error type.")
+
+
+class InvalidInputError(ValueError):
+    """Raised when the input of a request cannot be processed."""
+
+
+def error_status(error: Exception) -> int:
+    """
+    Return the HTTP status of an error raised while handling a request.
+    """
+    if isinstance(error, openai.RateLimitError):
+        return 429
+    if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        return 504
+    if isinstance(error, openai.BadRequestError):
+        return 400
+    if isinstance(error, (openai.APIConnectionError, openai.APIStatusError)):
+        return 502
+    if isinstance(error, DatabaseNotFoundError):
+        return 404
+    if isinstance(error, StoreMismatchError):
+        return 409
+    if isinstance(error, InvalidInputError):
+        return 400
+    return 500
+
+
+def http_exception(error: Exception) -> HTTPException:
+    """
+    Convert an error into the HTTPException reported to the client.
+    """
+    if isinstance(error, HTTPException):
+        return error
+    status = error_status(error)
+    ERRORS.inc(status=str(status), error=type(error).__name__)
+    return HTTPException(status_code=status, detail=str(error))
@@ -0,0 +1,354 @@
+"""
+This module provides a background job queue for ingesting texts and PDFs.
+
+Submitting a job persists its payload under ``DATA_PATH/jobs`` and returns
+immediately. A local pool of worker threads processes the jobs, records their
+progress after every committed batch and resumes unfinished jobs after a
+restart.
+
+The state of a job on disk is authoritative and only changed under a file
+lock, and a worker claims a job with a second file lock while running it.
+Several worker processes on one host sharing ``DATA_PATH`` can thus serve one
+queue: every job runs in one of them at a time, any of them can report or
+cancel it, and the unfinished jobs of a process that died are resumed by the
+next one to start. File locks are not reliable on network filesystems, so the
+processes cannot be spread over several hosts.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List
+from uuid import UUID, uuid4, uuid5
+
+from fRAGme.models.v1.data import Job, JobKindEnum, JobStatusEnum, Text
+from fRAGme.util.v1.chroma_handler import add_pdfs, add_texts, validate_identifier
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TEXT_BATCH_SIZE = int(os.getenv("JOB_TEXT_BATCH_SIZE", "256"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+LOCK_FILENAME = "job.lock"
+CLAIM_FILENAME = "claim.lock"
+# Files of a job kept once it finished. Removing a lock file while another
+# process holds it would let a third one take it a second time.
+KEPT_FILENAMES = ("job.json", LOCK_FILENAME, CLAIM_FILENAME)
+
+FINISHED_STATES = (
+    JobStatusEnum.SUCCEEDED,
+    JobStatusEnum.FAILED,
+    JobStatusEnum.CANCELLED,
+)
+
+
+def text_ids(job_id: str, start: int, count: int) -> List[str]:
+    """
+    Return the IDs of the texts of a job from index `start` on.
+
+    The IDs only depend on the job and the position of a text, so a batch
+    that is resumed after a crash or a cancel partway through replaces the
+    chunks it already committed instead of adding them twice.
+    """
+    namespace = UUID(job_id)
+    return [str(uuid5(namespace, str(index))) for index in range(start, start + count)]
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+class StoredPdf:
+    """
+    A PDF persisted with a job, exposing the same `filename` and `file`
+    attributes as an uploaded file.
+    """
+
+    def __init__(self, filename: str, path: str):
+        self.filename = filename
+        self.path = path
+        self.file: BinaryIO | None = None
+
+    def __enter__(self):
+        self.file = open(self.path, "rb")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+class JobManager:
+    """
+    Persistent queue of ingestion jobs processed by a local worker pool.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.path = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _job_dir(self, job_id: str) -> str:
+        if not job_id or os.path.basename(job_id) != job_id or job_id.startswith("."):
+            raise KeyError(job_id)
+        return os.path.join(self.path, job_id)
+
+    def _save(self, job: Job):
+        """Atomically persist the state of a job."""
+        filename = os.path.join(self._job_dir(job.id), "job.json")
+        with open(filename + ".tmp", "w", encoding="utf-8") as f:
+            f.write(job.model_dump_json())
+        os.replace(filename + ".tmp", filename)
+
+    def _load(self, job_id: str) -> Job:
+        """Read the state of a job from disk."""
+        filename = os.path.join(self._job_dir(job_id), "job.json")
+        try:
+            with open(filename, encoding="utf-8") as f:
+                return Job.model_validate_json(f.read())
+        except FileNotFoundError:
+            raise KeyError(job_id) from None
+
+    @contextmanager
+    def _lock_file(self, job_id: str, name: str, blocking: bool) -> Iterator[bool]:
+        """
+        Hold an exclusive lock on a file of a job for the duration of a block
+        and yield whether it was taken. The lock is released when the file is
+        closed, also if the process dies.
+        """
+        try:
+            f = open(os.path.join(self._job_dir(job_id), name), "a")
+        except FileNotFoundError:
+            raise KeyError(job_id) from None
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+
+    def _locked(self, job_id: str):
+        """Serialize changes to the state of a job across threads and processes."""
+        return self._lock_file(job_id, LOCK_FILENAME, blocking=True)
+
+    def _claim(self, job_id: str):
+        """Try to claim a job for processing in this thread."""
+        return self._lock_file(job_id, CLAIM_FILENAME, blocking=False)
+
+    def _update(self, job_id: str, **changes) -> Job:
+        with self._locked(job_id):
+            job = self._load(job_id).model_copy(update=changes)
+            self._save(job)
+        return job
+
+    def start(self):
+        """
+        Load persisted jobs, drop expired ones and resume unfinished ones.
+        """
+        self.path = os.path.abspath(os.path.join(os.getenv("DATA_PATH"), "jobs"))
+        os.makedirs(self.path, exist_ok=True)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="fragme-job"
+        )
+        now = time.time()
+        for job_id in sorted(os.listdir(self.path)):
+            try:
+                job = self._load(job_id)
+            except KeyError:
+                continue
+            if job.status in FINISHED_STATES:
+                if now - job.finished > JOB_RETENTION:
+                    shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                continue
+            with self._claim(job_id) as claimed:
+                if not claimed:
+                    # Running in another worker process.
+                    continue
+                self._update(job_id, status=JobStatusEnum.PENDING)
+            self._executor.submit(self._run, job_id)
+
+    def shutdown(self):
+        """
+        Stop the worker pool. Running jobs are resumed on the next start.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _submit(self, job: Job) -> Job:
+        self._save(job)
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def submit_texts(self, identifier: str, texts: List[Text]) -> Job:
+        """
+        Queue texts for ingestion into the vector store of an identifier.
+
+        Raises:
+            InvalidInputError: If the identifier cannot name a store.
+        """
+        validate_identifier(identifier)
+        job = Job(
+            id=str(uuid4()),
+            kind=JobKindEnum.ADD_TEXTS,
+            identifier=identifier,
+            total=len(texts),
+            created=time.time(),
+        )
+        os.makedirs(self._job_dir(job.id))
+        with open(
+            os.path.join(self._job_dir(job.id), "texts.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump([text.model_dump() for text in texts], f)
+        return self._submit(job)
+
+    def submit_pdfs(self, identifier: str, pdfs: List) -> Job:
+        """
+        Queue uploaded PDFs for ingestion into the vector store of an identifier.
+
+        Raises:
+            InvalidInputError: If the identifier cannot name a store.
+        """
+        validate_identifier(identifier)
+        job = Job(
+            id=str(uuid4()),
+            kind=JobKindEnum.ADD_PDFS,
+            identifier=identifier,
+            total=len(pdfs),
+            filenames=[pdf.filename for pdf in pdfs],
+            created=time.time(),
+        )
+        os.makedirs(self._job_dir(job.id))
+        for index, pdf in enumerate(pdfs):
+            with open(os.path.join(self._job_dir(job.id), f"{index}.pdf"), "wb") as f:
+                shutil.copyfileobj(pdf.file, f)
+        return self._submit(job)
+
+    def get(self, job_id: str) -> Job:
+        """
+        Return a job by its ID.
+
+        Raises:
+            KeyError: If no job with this ID exists.
+        """
+        return self._load(job_id)
+
+    def list(
+        self, identifier: str | None = None, status: JobStatusEnum | None = None
+    ) -> List[Job]:
+        """
+        Return all jobs, optionally filtered by identifier and status.
+        """
+        jobs = []
+        for job_id in os.listdir(self.path):
+            try:
+                jobs.append(self._load(job_id))
+            except KeyError:
+                continue
+        return sorted(
+            (
+                job
+                for job in jobs
+                if (identifier is None or job.identifier == identifier)
+                and (status is None or job.status == status)
+            ),
+            key=lambda job: job.created,
+        )
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a job. Pending jobs are cancelled immediately, running jobs
+        stop after their current batch.
+
+        Raises:
+            KeyError: If no job with this ID exists.
+        """
+        with self._locked(job_id):
+            job = self._load(job_id)
+            if job.status == JobStatusEnum.PENDING:
+                job = job.model_copy(
+                    update={"status": JobStatusEnum.CANCELLED, "finished": time.time()}
+                )
+                self._save(job)
+            elif job.status == JobStatusEnum.RUNNING:
+                job = job.model_copy(update={"cancel_requested": True})
+                self._save(job)
+                return job
+            else:
+                return job
+        self._remove_payload(job_id)
+        return job
+
+    def _progress(self, job_id: str, processed: int):
+        """Record progress and stop the worker if the job has been cancelled."""
+        job = self._update(job_id, processed=processed)
+        if job.cancel_requested:
+            raise JobCancelled()
+
+    def _run(self, job_id: str):
+        with self._claim(job_id) as claimed:
+            if not claimed:
+                # Another worker process is already running this job.
+                return
+            with self._locked(job_id):
+                job = self._load(job_id)
+                if job.status != JobStatusEnum.PENDING:
+                    return
+                job = job.model_copy(
+                    update={"status": JobStatusEnum.RUNNING, "started": time.time()}
+                )
+                self._save(job)
+            try:
+                if job.cancel_requested:
+                    raise JobCancelled()
+                if job.kind == JobKindEnum.ADD_TEXTS:
+                    self._run_texts(job)
+                else:
+                    self._run_pdfs(job)
+            except JobCancelled:
+                self._update(
+                    job_id, status=JobStatusEnum.CANCELLED, finished=time.time()
+                )
+            except Exception as e:
+                self._update(
+                    job_id,
+                    status=JobStatusEnum.FAILED,
+                    error=str(e),
+                    finished=time.time(),
+                )
+            else:
+                self._update(
+                    job_id, status=JobStatusEnum.SUCCEEDED, finished=time.time()
+                )
+            self._remove_payload(job_id)
+
+    def _run_texts(self, job: Job):
+        with open(
+            os.path.join(self._job_dir(job.id), "texts.json"), encoding="utf-8"
+        ) as f:
+            texts = [Text(**text) for text in json.load(f)]
+        for start in range(job.processed, len(texts), JOB_TEXT_BATCH_SIZE):
+            batch = texts[start : start + JOB_TEXT_BATCH_SIZE]
+            add_texts(batch, job.identifier, text_ids(job.id, start, len(batch)))
+            self._progress(job.id, start + len(batch))
+
+    def _run_pdfs(self, job: Job):
+        for index in range(job.processed, len(job.filenames)):
+            path = os.path.join(self._job_dir(job.id), f"{index}.pdf")
+            with StoredPdf(job.filenames[index], path) as pdf:
+                add_pdfs(job.identifier, [pdf])
+            self._progress(job.id, index + 1)
+
+    def _remove_payload(self, job_id: str):
+        """Delete the uploaded payload of a finished job but keep its record."""
+        job_dir = self._job_dir(job_id)
+        with self._locked(job_id):
+            for filename in os.listdir(job_dir):
+                if filename not in KEPT_FILENAMES:
+                    os.remove(os.path.join(job_dir, filename))
+
+
+job_manager = JobManager()
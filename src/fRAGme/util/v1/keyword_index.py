@@ -0,0 +1,164 @@
+"""
+This module provides a per-identifier full-text index of chunk texts.
+
+The index is a SQLite FTS5 table next to the Chroma files of an identifier.
+It ranks chunks with BM25, so exact terms such as identifiers, part numbers
+and error codes are found even when the dense embeddings miss them.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List, Tuple
+
+KEYWORD_INDEX_FILENAME = "fragme_keywords.sqlite3"
+
+# SQLite limits the number of host parameters per statement.
+_SQL_BATCH_SIZE = 500
+
+# Hyphens and underscores are kept inside tokens so that terms like "E-1042"
+# or "max_open" are matched as a whole.
+_TOKENIZER = "unicode61 tokenchars '-_'"
+_TOKEN_PATTERN = re.compile(r"\w[\w\-]*")
+
+
+def _batches(items: List, size: int = _SQL_BATCH_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def keyword_query(text: str) -> str | None:
+    """
+    Build an FTS5 query matching any of the terms of a text, or None if the
+    text has no terms.
+    """
+    terms = dict.fromkeys(token.lower() for token in _TOKEN_PATTERN.findall(text))
+    if not terms:
+        return None
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class KeywordIndex:
+    """
+    SQLite FTS5 index of chunk texts ranked with BM25.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, KEYWORD_INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks "
+            "(rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts "
+            f'USING fts5(text, tokenize = "{_TOKENIZER}")'
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the index has been built for the existing collection.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'ready'"
+            ).fetchone()
+        return row is not None
+
+    def rebuild(self, pages: Iterable[Tuple[List[str], List[str]]]):
+        """
+        Rebuild the index from pages of (ids, texts) of the whole collection.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                row = self._connection.execute(
+                    "SELECT value FROM meta WHERE key = 'ready'"
+                ).fetchone()
+                if row is not None:
+                    return
+                self._connection.execute("DELETE FROM chunks")
+                self._connection.execute("DELETE FROM chunks_fts")
+                for ids, texts in pages:
+                    self._remove(ids)
+                    self._insert(ids, texts)
+                self._connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('ready', '1')"
+                )
+
+    def _remove(self, ids: List[str]):
+        for batch in _batches(list(ids)):
+            placeholders = ",".join("?" * len(batch))
+            rowids = [
+                (rowid,)
+                for (rowid,) in self._connection.execute(
+                    f"SELECT rowid FROM chunks WHERE id IN ({placeholders})", batch
+                )
+            ]
+            self._connection.executemany(
+                "DELETE FROM chunks_fts WHERE rowid = ?", rowids
+            )
+            self._connection.executemany("DELETE FROM chunks WHERE rowid = ?", rowids)
+
+    def _insert(self, ids: List[str], texts: List[str | None]):
+        for id_, text in zip(ids, texts):
+            cursor = self._connection.execute(
+                "INSERT INTO chunks (id) VALUES (?)", (id_,)
+            )
+            self._connection.execute(
+                "INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)",
+                (cursor.lastrowid, text or ""),
+            )
+
+    def add(self, ids: List[str], texts: List[str | None]):
+        """
+        Add or replace the indexed texts of chunks.
+        """
+        with self._lock:
+            with self._connection:
+                self._remove(ids)
+                self._insert(ids, texts)
+
+    def remove(self, ids: List[str]):
+        """
+        Remove chunks from the index.
+        """
+        with self._lock:
+            with self._connection:
+                self._remove(ids)
+
+    def search(self, text: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Return the ids and BM25 scores of the k chunks best matching the terms
+        of a text, best first. Higher scores are better.
+        """
+        query = keyword_query(text)
+        if query is None:
+            return []
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT chunks.id, bm25(chunks_fts) AS rank FROM chunks_fts "
+                "JOIN chunks ON chunks.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, k),
+            ).fetchall()
+        return [(id_, -rank) for id_, rank in rows]
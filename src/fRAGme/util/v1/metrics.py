@@ -0,0 +1,271 @@
+"""
+This module collects the metrics of the service in the Prometheus text format.
+
+Requests are timed per stage, such as embedding the question, searching the
+vector store, building the prompt, the completion and serializing the
+response. Every stage is recorded in the ``fragme_stage_seconds`` histogram
+and in the ``Server-Timing`` header of the request it ran in, so the latency
+of a single slow request can be attributed as well. Ingestion counters and
+the statistics of the caches are exported next to them on ``/metrics``.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Upper bounds of the latency histograms in seconds.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_timings: contextvars.ContextVar[Dict[str, float] | None] = contextvars.ContextVar(
+    "fragme_timings", default=None
+)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Monotonically increasing counter with optional labels.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """
+        Increase the counter of a label combination.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}_total{_format_labels(key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """
+    Histogram of observed values with cumulative buckets and optional labels.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        """
+        Record a value for a label combination.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per-bucket counts followed by the sum of all values.
+            counts = self._values.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(key + (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {counts[-1]!r}")
+            lines.append(
+                f"{self.name}_count{_format_labels(key)} {_format_value(cumulative)}"
+            )
+        return lines
+
+
+_metrics: List[Counter | Histogram] = []
+_collectors: List[Callable[[], Dict[str, Dict[str, int]]]] = []
+
+
+def counter(name: str, documentation: str) -> Counter:
+    """
+    Create and register a counter.
+    """
+    metric = Counter(name, documentation)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, documentation: str) -> Histogram:
+    """
+    Create and register a latency histogram.
+    """
+    metric = Histogram(name, documentation)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector: Callable[[], Dict[str, Dict[str, int]]]):
+    """
+    Register a callback returning the statistics of caches by cache name.
+
+    Every statistic is exported as the gauge ``fragme_cache_<statistic>`` with
+    the name of the cache as the ``cache`` label.
+    """
+    _collectors.append(collector)
+
+
+REQUEST_SECONDS = histogram(
+    "fragme_request_seconds", "Time until the response of a request started."
+)
+STAGE_SECONDS = histogram(
+    "fragme_stage_seconds", "Time spent in a stage of handling a request."
+)
+INGESTED_PAGES = counter("fragme_ingested_pages", "PDF pages parsed for ingestion.")
+INGESTED_CHUNKS = counter(
+    "fragme_ingested_chunks", "Chunks embedded and written to a vector store."
+)
+INGESTED_TOKENS = counter("fragme_ingested_tokens", "Tokens of the embedded chunks.")
+EMBEDDING_RETRIES = counter(
+    "fragme_embedding_retries", "Embedding calls retried after a transient error."
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a stage of the current request.
+
+    The duration is recorded in the stage histogram and added to the
+    ``Server-Timing`` header of the request, if the stage runs in one.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    Format stage durations as a ``Server-Timing`` header value.
+    """
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+    )
+
+
+def render() -> str:
+    """
+    Render all metrics and cache statistics in the Prometheus text format.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+
+    gauges: Dict[str, List[str]] = {}
+    for collector in _collectors:
+        for cache, stats in collector().items():
+            for statistic, value in stats.items():
+                name = f"fragme_cache_{statistic}"
+                labels = _format_labels((("cache", cache),))
+                gauges.setdefault(name, []).append(
+                    f"{name}{labels} {_format_value(value)}"
+                )
+    for name, samples in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request.
+
+    The stages timed while handling a request are sent in its
+    ``Server-Timing`` header together with the total time until the response
+    started. Streamed responses only include the stages before the stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                seconds = time.perf_counter() - start
+                # Unknown paths share one label to bound the number of series.
+                path = scope["path"] if "route" in scope else "unmatched"
+                REQUEST_SECONDS.observe(
+                    seconds,
+                    method=scope["method"],
+                    path=path,
+                    status=str(message["status"]),
+                )
+                header = server_timing({**timings, "total": seconds})
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
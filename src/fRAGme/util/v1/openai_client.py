@@ -0,0 +1,62 @@
+"""
+This module manages the process-wide asynchronous OpenAI client.
+
+The client is created once in the application lifespan and shared by all
+requests, so HTTP connections to the OpenAI API are pooled and kept alive
+instead of being rebuilt for every question.
+"""
+
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50")
+)
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def init_openai_client() -> AsyncOpenAI:
+    """
+    Create the shared AsyncOpenAI client with a pooled HTTP transport.
+    """
+    global _client
+    if _client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            )
+        )
+        base_url = os.getenv("OPENAI_BASE_URL") or None
+        api_key = os.getenv("OPENAI_API_KEY")
+        if base_url and not api_key:
+            # OpenAI-compatible servers often need no key, the client does.
+            api_key = "not-needed"
+        _client = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, http_client=http_client
+        )
+    return _client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client, creating it if the lifespan did not.
+    """
+    if _client is None:
+        return init_openai_client()
+    return _client
+
+
+async def close_openai_client():
+    """
+    Close the shared AsyncOpenAI client and its connection pool.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
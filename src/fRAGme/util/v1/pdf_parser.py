@@ -0,0 +1,210 @@
+"""
+This module extracts and splits the text of PDFs in a pool of worker processes.
+
+Text extraction with pypdf is CPU-bound pure Python, so PDFs are split into
+page ranges of ``PDF_PAGES_PER_TASK`` pages that are parsed in parallel by
+``PDF_PARSE_WORKERS`` processes. The chunks of each PDF are yielded as soon
+as all of its pages are parsed, so embedding can start before the last PDF
+of an upload is read.
+
+PDFs stored as files are read through a memory map. Uploads still held in
+memory are handed to the worker processes as bytes, uploads that were spooled
+to a named file by their path. Only spooled uploads without a name on disk are
+copied into a temporary file first. Every page range opens its own reader, so
+memory use is bounded by the page range rather than the document size.
+"""
+
+import io
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from fRAGme.util.v1.metrics import INGESTED_PAGES
+
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+@contextmanager
+def _open_buffer(source: str | bytes | BinaryIO) -> Iterator[BinaryIO]:
+    """
+    Open a path, bytes or a stream as a seekable buffer, memory-mapped if
+    possible.
+    """
+    if isinstance(source, str):
+        with (
+            open(source, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+        ):
+            yield buffer
+        return
+    if isinstance(source, bytes):
+        yield io.BytesIO(source)
+        return
+    source.seek(0)
+    yield source
+
+
+def _shareable(stream: BinaryIO) -> Tuple[str | bytes, bool]:
+    """
+    Turn a stream into a source the worker processes can open.
+
+    Returns:
+        The path of the stream if it is a named file, its bytes if it is held
+        in memory and the path of a temporary copy otherwise, e.g. for an
+        upload spooled to an unnamed file, and whether the copy was made.
+    """
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name, False
+    if name is None:
+        stream.seek(0)
+        return stream.read(), False
+    return _spill(stream), True
+
+
+def _spill(stream: BinaryIO) -> str:
+    """Copy a stream into a temporary file and return its path."""
+    stream.seek(0)
+    with tempfile.NamedTemporaryFile(
+        prefix="fragme-", suffix=".pdf", delete=False
+    ) as f:
+        shutil.copyfileobj(stream, f)
+    return f.name
+
+
+def _page_count(source: str | bytes | BinaryIO) -> int:
+    with _open_buffer(source) as buffer:
+        return len(PdfReader(buffer).pages)
+
+
+def parse_pages(
+    source: str | bytes | BinaryIO, filename: str, start: int, stop: int
+) -> List[Document]:
+    """
+    Extract and split the text of the pages [start, stop) of a PDF.
+
+    Pages without any text, e.g. scanned images, are skipped.
+    """
+    splitter = RecursiveCharacterTextSplitter()
+    documents = []
+    with _open_buffer(source) as buffer:
+        reader = PdfReader(buffer)
+        total_pages = len(reader.pages)
+        for page in range(start, min(stop, total_pages)):
+            text = reader.pages[page].extract_text()
+            if not text or not text.strip():
+                continue
+            metadata = {"source": filename, "page": page, "total_pages": total_pages}
+            documents.extend(splitter.create_documents([text], metadatas=[metadata]))
+    return documents
+
+
+def get_pdf_executor() -> ProcessPoolExecutor | None:
+    """
+    Return the shared PDF parsing process pool, or None if parsing should run
+    in the calling thread because ``PDF_PARSE_WORKERS`` is 0.
+    """
+    global _executor
+    if PDF_PARSE_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+def shutdown_pdf_executor():
+    """
+    Shut down the shared PDF parsing process pool.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def parse_pdfs(
+    sources: List[Tuple[str, str | bytes | BinaryIO]],
+    executor: Executor | None = None,
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    Parse PDFs given as (filename, path, bytes or binary stream) pairs.
+
+    Every PDF is cut into page ranges that are fanned out over the process
+    pool. Streams are passed to the worker processes as bytes or by the path
+    of their file, and only copied into a temporary file, removed once parsing
+    is done, if they are spooled to a file without a name. Without a pool, the
+    ranges are parsed straight from the streams in the calling thread. Each
+    PDF is yielded as a (filename, chunks) pair in page order as soon as all
+    of its page ranges are parsed.
+    """
+    executor = executor or get_pdf_executor()
+    futures = {}
+    local = []
+    spilled = []
+    ranges: Dict[int, Dict[int, List[Document]]] = {}
+    pending: Dict[int, int] = {}
+
+    def completed(index: int, start: int, documents: List[Document]):
+        ranges[index][start] = documents
+        pending[index] -= 1
+        if pending[index]:
+            return None
+        parsed = ranges.pop(index)
+        return sources[index][0], [
+            document for start in sorted(parsed) for document in parsed[start]
+        ]
+
+    try:
+        for index, (filename, source) in enumerate(sources):
+            if executor is not None and not isinstance(source, (str, bytes)):
+                source, copied = _shareable(source)
+                if copied:
+                    spilled.append(source)
+            total_pages = _page_count(source)
+            INGESTED_PAGES.inc(total_pages)
+            ranges[index] = {}
+            pending[index] = 0
+            for start in range(0, total_pages, PDF_PAGES_PER_TASK):
+                stop = start + PDF_PAGES_PER_TASK
+                pending[index] += 1
+                if executor is not None:
+                    future = executor.submit(parse_pages, source, filename, start, stop)
+                    futures[future] = (index, start)
+                else:
+                    local.append((index, start, (source, filename, start, stop)))
+
+        for index, pages in pending.items():
+            if not pages:
+                yield sources[index][0], []
+        for index, start, args in local:
+            result = completed(index, start, parse_pages(*args))
+            if result is not None:
+                yield result
+        for future in as_completed(futures):
+            result = completed(*futures[future], future.result())
+            if result is not None:
+                yield result
+    finally:
+        for future in futures:
+            future.cancel()
+        for path in spilled:
+            os.remove(path)
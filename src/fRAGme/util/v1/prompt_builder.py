@@ -0,0 +1,155 @@
+"""
+This module assembles the chat messages sent to the language model.
+
+The base prompt of a question becomes the system message, followed by the
+chat history and a user message with the question and its snippets. Snippets
+are packed best score first into what is left of ``PROMPT_TOKEN_BUDGET``
+tokens after the other messages. Duplicate snippets and the overlap between
+neighbouring chunks of the same source and page are removed, and only the
+metadata fields listed in ``PROMPT_METADATA_FIELDS`` are included.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+from fRAGme.models.v1.cmd import PromptUsage, Question, RoleEnum, Snippet
+from fRAGme.util.v1.embedding_pipeline import count_tokens
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_METADATA_FIELDS = [
+    field.strip()
+    for field in os.getenv("PROMPT_METADATA_FIELDS", "source,page").split(",")
+    if field.strip()
+]
+
+# Tokenizer of the gpt-4o model family.
+PROMPT_ENCODING = "o200k_base"
+# Tokens the chat format adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+# Shortest and longest overlap between two chunks that is removed.
+MIN_OVERLAP = 32
+MAX_OVERLAP = 1000
+
+
+def _message_tokens(content: str) -> int:
+    return count_tokens(content, PROMPT_ENCODING) + MESSAGE_OVERHEAD_TOKENS
+
+
+def project_metadata(metadata: Dict) -> Dict:
+    """
+    Keep only the metadata fields that are shown to the language model.
+    """
+    return {
+        field: metadata[field] for field in PROMPT_METADATA_FIELDS if field in metadata
+    }
+
+
+def _overlap(head: str, tail: str) -> int:
+    """
+    Length of the longest suffix of `head` that is a prefix of `tail`.
+
+    Only the positions where the first ``MIN_OVERLAP`` characters of `tail`
+    occur in the end of `head` are checked, so the cost is linear in
+    ``MAX_OVERLAP``.
+    """
+    window = head[-MAX_OVERLAP:]
+    probe = tail[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return 0
+    start = window.find(probe)
+    while start != -1:
+        if tail.startswith(window[start:]):
+            return len(window) - start
+        start = window.find(probe, start + 1)
+    return 0
+
+
+def _neighbourhood(snippet: Snippet) -> Tuple:
+    """Key of the chunks a snippet can overlap with: its source and page."""
+    return snippet.metadata.get("source"), snippet.metadata.get("page")
+
+
+def _deduplicate(snippets: List[Snippet]) -> Tuple[List[Snippet], int]:
+    """
+    Drop duplicate snippets and those whose text is contained in a better one
+    of the same source and page, and trim the text they share with such a
+    snippet at their start or end.
+    """
+    kept: List[Snippet] = []
+    seen = set()
+    neighbours: Dict[Tuple, List[str]] = {}
+    dropped = 0
+    for snippet in snippets:
+        original = text = snippet.text.strip()
+        others = neighbours.setdefault(_neighbourhood(snippet), [])
+        if text not in seen:
+            for other in others:
+                if text in other:
+                    text = ""
+                    break
+                text = text[_overlap(other, text) :]
+                overlap = _overlap(text, other)
+                if overlap:
+                    text = text[:-overlap]
+            text = text.strip()
+        if not text or text in seen:
+            dropped += 1
+            continue
+        seen.update((original, text))
+        others.append(text)
+        kept.append(snippet.model_copy(update={"text": text}))
+    return kept, dropped
+
+
+def _format_snippet(snippet: Snippet) -> str:
+    block = f"Text: {snippet.text}\n"
+    metadata = project_metadata(snippet.metadata)
+    if metadata:
+        block += f"Metadata: {metadata}\n"
+    return block + "\n"
+
+
+def build_prompt(
+    question: Question, snippets: List[Snippet]
+) -> Tuple[List[dict], PromptUsage]:
+    """
+    Build the chat messages for a question and report their token usage.
+
+    Returns:
+        The messages for the chat completion and the token usage of the
+        prompt.
+    """
+    budget = question.max_prompt_tokens or PROMPT_TOKEN_BUDGET
+    messages = []
+    if question.base_prompt:
+        messages.append({"role": RoleEnum.SYSTEM, "content": question.base_prompt})
+    messages.extend(
+        {"role": element.role, "content": element.content}
+        for element in question.chat_history
+    )
+
+    header = f"Question:\n{question.question}\n\nInfo-Snippets:\n"
+    tokens = sum(_message_tokens(message["content"]) for message in messages)
+    tokens += _message_tokens(header)
+
+    ranked = sorted(snippets, key=lambda snippet: snippet.score or 0.0, reverse=True)
+    unique, deduplicated = _deduplicate(ranked)
+    blocks = []
+    snippet_tokens = 0
+    for snippet in unique:
+        block = _format_snippet(snippet)
+        block_tokens = count_tokens(block, PROMPT_ENCODING)
+        if tokens + snippet_tokens + block_tokens > budget:
+            continue
+        blocks.append(block)
+        snippet_tokens += block_tokens
+
+    messages.append({"role": RoleEnum.USER, "content": header + "".join(blocks)})
+    return messages, PromptUsage(
+        budget=budget,
+        tokens=tokens + snippet_tokens,
+        snippet_tokens=snippet_tokens,
+        snippets=len(blocks),
+        deduplicated=deduplicated,
+        over_budget=len(unique) - len(blocks),
+    )
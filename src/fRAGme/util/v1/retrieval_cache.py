@@ -0,0 +1,97 @@
+"""
+This module provides an in-memory cache of retrieval results.
+
+For every identifier the cache maps a normalized question and the number of
+requested snippets to the ids and scores of the snippets that were found.
+Entries carry the write version of the identifier's vector store they were
+computed at, so a write makes the entries of that identifier stale without
+touching any other identifier. At most ``RETRIEVAL_CACHE_SIZE`` entries are
+kept.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from fRAGme.util.v1.answer_cache import normalize_question
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "4096"))
+
+
+class RetrievalCache:
+    """
+    LRU cache of (snippet id, score) lists keyed by identifier, question and k.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self._entries: (
+            "OrderedDict[Tuple[str, str, int], Tuple[int, List[Tuple[str, float]]]]"
+        ) = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, identifier: str, question: str, k: int, version: int
+    ) -> List[Tuple[str, float]] | None:
+        """
+        Return the cached snippet ids and scores if they were computed at the
+        current write version of the identifier.
+        """
+        if self.max_entries <= 0:
+            return None
+        key = (identifier, normalize_question(question), k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                del self._entries[key]
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(
+        self,
+        identifier: str,
+        question: str,
+        k: int,
+        version: int,
+        results: List[Tuple[str, float]],
+    ):
+        """
+        Cache the snippet ids and scores retrieved at a write version.
+        """
+        if self.max_entries <= 0:
+            return
+        key = (identifier, normalize_question(question), k)
+        with self._lock:
+            self._entries[key] = (version, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of cached results and the cache counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,174 @@
+"""
+This module provides a per-identifier index of chunk sources.
+
+The index lives next to the Chroma files of an identifier and maps every chunk
+id to the file name of its source and its page, so PDFs can be listed and
+their chunks found without scanning the whole collection.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+SOURCE_INDEX_FILENAME = "fragme_sources.sqlite3"
+
+# SQLite limits the number of host parameters per statement.
+_SQL_BATCH_SIZE = 500
+
+
+def source_name(metadata: Dict[str, Any] | None) -> str | None:
+    """
+    Return the file name of the source in a chunk's metadata, if any.
+    """
+    source = (metadata or {}).get("source")
+    if not isinstance(source, str):
+        return None
+    return source.split("/")[-1]
+
+
+def _batches(items: List, size: int = _SQL_BATCH_SIZE) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class SourceIndex:
+    """
+    SQLite index mapping chunk ids to their source file name and page.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, SOURCE_INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, timeout=30, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, source TEXT, page INTEGER, total_pages INTEGER)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the index has been built for the existing collection.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'ready'"
+            ).fetchone()
+        return row is not None
+
+    def rebuild(self, pages: Iterable[Tuple[List[str], List[Dict[str, Any]]]]):
+        """
+        Rebuild the index from pages of (ids, metadatas) of the whole collection.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                row = self._connection.execute(
+                    "SELECT value FROM meta WHERE key = 'ready'"
+                ).fetchone()
+                if row is not None:
+                    return
+                self._connection.execute("DELETE FROM chunks")
+                for ids, metadatas in pages:
+                    self._insert(ids, metadatas)
+                self._connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('ready', '1')"
+                )
+
+    def _insert(self, ids: List[str], metadatas: List[Dict[str, Any] | None]):
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO chunks (id, source, page, total_pages) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (
+                    id_,
+                    source_name(metadata),
+                    (metadata or {}).get("page"),
+                    (metadata or {}).get("total_pages"),
+                )
+                for id_, metadata in zip(ids, metadatas)
+            ],
+        )
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any] | None]):
+        """
+        Add or update the index entries of chunks.
+        """
+        with self._lock:
+            with self._connection:
+                self._insert(ids, metadatas)
+
+    def remove(self, ids: List[str]):
+        """
+        Remove the index entries of chunks.
+        """
+        with self._lock:
+            with self._connection:
+                for batch in _batches(list(ids)):
+                    placeholders = ",".join("?" * len(batch))
+                    self._connection.execute(
+                        f"DELETE FROM chunks WHERE id IN ({placeholders})", batch
+                    )
+
+    def sources(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Return every source file name with its number of chunks and pages.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT source, COUNT(*), COUNT(DISTINCT page) FROM chunks "
+                "WHERE source IS NOT NULL GROUP BY source"
+            ).fetchall()
+        return {source: (chunks, pages) for source, chunks, pages in rows}
+
+    def chunks(self, sources: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the chunks of the given sources with their page information.
+        """
+        chunks = {}
+        with self._lock:
+            for batch in _batches(list(sources)):
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    "SELECT id, source, page, total_pages FROM chunks "
+                    f"WHERE source IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for id_, source, page, total_pages in rows:
+                    chunks[id_] = {
+                        "source": source,
+                        "page": page,
+                        "total_pages": total_pages,
+                    }
+        return chunks
+
+    def summary(self) -> Tuple[int, int]:
+        """
+        Return the number of indexed chunks and of PDFs they come from.
+        """
+        with self._lock:
+            chunks, pdfs = self._connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT CASE WHEN source GLOB '*.pdf' "
+                "THEN source END) FROM chunks"
+            ).fetchone()
+        return chunks, pdfs
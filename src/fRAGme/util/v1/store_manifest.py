@@ -0,0 +1,44 @@
+"""
+This module reads and writes the manifest of a vector store.
+
+The manifest is a JSON file next to the Chroma files of an identifier that
+records how the store was created, such as the embedding backend, model and
+dimension, so the store is always opened with the embeddings it was built
+with.
+"""
+
+import os
+
+from fRAGme.models.v1.data import StoreManifest
+
+MANIFEST_FILENAME = "fragme_store.json"
+
+
+class StoreMismatchError(ValueError):
+    """Raised when a vector store is used with settings it was not created with."""
+
+
+class DatabaseNotFoundError(LookupError):
+    """Raised when reading from a database that does not exist."""
+
+
+def read_manifest(directory: str) -> StoreManifest | None:
+    """
+    Read the manifest of the store in a directory, if it has one.
+    """
+    filename = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, encoding="utf-8") as f:
+        return StoreManifest.model_validate_json(f.read())
+
+
+def write_manifest(directory: str, manifest: StoreManifest):
+    """
+    Atomically write the manifest of the store in a directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, MANIFEST_FILENAME)
+    with open(filename + ".tmp", "w", encoding="utf-8") as f:
+        f.write(manifest.model_dump_json())
+    os.replace(filename + ".tmp", filename)
@@ -0,0 +1,105 @@
+"""
+This module reclaims the disk space of deleted databases in the background.
+
+Deleting a database only renames its directory into ``DATA_PATH/.tombstones``,
+which is atomic and instant no matter how large the database is. A reaper
+thread removes the tombstones afterwards, right after every deletion and every
+``TOMBSTONE_REAP_INTERVAL`` seconds, also picking up tombstones left behind by
+a previous run.
+"""
+
+import os
+import shutil
+import threading
+from uuid import uuid4
+
+TOMBSTONE_REAP_INTERVAL = float(os.getenv("TOMBSTONE_REAP_INTERVAL", "300"))
+TOMBSTONE_DIRNAME = ".tombstones"
+
+
+def tombstone_path() -> str:
+    """
+    Return the directory holding the tombstones of deleted databases.
+    """
+    return os.path.join(os.getenv("DATA_PATH"), TOMBSTONE_DIRNAME)
+
+
+def bury(directory: str) -> str:
+    """
+    Atomically move a directory into the tombstone area and return its new path.
+    """
+    tombstones = tombstone_path()
+    os.makedirs(tombstones, exist_ok=True)
+    target = os.path.join(tombstones, f"{os.path.basename(directory)}-{uuid4().hex}")
+    os.rename(directory, target)
+    return target
+
+
+class TombstoneReaper:
+    """
+    Background thread removing the tombstones of deleted databases.
+    """
+
+    def __init__(self, interval: float = TOMBSTONE_REAP_INTERVAL):
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """
+        Start the reaper thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="fragme-reaper", daemon=True
+        )
+        self._thread.start()
+
+    def wake(self):
+        """
+        Ask the reaper to remove the tombstones now.
+        """
+        self._wake.set()
+
+    def shutdown(self):
+        """
+        Stop the reaper thread. Remaining tombstones are removed on the next
+        start.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def reap(self) -> int:
+        """
+        Remove all tombstones and return how many were removed.
+        """
+        tombstones = tombstone_path()
+        if not os.path.isdir(tombstones):
+            return 0
+        removed = 0
+        for name in os.listdir(tombstones):
+            if self._stop.is_set():
+                break
+            try:
+                shutil.rmtree(os.path.join(tombstones, name))
+            except OSError:
+                # Retried on the next run.
+                continue
+            removed += 1
+        return removed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            self.reap()
+            self._wake.wait(self.interval)
+
+
+reaper = TombstoneReaper()
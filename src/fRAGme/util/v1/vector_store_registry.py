@@ -0,0 +1,339 @@
+"""
+This module provides a bounded, thread-safe registry of open vector stores.
+
+The registry keeps at most ``VECTOR_STORE_MAX_OPEN`` stores open, evicts the
+least recently used ones and those idle for longer than
+``VECTOR_STORE_IDLE_TIMEOUT`` seconds, and makes sure that concurrent first
+requests for an identifier only create one store. Stores in use are leased and
+only closed once the last lease is released. A store can be taken exclusively,
+for example to delete it, which holds back new leases until it is released
+and keeps the store from being created again meanwhile. Resources that belong
+to a store, such as connections to its indexes, can be kept open with it and
+are closed together with it.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Set
+
+from langchain_chroma import Chroma
+
+from fRAGme.util.v1.store_manifest import DatabaseNotFoundError
+
+VECTOR_STORE_MAX_OPEN = int(os.getenv("VECTOR_STORE_MAX_OPEN", "64"))
+VECTOR_STORE_IDLE_TIMEOUT = float(os.getenv("VECTOR_STORE_IDLE_TIMEOUT", "900"))
+
+
+class _Entry:
+    """An open vector store together with its usage bookkeeping."""
+
+    def __init__(self, vector_store: Chroma):
+        self.vector_store = vector_store
+        self.last_used = time.monotonic()
+        self.leases = 0
+        self.retired = False
+        self.resources: Dict[str, Any] = {}
+
+
+def close_vector_store(vector_store: Chroma):
+    """
+    Release the Chroma client of a vector store and its file handles.
+    """
+    client = getattr(vector_store, "_client", None)
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
+
+
+class VectorStoreRegistry:
+    """
+    LRU registry of open vector stores keyed by identifier.
+
+    `exists` tells whether the store of an identifier exists, so leases that
+    must not create a store can be refused. Without it, every store exists.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Chroma],
+        closer: Callable[[Chroma], None] = close_vector_store,
+        max_open: int = VECTOR_STORE_MAX_OPEN,
+        idle_timeout: float = VECTOR_STORE_IDLE_TIMEOUT,
+        exists: Callable[[str], bool] | None = None,
+    ):
+        self.factory = factory
+        self.closer = closer
+        self.exists = exists
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.creations = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._stores: Dict[int, _Entry] = {}
+        self._retired: List[_Entry] = []
+        self._creation_locks: Dict[str, threading.Lock] = {}
+        self._exclusive: Set[str] = set()
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _lookup_locked(self, identifier: str) -> _Entry | None:
+        entry = self._entries.get(identifier)
+        if entry is not None:
+            self._entries.move_to_end(identifier)
+            entry.last_used = time.monotonic()
+        return entry
+
+    def _wait_shared_locked(self, identifier: str):
+        """Wait until an identifier is no longer taken exclusively."""
+        while identifier in self._exclusive:
+            self._released.wait()
+
+    def _entry(self, identifier: str, create: bool = True) -> _Entry:
+        """
+        Return the entry for an identifier, creating the store at most once.
+
+        Raises:
+            DatabaseNotFoundError: If the store does not exist and `create` is
+                false.
+        """
+        while True:
+            with self._lock:
+                self._wait_shared_locked(identifier)
+                entry = self._lookup_locked(identifier)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                creation_lock = self._creation_locks.setdefault(
+                    identifier, threading.Lock()
+                )
+
+            with creation_lock:
+                with self._lock:
+                    # The identifier was taken exclusively, e.g. to delete its
+                    # store, while waiting for the lock: wait and look again.
+                    if identifier in self._exclusive:
+                        continue
+                    entry = self._lookup_locked(identifier)
+                    if entry is not None:
+                        return entry
+                # Checked under the creation lock, so a store deleted while
+                # waiting for it is not created again.
+                if not create and self.exists and not self.exists(identifier):
+                    raise DatabaseNotFoundError(
+                        f"Database '{identifier}' does not exist."
+                    )
+                vector_store = self.factory(identifier)
+                with self._lock:
+                    entry = _Entry(vector_store)
+                    self._entries[identifier] = entry
+                    self._stores[id(vector_store)] = entry
+                    self._creation_locks.pop(identifier, None)
+                    self.creations += 1
+                    evicted = self._evict_locked(keep=identifier)
+            self._close(evicted)
+            return entry
+
+    def _evict_locked(self, keep: str | None = None) -> List[_Entry]:
+        """Retire idle entries and the least recently used ones above the cap."""
+        now = time.monotonic()
+        self._last_sweep = now
+        evicted = []
+        for identifier, entry in list(self._entries.items()):
+            if identifier == keep or entry.leases:
+                continue
+            idle = now - entry.last_used > self.idle_timeout
+            if idle or len(self._entries) > self.max_open:
+                del self._entries[identifier]
+                evicted.append(entry)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _close_entry(self, entry: _Entry):
+        """Close a store that is no longer leased and its resources."""
+        with self._lock:
+            self._stores.pop(id(entry.vector_store), None)
+            resources = list(entry.resources.values())
+            entry.resources.clear()
+        for resource in resources:
+            resource.close()
+        self.closer(entry.vector_store)
+
+    def _close(self, entries: List[_Entry]):
+        for entry in entries:
+            with self._lock:
+                entry.retired = True
+                if entry.leases:
+                    self._retired.append(entry)
+                    continue
+            self._close_entry(entry)
+
+    def get(self, identifier: str) -> Chroma:
+        """
+        Return the vector store for an identifier without leasing it.
+        """
+        return self._entry(identifier).vector_store
+
+    @contextmanager
+    def acquire(self, identifier: str, create: bool = True) -> Iterator[Chroma]:
+        """
+        Lease the vector store for an identifier for the duration of a block.
+
+        A leased store is never closed by eviction or removal while the lease
+        is held.
+
+        Raises:
+            DatabaseNotFoundError: If the store does not exist and `create` is
+                false.
+        """
+        evicted = []
+        with self._lock:
+            self._wait_shared_locked(identifier)
+            entry = self._lookup_locked(identifier)
+            if entry is not None:
+                self.hits += 1
+                entry.leases += 1
+            if time.monotonic() - self._last_sweep > self.idle_timeout / 4:
+                evicted = self._evict_locked(keep=identifier)
+        self._close(evicted)
+        if entry is None:
+            while True:
+                entry = self._entry(identifier, create)
+                with self._lock:
+                    if not entry.retired:
+                        entry.leases += 1
+                        break
+        try:
+            yield entry.vector_store
+        finally:
+            with self._lock:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+                close = entry.retired and not entry.leases
+                if close:
+                    self._retired.remove(entry)
+                self._released.notify_all()
+            if close:
+                self._close_entry(entry)
+
+    def resource(self, vector_store: Chroma, name: str, factory: Callable[[], Any]):
+        """
+        Return a resource kept open together with a leased vector store,
+        creating it with `factory` on first use.
+
+        The resource must have a `close` method, which is called when the
+        store is closed.
+        """
+        with self._lock:
+            entry = self._stores[id(vector_store)]
+            resource = entry.resources.get(name)
+        if resource is not None:
+            return resource
+        created = factory()
+        with self._lock:
+            resource = entry.resources.setdefault(name, created)
+        if resource is not created:
+            created.close()
+        return resource
+
+    def remove(self, identifier: str):
+        """
+        Remove the vector store for an identifier and close it once released.
+        """
+        with self._lock:
+            entry = self._entries.pop(identifier, None)
+        if entry is not None:
+            self._close([entry])
+
+    @contextmanager
+    def exclusive(
+        self, identifier: str, timeout: float | None = None
+    ) -> Iterator[None]:
+        """
+        Take an identifier exclusively for the duration of a block.
+
+        New leases wait until the block is left. The leases held when the
+        block is entered are drained and the store is closed before the block
+        runs, so its files can be moved or removed.
+
+        Raises:
+            TimeoutError: If the held leases are not released within `timeout`
+                seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._wait_shared_locked(identifier)
+            self._exclusive.add(identifier)
+            creation_lock = self._creation_locks.setdefault(
+                identifier, threading.Lock()
+            )
+        # Holding the creation lock lets a store that is being created right
+        # now finish first and keeps it from being created again in the block.
+        creation_lock.acquire()
+        try:
+            with self._lock:
+                entry = self._entries.pop(identifier, None)
+                while entry is not None and entry.leases:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._entries[identifier] = entry
+                            raise TimeoutError(
+                                f"Database '{identifier}' is still in use after "
+                                f"{timeout} seconds."
+                            )
+                    self._released.wait(remaining)
+                if entry is not None:
+                    entry.retired = True
+            if entry is not None:
+                self._close_entry(entry)
+            yield
+        finally:
+            creation_lock.release()
+            with self._lock:
+                self._exclusive.discard(identifier)
+                self._released.notify_all()
+
+    def sweep(self):
+        """
+        Close all stores that have been idle for longer than the idle timeout.
+        """
+        with self._lock:
+            evicted = self._evict_locked()
+        self._close(evicted)
+
+    def close_all(self):
+        """
+        Close all open vector stores.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        self._close(entries)
+
+    def __contains__(self, identifier: str) -> bool:
+        with self._lock:
+            return identifier in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of open and leased stores and the registry counters.
+        """
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "leased": sum(1 for entry in self._entries.values() if entry.leases),
+                "retired": len(self._retired),
+                "max_open": self.max_open,
+                "hits": self.hits,
+                "misses": self.misses,
+                "creations": self.creations,
+                "evictions": self.evictions,
+            }
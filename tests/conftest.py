@@ -0,0 +1,124 @@
+"""
+Shared fixtures of the tests.
+
+The tests run without network access and API keys: texts are embedded with the
+``hash`` backend and questions are answered by the ``fake`` language model.
+All databases of a test session live in one temporary ``DATA_PATH``, so every
+test uses its own identifiers.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+DATA_PATH = tempfile.mkdtemp(prefix="fragme-tests-")
+
+TEST_ENVIRONMENT = {
+    "DATA_PATH": DATA_PATH,
+    "AUTH": "false",
+    "OPENAI_API_KEY": "sk-test",
+    "EMBEDDING_BACKEND": "hash",
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": "0",
+    "FAKE_LLM_TOKENS_PER_SECOND": "100000",
+    "CHROMA_MODE": "embedded",
+}
+os.environ.update(TEST_ENVIRONMENT)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from fRAGme.app import app  # noqa: E402
+from fRAGme.models.v1.auth import User  # noqa: E402
+from fRAGme.util.v1 import chroma_client  # noqa: E402
+from fRAGme.util.v1.auth import get_current_active_user  # noqa: E402
+from fRAGme.util.v1.chroma_handler import vector_stores  # noqa: E402
+
+# The app loads the .env file of the repository, which must not win.
+os.environ.update(TEST_ENVIRONMENT)
+app.dependency_overrides[get_current_active_user] = lambda: User(username="test")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_PATH, ignore_errors=True)
+
+
+@pytest.fixture
+def identifier() -> str:
+    """A fresh database identifier."""
+    return f"test-{uuid4().hex[:12]}"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A client of the app, running its startup and shutdown."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def chroma_server():
+    """
+    Run a Chroma server with ``chroma run`` in a subprocess and yield its port.
+    """
+    chroma = shutil.which("chroma") or os.path.join(
+        os.path.dirname(sys.executable), "chroma"
+    )
+    if not os.path.exists(chroma):
+        pytest.skip("the chroma command is not installed")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    path = tempfile.mkdtemp(prefix="fragme-chroma-")
+    process = subprocess.Popen(
+        [chroma, "run", "--path", path, "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                pytest.fail(f"chroma run exited with {process.returncode}")
+            try:
+                httpx.get(
+                    f"http://127.0.0.1:{port}/api/v2/heartbeat"
+                ).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def http_mode(chroma_server, monkeypatch):
+    """
+    Store the collections on the Chroma server for the duration of a test,
+    as several workers would, and yield the environment of such a worker.
+    """
+    vector_stores.close_all()
+    monkeypatch.setattr(chroma_client, "CHROMA_MODE", "http")
+    monkeypatch.setattr(chroma_client, "CHROMA_HOST", "127.0.0.1")
+    monkeypatch.setattr(chroma_client, "CHROMA_PORT", chroma_server)
+    try:
+        yield {
+            **os.environ,
+            "CHROMA_MODE": "http",
+            "CHROMA_HOST": "127.0.0.1",
+            "CHROMA_PORT": str(chroma_server),
+        }
+    finally:
+        vector_stores.close_all()
+        chroma_client.close_chroma_client()
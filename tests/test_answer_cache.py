@@ -0,0 +1,90 @@
+from fRAGme.models.v1.cmd import ChatAction, Question, RoleEnum
+from fRAGme.util.v1.answer_cache import AnswerCache
+
+
+def question(text: str, **kwargs) -> Question:
+    return Question(question=text, chat_history=[], **kwargs)
+
+
+def answer(text: str) -> ChatAction:
+    return ChatAction(role=RoleEnum.ASSISTANT, content=text)
+
+
+def test_answer_cache_exact_hit():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", question("What is X?"), answer("X"), None, cache.generation("a"))
+
+    assert cache.get("a", question("  what is x? ")) == answer("X")
+    assert cache.get("b", question("What is X?")) is None
+    assert cache.get("a", question("What is X?", k_similar_text_snippets=3)) is None
+
+
+def test_answer_cache_invalidation():
+    cache = AnswerCache()
+    generation = cache.generation("a")
+    cache.put("a", question("q1"), answer("1"), None, generation)
+    cache.invalidate("a")
+    # Built from data that changed while it was being answered.
+    cache.put("a", question("q2"), answer("2"), None, generation)
+
+    assert cache.get("a", question("q1")) is None
+    assert cache.get("a", question("q2")) is None
+    cache.put("a", question("q2"), answer("2"), None, cache.generation("a"))
+    assert cache.get("a", question("q2")) == answer("2")
+
+
+def test_answer_cache_expiry_and_size():
+    expiring = AnswerCache(ttl=-1)
+    expiring.put("a", question("q"), answer("1"), None, 0)
+    assert expiring.get("a", question("q")) is None
+
+    cache = AnswerCache(max_entries=2)
+    for text in ["q1", "q2", "q3"]:
+        cache.put("a", question(text), answer(text), [1.0, 0.0], 0)
+    assert cache.get("a", question("q1")) is None
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_answer_cache_similar_questions():
+    cache = AnswerCache(similarity=0.9)
+    cache.put("a", question("q1"), answer("1"), [1.0, 0.0, 0.0], 0)
+    cache.put("a", question("q2"), answer("2"), [0.0, 1.0, 0.0], 0)
+
+    assert cache.get("a", question("other"), [0.1, 1.0, 0.0]) == answer("2")
+    assert cache.get("a", question("other"), [1.0, 1.0, 0.0]) is None
+    assert cache.get("b", question("other"), [0.0, 1.0, 0.0]) is None
+    assert (
+        cache.get("a", question("other", k_similar_text_snippets=3), [0, 1, 0]) is None
+    )
+    assert cache.stats()["semantic_hits"] == 1
+
+    cache.invalidate("a")
+    assert cache.get("a", question("other"), [0.0, 1.0, 0.0]) is None
+
+
+def ask(client, identifier: str, text: str) -> dict:
+    response = client.post(
+        "/cmd/v1/ask_question",
+        json={
+            "identifier": identifier,
+            "info": {"chat_history": [], "question": text},
+        },
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_answers_are_cached_until_writes(client, identifier):
+    texts = {"identifier": identifier, "texts": [{"text": "the pump is blue"}]}
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+
+    first = ask(client, identifier, "Which colour is the pump?")
+    assert not first["cached"]
+    second = ask(client, identifier, "which colour is the pump? ")
+    assert second["cached"]
+    assert second["result"] == first["result"]
+
+    texts["texts"] = [{"text": "the valve is red"}]
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+    assert not ask(client, identifier, "Which colour is the pump?")["cached"]
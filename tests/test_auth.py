@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from fRAGme.models.v1.auth import UserInDB
+from fRAGme.util.v1 import auth
+from fRAGme.util.v1.auth import TokenCache, create_access_token, get_current_user
+
+
+def user(name: str) -> UserInDB:
+    return UserInDB(username=name, hashed_password="secret")
+
+
+def test_token_cache():
+    cache = TokenCache(max_entries=2, ttl=60)
+    cache.put("a", user("a"), time.time() + 3600)
+    cache.put("b", user("b"), time.time() + 3600)
+    cache.get("a")
+    cache.put("c", user("c"), time.time() + 3600)
+
+    assert cache.get("a").username == "a"
+    assert cache.get("b") is None
+    assert cache.get("c").username == "c"
+
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_token_cache_expiry():
+    cache = TokenCache(ttl=60)
+    cache.put("expired", user("a"), time.time() - 1)
+    assert cache.get("expired") is None
+
+    capped = TokenCache(ttl=-1)
+    capped.put("token", user("a"), time.time() + 3600)
+    assert capped.get("token") is None
+
+    disabled = TokenCache(max_entries=0)
+    disabled.put("token", user("a"), time.time() + 3600)
+    assert disabled.get("token") is None
+
+
+@pytest.fixture
+def token(monkeypatch) -> str:
+    monkeypatch.setattr(auth, "SECRET_KEY", "a test secret of at least 32 bytes")
+    monkeypatch.setenv("ADMIN_SECRET", "secret")
+    auth.load_users_db()
+    yield create_access_token({"sub": "admin"})
+    auth.load_users_db()
+
+
+def test_validated_tokens_are_cached(token, monkeypatch):
+    assert asyncio.run(get_current_user(token)).username == "admin"
+
+    def decode(*args, **kwargs):
+        raise AssertionError("cached tokens are not decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", decode)
+    assert asyncio.run(get_current_user(token)).username == "admin"
+
+    # Reloading the users forgets the validated tokens.
+    auth.load_users_db()
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(token))
+
+
+def test_invalid_tokens_are_not_cached(token):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(get_current_user(token + "x"))
+    assert error.value.status_code == 401
+    assert auth.token_cache.get(token + "x") is None
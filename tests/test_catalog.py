@@ -0,0 +1,91 @@
+import os
+import shutil
+import time
+
+from fRAGme.models.v1.data import CatalogEntry, EmbeddingBackendEnum
+from fRAGme.util.v1.catalog import Catalog, get_catalog
+from fRAGme.util.v1.chroma_handler import database_path, sync_catalog, vector_stores
+
+
+def entry(identifier: str, chunks: int = 0) -> CatalogEntry:
+    return CatalogEntry(
+        identifier=identifier,
+        chunks=chunks,
+        embedding_backend=EmbeddingBackendEnum.HASH,
+        embedding_model="hash-256",
+        last_write=time.time(),
+    )
+
+
+def test_entries(tmp_path):
+    catalog = Catalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.put(entry("b"))
+    catalog.put(entry("a", chunks=1))
+    catalog.put(entry("a", chunks=2))
+
+    assert catalog.identifiers() == ["a", "b"]
+    assert [e.chunks for e in catalog.entries()] == [2, 0]
+
+    catalog.remove("a")
+    assert catalog.identifiers() == ["b"]
+
+
+def test_versions_survive_removal(tmp_path):
+    catalog = Catalog(str(tmp_path / "catalog.sqlite3"))
+    assert catalog.version("a") == 0
+    assert catalog.bump_version("a") == 1
+    catalog.put(entry("a"))
+    catalog.remove("a")
+    assert catalog.bump_version("a") == 2
+    assert catalog.version("a") == 2
+
+
+def test_versions_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / "catalog.sqlite3")
+    first, second = Catalog(path), Catalog(path)
+    first.bump_version("a")
+    assert second.version("a") == 1
+    assert second.bump_version("a") == 2
+    assert first.version("a") == 2
+
+
+def catalog_entry(client, identifier: str) -> dict | None:
+    response = client.get("/data/v1/get_catalog")
+    assert response.status_code == 200
+    entries = {e["identifier"]: e for e in response.json()["databases"]}
+    return entries.get(identifier)
+
+
+def test_catalog_follows_writes(client, identifier):
+    texts = {"identifier": identifier, "texts": [{"text": "a"}, {"text": "b"}]}
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+
+    listed = catalog_entry(client, identifier)
+    assert listed["chunks"] == 2
+    assert listed["pdfs"] == 0
+    assert listed["bytes"] > 0
+    assert listed["embedding_backend"] == "hash"
+    assert identifier in client.get("/data/v1/get_databases").json()["databases"]
+
+    response = client.request(
+        "DELETE", "/data/v1/delete_databases", json={"identifiers": [identifier]}
+    )
+    assert response.status_code == 200
+    assert catalog_entry(client, identifier) is None
+
+
+def test_sync_catalog(client, identifier):
+    texts = {"identifier": identifier, "texts": [{"text": "a"}]}
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+    get_catalog().remove(identifier)
+
+    # Databases the catalog does not know yet are added...
+    sync_catalog()
+    assert catalog_entry(client, identifier)["chunks"] == 1
+
+    # ...and the ones that vanished from the disk are removed.
+    with vector_stores.exclusive(identifier):
+        shutil.rmtree(database_path(identifier))
+    sync_catalog()
+    assert catalog_entry(client, identifier) is None
+    assert not os.path.exists(database_path(identifier))
@@ -0,0 +1,157 @@
+import json
+import os
+
+from fRAGme.api.v1 import cmd
+from fRAGme.util.v1.chroma_handler import database_path
+from fRAGme.util.v1.completion_backends import CompletionChunk, FakeBackend
+
+
+def add_texts(client, identifier: str, *texts: str):
+    response = client.post(
+        "/data/v1/add_texts",
+        json={"identifier": identifier, "texts": [{"text": text} for text in texts]},
+    )
+    assert response.status_code == 200
+
+
+def question(identifier: str, text: str, k: int = 2) -> dict:
+    return {
+        "identifier": identifier,
+        "info": {"chat_history": [], "question": text, "k_similar_text_snippets": k},
+    }
+
+
+def test_ask_question(client, identifier):
+    add_texts(client, identifier, "the pump is blue", "the valve is red")
+
+    response = client.post("/cmd/v1/ask_question", json=question(identifier, "pump?"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["result"]["role"] == "assistant"
+    assert body["result"]["content"]
+    assert body["prompt"]["snippets"] == 2
+
+
+def test_ask_question_about_unknown_database(client, identifier):
+    response = client.post("/cmd/v1/ask_question", json=question(identifier, "pump?"))
+
+    assert response.status_code == 404
+    assert not os.path.isdir(database_path(identifier))
+
+
+def events(response) -> list:
+    """Parse a server-sent event stream into (event, data) pairs."""
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def test_stream_answer(client, identifier):
+    add_texts(client, identifier, "the pump is blue")
+
+    response = client.post(
+        "/cmd/v1/ask_question_stream", json=question(identifier, "pump?")
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    stream = events(response)
+    event, data = stream[0]
+    assert event == "snippets"
+    assert data["snippets"][0]["metadata"]["source"] == "text input"
+    assert "text" not in data["snippets"][0]
+    deltas = [data["delta"]["content"] for event, data in stream if event == "delta"]
+    assert deltas
+    event, done = stream[-1]
+    assert event == "done"
+    assert done["result"]["content"] == "".join(deltas)
+    assert done["usage"]["completion_tokens"] == len(deltas)
+    assert done["timing"]["first_token"] <= done["timing"]["total"]
+
+
+class FailingBackend(FakeBackend):
+    async def stream(self, model, messages):
+        yield CompletionChunk(content="partial ")
+        raise RuntimeError("model went away")
+
+
+def test_stream_reports_failures_as_events(client, identifier, monkeypatch):
+    add_texts(client, identifier, "the pump is blue")
+    monkeypatch.setattr(cmd, "get_completion_backend", lambda: FailingBackend())
+
+    response = client.post(
+        "/cmd/v1/ask_question_stream", json=question(identifier, "pump?")
+    )
+
+    assert response.status_code == 200
+    assert [event for event, _ in events(response)] == ["snippets", "delta", "error"]
+    assert events(response)[-1][1]["status"] == 500
+
+
+def test_stream_about_unknown_database(client, identifier):
+    response = client.post(
+        "/cmd/v1/ask_question_stream", json=question(identifier, "pump?")
+    )
+    assert response.status_code == 404
+
+
+def questions(identifier: str, *texts: str, ordered: bool = True) -> dict:
+    return {
+        "identifier": identifier,
+        "ordered": ordered,
+        "questions": [question(identifier, text)["info"] for text in texts],
+    }
+
+
+def lines(response) -> list:
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ask_questions(client, identifier):
+    add_texts(client, identifier, "the pump is blue", "the valve is red")
+    client.post("/cmd/v1/ask_question", json=question(identifier, "valve?"))
+
+    response = client.post(
+        "/cmd/v1/ask_questions",
+        json=questions(identifier, "pump?", "valve?", "hose?"),
+    )
+
+    answers = lines(response)
+    assert [answer["index"] for answer in answers] == [0, 1, 2]
+    assert [answer["cached"] for answer in answers] == [False, True, False]
+    assert all(answer["result"]["content"] for answer in answers)
+    assert answers[0]["prompt"]["snippets"] == 2
+    assert "prompt" not in answers[1]
+
+
+class BrokenBackend(FakeBackend):
+    async def complete(self, model, messages):
+        if "hose" in messages[-1]["content"]:
+            raise RuntimeError("model went away")
+        return await super().complete(model, messages)
+
+
+def test_ask_questions_reports_failures_per_line(client, identifier, monkeypatch):
+    add_texts(client, identifier, "the pump is blue")
+    monkeypatch.setattr(cmd, "get_completion_backend", lambda: BrokenBackend())
+
+    response = client.post(
+        "/cmd/v1/ask_questions",
+        json=questions(identifier, "hose?", "pump?", ordered=False),
+    )
+
+    answers = {answer["index"]: answer for answer in lines(response)}
+    assert set(answers) == {0, 1}
+    assert answers[0]["error"] == "model went away"
+    assert "result" not in answers[0]
+    assert answers[1]["result"]["content"]
+
+
+def test_ask_questions_about_unknown_database(client, identifier):
+    response = client.post("/cmd/v1/ask_questions", json=questions(identifier, "pump?"))
+    assert response.status_code == 404
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from fRAGme.models.v1.cmd import RoleEnum
+from fRAGme.util.v1.completion_backends import CompletionBackend, FakeBackend
+
+MESSAGES = [{"role": "user", "content": "Which colour is the pump?"}]
+
+
+def test_backends_implement_the_interface():
+    class Incomplete(CompletionBackend):
+        async def complete(self, model, messages):
+            return None, None
+
+    with pytest.raises(TypeError):
+        CompletionBackend()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_fake_backend_streams_its_answer():
+    backend = FakeBackend(latency=0, tokens_per_second=0, answer_tokens=3)
+
+    async def run():
+        answer, usage = await backend.complete("model", MESSAGES)
+        chunks = [chunk async for chunk in backend.stream("model", MESSAGES)]
+        return answer, usage, chunks
+
+    answer, usage, chunks = asyncio.run(run())
+
+    assert answer.role == RoleEnum.ASSISTANT
+    assert answer.content == "Which colour is"
+    assert chunks[0].role == RoleEnum.ASSISTANT
+    assert "".join(chunk.content or "" for chunk in chunks).strip() == answer.content
+    assert chunks[-1].usage == usage
+    assert usage["completion_tokens"] == 3
@@ -0,0 +1,212 @@
+import json
+import os
+
+import pytest
+
+from fRAGme.util.v1 import chroma_handler
+from fRAGme.util.v1.chroma_handler import database_path, validate_identifier
+from fRAGme.util.v1.errors import InvalidInputError
+from fRAGme.util.v1.store_manifest import read_manifest
+
+
+def add_texts(client, identifier: str, *texts: str):
+    response = client.post(
+        "/data/v1/add_texts",
+        json={
+            "identifier": identifier,
+            "texts": [
+                {"text": text, "metadata": {"n": i}} for i, text in enumerate(texts)
+            ],
+        },
+    )
+    assert response.status_code == 200
+
+
+def get_texts(client, identifier: str, **kwargs) -> dict:
+    response = client.post(
+        "/data/v1/get_texts", json={"identifier": identifier, **kwargs}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_get_texts_in_pages(client, identifier):
+    add_texts(client, identifier, *(f"text {i}" for i in range(5)))
+    everything = get_texts(client, identifier)["documents"]
+    assert sorted(text["text"] for text in everything.values()) == [
+        f"text {i}" for i in range(5)
+    ]
+
+    pages, offset = [], 0
+    while offset is not None:
+        page = get_texts(client, identifier, offset=offset, limit=2)
+        pages.append(page["documents"])
+        offset = page.get("next_offset")
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert {id_: text for page in pages for id_, text in page.items()} == everything
+
+
+@pytest.mark.parametrize(
+    "fields, keys",
+    [("ids", set()), ("metadata", {"metadata"}), ("all", {"text", "metadata"})],
+)
+def test_get_texts_fields(client, identifier, fields, keys):
+    add_texts(client, identifier, "a", "b")
+
+    documents = get_texts(client, identifier, fields=fields)["documents"]
+
+    assert len(documents) == 2
+    assert all(set(text) == keys for text in documents.values())
+
+
+def test_get_texts_by_ids(client, identifier):
+    add_texts(client, identifier, "a", "b", "c")
+    ids = sorted(get_texts(client, identifier, fields="ids")["documents"])
+
+    first = get_texts(client, identifier, ids=ids[:2], limit=1)
+    second = get_texts(client, identifier, ids=ids[:2], offset=first["next_offset"])
+    assert sorted([*first["documents"], *second["documents"]]) == ids[:2]
+    assert "next_offset" not in second
+
+
+def test_export_texts(client, identifier):
+    add_texts(client, identifier, *(f"text {i}" for i in range(5)))
+    everything = get_texts(client, identifier)["documents"]
+
+    response = client.post(
+        "/data/v1/export_texts", json={"identifier": identifier, "page_size": 2}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {line.pop("id"): line for line in lines} == everything
+
+
+def test_export_text_ids(client, identifier):
+    add_texts(client, identifier, "a", "b")
+
+    response = client.post(
+        "/data/v1/export_texts", json={"identifier": identifier, "fields": "ids"}
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [set(line) for line in lines] == [{"id"}, {"id"}]
+
+
+@pytest.mark.parametrize("endpoint", ["get_texts", "export_texts"])
+def test_texts_of_unknown_database(client, identifier, endpoint):
+    response = client.post(f"/data/v1/{endpoint}", json={"identifier": identifier})
+
+    assert response.status_code == 404
+    assert not os.path.isdir(database_path(identifier))
+
+
+def create_database(client, identifier: str, **settings):
+    return client.post(
+        "/data/v1/create_database", json={"identifier": identifier, **settings}
+    )
+
+
+def test_create_database(client, identifier):
+    response = create_database(
+        client, identifier, embedding_backend="hash", embedding_model="hash-64"
+    )
+    assert response.status_code == 200
+    assert response.json()["manifest"]["embedding_dimension"] == 64
+
+    assert create_database(client, identifier).status_code == 200
+    assert (
+        create_database(client, identifier, embedding_backend="hash").status_code == 200
+    )
+    response = create_database(client, identifier, llm_model="gpt-4o")
+    assert response.status_code == 200
+    assert response.json()["manifest"]["llm_model"] == "gpt-4o"
+    response = create_database(client, identifier, embedding_model="hash-32")
+    assert response.status_code == 409
+
+
+def test_create_openai_database_offline(client, identifier):
+    # The tests have no OpenAI access, so nothing may be embedded.
+    response = create_database(client, identifier, embedding_backend="openai")
+
+    assert response.status_code == 200
+    manifest = response.json()["manifest"]
+    assert manifest["embedding_model"] == "text-embedding-3-large"
+    assert manifest["embedding_dimension"] == 3072
+
+
+def test_unknown_dimension_is_recorded_when_opened(client, identifier, monkeypatch):
+    monkeypatch.setattr(chroma_handler, "known_dimension", lambda *args: None)
+
+    response = create_database(
+        client, identifier, embedding_backend="hash", embedding_model="hash-48"
+    )
+
+    assert response.json()["manifest"]["embedding_dimension"] == 48
+    assert read_manifest(database_path(identifier)).embedding_dimension == 48
+
+
+def test_no_database_is_created_at_startup(client):
+    assert "base" not in client.get("/data/v1/get_databases").json()["databases"]
+
+
+@pytest.mark.parametrize(
+    "identifier", ["p", "-abc", "abc.", "a..b", "a/b", "a b", "127.0.0.1", "a" * 513]
+)
+def test_invalid_identifiers(client, identifier):
+    with pytest.raises(InvalidInputError):
+        validate_identifier(identifier)
+
+    texts = {"identifier": identifier, "texts": [{"text": "the pump is blue"}]}
+    for endpoint in ["add_texts", "add_texts_job"]:
+        response = client.post(f"/data/v1/{endpoint}", json=texts)
+        assert response.status_code == 400, endpoint
+    assert create_database(client, identifier).status_code == 400
+    assert not os.path.exists(database_path(identifier))
+    assert identifier not in client.get("/data/v1/get_databases").json()["databases"]
+
+
+@pytest.mark.parametrize("identifier", ["abc", "my_db-1.2", "A" * 512])
+def test_valid_identifiers(identifier):
+    validate_identifier(identifier)
+
+
+def test_update_texts(client, identifier):
+    add_texts(client, identifier, "a", "b", "c")
+    ids = {
+        text["text"]: id_
+        for id_, text in get_texts(client, identifier)["documents"].items()
+    }
+
+    response = client.put(
+        "/data/v1/update_texts",
+        json={
+            "identifier": identifier,
+            "updates": {
+                ids["a"]: {"new_text": "A", "new_metadata": {"tag": "new"}},
+                ids["b"]: {"new_text": "b", "new_metadata": {"tag": "same"}},
+                ids["c"]: {"new_metadata": {"n": 7}},
+                "missing": {"new_text": "x", "new_metadata": {}},
+            },
+        },
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["outcomes"] == {
+        ids["a"]: "reembedded",
+        ids["b"]: "metadata_only",
+        ids["c"]: "metadata_only",
+        "missing": "not_found",
+    }
+    assert body["stats"]["chunks"] == 1
+    texts = get_texts(client, identifier)["documents"]
+    assert len(texts) == 3
+    assert texts[ids["a"]]["text"] == "A"
+    assert texts[ids["a"]]["metadata"]["tag"] == "new"
+    # Metadata that is not replaced is kept.
+    assert texts[ids["a"]]["metadata"]["n"] == 0
+    assert texts[ids["b"]]["metadata"]["tag"] == "same"
+    assert texts[ids["c"]]["text"] == "c"
+    assert texts[ids["c"]]["metadata"]["n"] == 7
@@ -0,0 +1,52 @@
+from fRAGme.util.v1.embedding_backends import HashEmbeddings
+from fRAGme.util.v1.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(HashEmbeddings):
+    def __init__(self):
+        super().__init__("hash-16")
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.texts.append(text)
+        return super().embed_query(text)
+
+
+def test_texts_are_embedded_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings, "hash-16", cache)
+
+    first = cached.embed_documents(["a", "b", "a"])
+    assert cached.embed_documents(["b", "a"]) == [first[1], first[0]]
+    assert cached.embed_query("a") == first[0]
+    assert embeddings.texts == ["a", "b"]
+    assert cache.stats()["hits"] == 3
+
+
+def test_entries_are_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    embeddings = CountingEmbeddings()
+    CachedEmbeddings(embeddings, "hash-16", cache).embed_documents(["a"])
+    CachedEmbeddings(embeddings, "other", cache).embed_documents(["a"])
+
+    assert embeddings.texts == ["a", "a"]
+
+
+def test_cache_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, max_entries=2)
+    cached = CachedEmbeddings(CountingEmbeddings(), "hash-16", cache)
+    cached.embed_documents(["a", "b"])
+    cached.embed_documents(["c"])
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+    embeddings = CountingEmbeddings()
+    reopened = CachedEmbeddings(embeddings, "hash-16", EmbeddingCache(path))
+    reopened.embed_documents(["c"])
+    assert embeddings.texts == []
@@ -0,0 +1,117 @@
+from typing import List
+
+import httpx
+import openai
+import pytest
+from langchain_core.documents import Document
+
+from fRAGme.util.v1 import embedding_pipeline
+from fRAGme.util.v1.embedding_pipeline import EmbeddingPipeline
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+def rate_limit(retry_after: str | None = None) -> openai.RateLimitError:
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=REQUEST)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeEmbeddings:
+    def __init__(self, failures: List[Exception]):
+        self.failures = failures
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return [[float(len(text))] for text in texts]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.ids = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.ids.extend(ids)
+
+
+class FakeVectorStore:
+    def __init__(self, *failures: Exception):
+        self.embeddings = FakeEmbeddings(list(failures))
+        self._collection = FakeCollection()
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> List[float]:
+    sleeps = []
+    monkeypatch.setattr(embedding_pipeline.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def documents(count: int) -> List[Document]:
+    return [Document(page_content=f"chunk {i}") for i in range(count)]
+
+
+def ingest(vector_store, count: int, **kwargs) -> EmbeddingPipeline:
+    committed = []
+    with EmbeddingPipeline(
+        vector_store,
+        on_commit=lambda ids, documents: committed.extend(ids),
+        **kwargs,
+    ) as pipeline:
+        pipeline.add(documents(count), [f"id-{i}" for i in range(count)])
+    assert sorted(committed) == sorted(vector_store._collection.ids)
+    return pipeline
+
+
+def test_batches(sleeps):
+    vector_store = FakeVectorStore()
+    pipeline = ingest(vector_store, 5, batch_size=2)
+
+    assert sorted(vector_store._collection.ids) == [f"id-{i}" for i in range(5)]
+    assert pipeline.stats.chunks == 5
+    assert pipeline.stats.batches == vector_store.embeddings.calls == 3
+    assert pipeline.stats.retries == 0
+    assert sleeps == []
+
+
+def test_rate_limits_honour_retry_after(sleeps):
+    vector_store = FakeVectorStore(rate_limit("2"), rate_limit("0"))
+    pipeline = ingest(vector_store, 3, concurrency=4)
+
+    assert len(vector_store._collection.ids) == 3
+    assert pipeline.stats.retries == 2
+    assert sleeps == [2.0, 0.0]
+    # Two rate limits halve the batches in flight twice, the success adds one.
+    assert pipeline._limit.limit == 2
+
+
+def test_transient_errors_back_off_exponentially(sleeps):
+    vector_store = FakeVectorStore(
+        *(openai.APIConnectionError(request=REQUEST) for _ in range(3))
+    )
+    pipeline = ingest(vector_store, 1)
+
+    assert pipeline.stats.retries == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0.5 * 2**attempt <= delay <= 1.5 * 2**attempt
+
+
+def test_gives_up_after_max_retries(sleeps):
+    vector_store = FakeVectorStore(*(rate_limit("0") for _ in range(3)))
+
+    with pytest.raises(openai.RateLimitError):
+        ingest(vector_store, 1, max_retries=2)
+    assert vector_store.embeddings.calls == 3
+    assert vector_store._collection.ids == []
+
+
+def test_other_errors_are_not_retried(sleeps):
+    vector_store = FakeVectorStore(ValueError("bad input"))
+
+    with pytest.raises(ValueError):
+        ingest(vector_store, 1)
+    assert vector_store.embeddings.calls == 1
+    assert sleeps == []
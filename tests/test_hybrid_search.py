@@ -0,0 +1,74 @@
+import pytest
+
+from fRAGme.models.v1.data import Text
+from fRAGme.util.v1 import chroma_handler
+from fRAGme.util.v1.chroma_handler import (
+    _fuse,
+    add_texts,
+    delete_texts,
+    get_vector_store,
+    search_snippets,
+)
+from fRAGme.util.v1.keyword_index import KeywordIndex, keyword_query
+
+
+def test_keyword_query():
+    assert keyword_query("Error E-1042 in max_open?") == (
+        '"error" OR "e-1042" OR "in" OR "max_open"'
+    )
+    assert keyword_query('say "hi"') == '"say" OR "hi"'
+    assert keyword_query("?!") is None
+
+
+def test_keyword_index(tmp_path):
+    with KeywordIndex(str(tmp_path)) as index:
+        assert not index.ready
+        index.rebuild([(["1", "2"], ["pump failure", "valve failure"])])
+        assert index.ready
+        index.add(["3"], ["error E-1042 of the pump"])
+
+        assert [id_ for id_, _ in index.search("E-1042", 10)] == ["3"]
+        assert {id_ for id_, _ in index.search("pump", 10)} == {"1", "3"}
+
+        index.remove(["3"])
+        assert index.search("E-1042", 10) == []
+        assert index.search("?", 10) == []
+
+
+def test_fuse():
+    fused = _fuse([["a", "b", "c"], ["c", "a"]], 2)
+    assert [id_ for id_, _ in fused] == ["a", "c"]
+    assert fused[0][1] > fused[1][1]
+
+
+@pytest.fixture
+def texts(identifier):
+    add_texts(
+        [Text(text=f"general notes about pumps, part {i}") for i in range(20)]
+        + [Text(text="error code E-1042 means the pump overheated")],
+        identifier,
+    )
+    return identifier
+
+
+def query(identifier: str, text: str, k: int):
+    embedding = get_vector_store(identifier).embeddings.embed_query(text)
+    return search_snippets(identifier, embedding, k, text)
+
+
+def test_keyword_matches_are_fused(texts, monkeypatch):
+    snippets = query(texts, "E-1042", 3)
+
+    assert len(snippets) == 3
+    assert snippets[0].text == "error code E-1042 means the pump overheated"
+    assert snippets[0].score > snippets[1].score
+
+    monkeypatch.setattr(chroma_handler, "HYBRID_SEARCH", False)
+    assert len(query(texts, "E-1042", 3)) == 3
+
+
+def test_deleted_texts_are_not_matched(texts):
+    [snippet] = query(texts, "E-1042", 1)
+    delete_texts(texts, [snippet.id])
+
+    assert all("E-1042" not in s.text for s in query(texts, "E-1042", 5))
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+import pytest
+
+from fRAGme.models.v1.data import JobStatusEnum, Text
+from fRAGme.util.v1.chroma_handler import get_texts, vector_stores
+from fRAGme.util.v1.jobs import FINISHED_STATES, KEPT_FILENAMES, JobManager, text_ids
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=1)
+    manager.start()
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(manager, job_id, states=FINISHED_STATES, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = manager.get(job_id)
+        if job.status in states:
+            return job
+        assert time.monotonic() < deadline, job
+        time.sleep(0.02)
+
+
+def texts(count: int):
+    return [Text(text=f"text number {i}") for i in range(count)]
+
+
+def test_texts_job(manager, identifier):
+    job = manager.submit_texts(identifier, texts(5))
+    job = wait_for(manager, job.id)
+
+    assert job.status == JobStatusEnum.SUCCEEDED
+    assert job.processed == job.total == 5
+    assert set(get_texts(identifier)) == set(text_ids(job.id, 0, 5))
+    job_dir = os.path.join(manager.path, job.id)
+    assert set(os.listdir(job_dir)) <= set(KEPT_FILENAMES)
+    assert manager.list(identifier=identifier) == [job]
+    assert manager.list(identifier=identifier, status=JobStatusEnum.FAILED) == []
+
+
+def test_resumed_job_does_not_duplicate_texts(manager, identifier):
+    job = wait_for(manager, manager.submit_texts(identifier, texts(5)).id)
+    manager.shutdown()
+
+    # A process dying after committing a batch, but before recording it.
+    job_dir = os.path.join(manager.path, job.id)
+    with open(os.path.join(job_dir, "texts.json"), "w", encoding="utf-8") as f:
+        json.dump([text.model_dump() for text in texts(5)], f)
+    with open(os.path.join(job_dir, "job.json"), "w", encoding="utf-8") as f:
+        f.write(
+            job.model_copy(
+                update={"status": JobStatusEnum.RUNNING, "processed": 0}
+            ).model_dump_json()
+        )
+    manager.start()
+
+    assert wait_for(manager, job.id).status == JobStatusEnum.SUCCEEDED
+    assert len(get_texts(identifier)) == 5
+
+
+def test_cancel(manager, identifier):
+    with vector_stores.exclusive(identifier):
+        running = manager.submit_texts(identifier, texts(1))
+        wait_for(manager, running.id, [JobStatusEnum.RUNNING])
+        pending = manager.submit_texts(identifier, texts(1))
+
+        assert manager.cancel(pending.id).status == JobStatusEnum.CANCELLED
+        assert manager.cancel(running.id).cancel_requested
+
+    # The running job stops after its current batch.
+    assert wait_for(manager, running.id).status == JobStatusEnum.CANCELLED
+    assert manager.get(pending.id).status == JobStatusEnum.CANCELLED
+    assert set(get_texts(identifier)) == set(text_ids(running.id, 0, 1))
+
+
+def test_unknown_jobs(manager):
+    for job_id in ["missing", "../jobs", ".hidden", ""]:
+        with pytest.raises(KeyError):
+            manager.get(job_id)
+        with pytest.raises(KeyError):
+            manager.cancel(job_id)
@@ -0,0 +1,84 @@
+import re
+
+from fRAGme.util.v1.metrics import Counter, Histogram
+
+
+def sample(metrics: str, name: str, **labels: str) -> float | None:
+    """Return the value of a sample with the given labels, if any."""
+    for line in metrics.splitlines():
+        match = re.fullmatch(r"(\w+)(?:\{(.*)\})? (\S+)", line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return None
+
+
+def test_counter_samples():
+    counter = Counter("requests", "Requests.")
+    counter.inc(path='/a"b')
+    counter.inc(2, path='/a"b')
+    counter.inc()
+
+    assert counter.samples() == ["requests_total 1", 'requests_total{path="/a\\"b"} 3']
+
+
+def test_histogram_samples():
+    histogram = Histogram("latency", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert histogram.samples() == [
+        'latency_bucket{le="0.1"} 1',
+        'latency_bucket{le="1"} 2',
+        'latency_bucket{le="+Inf"} 3',
+        "latency_sum 5.55",
+        "latency_count 3",
+    ]
+
+
+def test_metrics_endpoint(client, identifier):
+    texts = {"identifier": identifier, "texts": [{"text": "the pump is blue"}]}
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+    response = client.post(
+        "/cmd/v1/ask_question",
+        json={
+            "identifier": identifier,
+            "info": {"chat_history": [], "question": "pump?"},
+        },
+    )
+    assert response.status_code == 200
+    assert re.search(r"\bllm;dur=\d", response.headers["server-timing"])
+    assert re.search(r"\btotal;dur=\d", response.headers["server-timing"])
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    metrics = response.text
+    assert sample(metrics, "fragme_stage_seconds_count", stage="llm") >= 1
+    assert sample(metrics, "fragme_ingested_chunks_total") >= 1
+    assert (
+        sample(
+            metrics,
+            "fragme_request_seconds_count",
+            method="POST",
+            path="/cmd/v1/ask_question",
+            status="200",
+        )
+        >= 1
+    )
+    assert sample(metrics, "fragme_cache_entries", cache="answer") is not None
+
+
+def test_failed_requests_are_counted(client, identifier):
+    client.post("/data/v1/get_pdfs", json={"identifier": identifier})
+    client.get("/no/such/path")
+
+    metrics = client.get("/metrics").text
+
+    labels = {"status": "404", "error": "DatabaseNotFoundError"}
+    assert sample(metrics, "fragme_errors_total", **labels) >= 1
+    assert sample(metrics, "fragme_request_seconds_count", path="unmatched") >= 1
@@ -0,0 +1,229 @@
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import pytest
+
+from fRAGme.util.v1 import pdf_parser
+from fRAGme.util.v1.chroma_handler import database_path, get_texts, vector_stores
+from fRAGme.util.v1.source_index import SOURCE_INDEX_FILENAME
+from fRAGme.util.v1.pdf_parser import parse_pdfs
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """Build a minimal PDF with one line of text per page."""
+    count = len(pages)
+    font = 3 + 2 * count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * page} 0 R" for page in range(count)), count
+        ),
+    ]
+    for page, text in enumerate(pages):
+        content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {4 + 2 * page} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return pdf
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        yield executor
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch) -> str:
+    """A PDF of ten pages on disk, parsed in page ranges of three pages."""
+    monkeypatch.setattr(pdf_parser, "PDF_PAGES_PER_TASK", 3)
+    path = tmp_path / "book.pdf"
+    path.write_bytes(make_pdf([f"Page {page} of the book" for page in range(10)]))
+    return str(path)
+
+
+def pages(parsed):
+    return {
+        filename: [
+            (document.metadata["page"], document.page_content) for document in documents
+        ]
+        for filename, documents in parsed
+    }
+
+
+def test_parse_pdfs_in_pool(executor, book):
+    parsed = list(parse_pdfs([("book.pdf", book)], executor))
+
+    assert pages(parsed) == {
+        "book.pdf": [(page, f"Page {page} of the book") for page in range(10)]
+    }
+    _, documents = parsed[0]
+    assert {document.metadata["source"] for document in documents} == {"book.pdf"}
+    assert {document.metadata["total_pages"] for document in documents} == {10}
+
+
+def test_parse_pdfs_in_calling_thread(executor, book, monkeypatch):
+    sources = [("book.pdf", book), ("other.pdf", book)]
+    in_pool = pages(parse_pdfs(sources, executor))
+
+    monkeypatch.setattr(pdf_parser, "PDF_PARSE_WORKERS", 0)
+    assert pdf_parser.get_pdf_executor() is None
+    assert pages(parse_pdfs(sources)) == in_pool
+
+
+@pytest.fixture
+def upload(book) -> bytes:
+    with open(book, "rb") as f:
+        return f.read()
+
+
+def spooled(content: bytes, max_size: int) -> tempfile.SpooledTemporaryFile:
+    stream = tempfile.SpooledTemporaryFile(max_size=max_size)
+    stream.write(content)
+    return stream
+
+
+def test_parse_streams_in_pool(executor, book, upload, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    expected = pages(parse_pdfs([("book.pdf", book)], executor))
+    in_memory = spooled(upload, max_size=len(upload) + 1)
+    rolled = spooled(upload, max_size=1)
+    assert in_memory.name is None and rolled.name is not None
+
+    for stream in [io.BytesIO(upload), in_memory, rolled, open(book, "rb")]:
+        with stream:
+            assert pages(parse_pdfs([("book.pdf", stream)], executor)) == expected
+    # Only the upload spooled to a file without a name was copied, and the
+    # copy is gone.
+    assert os.listdir(tmp_path) == ["book.pdf"]
+
+
+def test_parse_streams_in_memory_without_copies(executor, upload, monkeypatch):
+    def spill(stream):
+        raise AssertionError("streams held in memory are not copied")
+
+    monkeypatch.setattr(pdf_parser, "_spill", spill)
+    parsed = pages(parse_pdfs([("book.pdf", io.BytesIO(upload))], executor))
+
+    assert [page for page, _ in parsed["book.pdf"]] == list(range(10))
+
+
+def add_pdf(client, identifier: str, filename: str, pages: List[str]) -> dict:
+    response = client.post(
+        "/data/v1/add_pdfs",
+        params={"identifier": identifier},
+        files=[("pdfs", (filename, make_pdf(pages), "application/pdf"))],
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["stats"]
+
+
+def test_reingest_pdf_revisions(client, identifier):
+    stats = add_pdf(client, identifier, "manual.pdf", ["Intro", "Pumps", "Valves"])
+    assert (stats["added"], stats["skipped"], stats["removed"]) == (3, 0, 0)
+    assert stats["chunks"] == 3
+
+    # An unchanged upload embeds nothing.
+    stats = add_pdf(client, identifier, "manual.pdf", ["Intro", "Pumps", "Valves"])
+    assert (stats["added"], stats["skipped"], stats["removed"]) == (0, 3, 0)
+    assert stats["chunks"] == 0
+
+    # Only the rewritten page is embedded, the dropped page's chunk is removed
+    # and the moved page keeps its chunk with its new page number.
+    stats = add_pdf(client, identifier, "manual.pdf", ["Intro", "Valves", "Hoses"])
+    assert (stats["added"], stats["skipped"], stats["removed"]) == (1, 2, 1)
+    assert stats["chunks"] == 1
+    texts = get_texts(identifier).values()
+    assert sorted((text.metadata["page"], text.text) for text in texts) == [
+        (0, "Intro"),
+        (1, "Valves"),
+        (2, "Hoses"),
+    ]
+
+
+def test_reingest_keeps_other_pdfs(client, identifier):
+    add_pdf(client, identifier, "a.pdf", ["Shared page", "Only in a"])
+    stats = add_pdf(client, identifier, "b.pdf", ["Shared page"])
+    assert (stats["added"], stats["skipped"], stats["removed"]) == (1, 0, 0)
+
+    stats = add_pdf(client, identifier, "a.pdf", ["Shared page"])
+    assert (stats["added"], stats["skipped"], stats["removed"]) == (0, 1, 1)
+    sources = sorted(text.metadata["source"] for text in get_texts(identifier).values())
+    assert sources == ["a.pdf", "b.pdf"]
+
+
+def get_pdfs(client, identifier: str):
+    return client.post("/data/v1/get_pdfs", json={"identifier": identifier})
+
+
+def test_get_and_delete_pdfs(client, identifier):
+    add_pdf(client, identifier, "a.pdf", ["First", "Second"])
+    add_pdf(client, identifier, "b.pdf", ["Third"])
+    response = client.post(
+        "/data/v1/add_texts",
+        json={"identifier": identifier, "texts": [{"text": "not from a PDF"}]},
+    )
+    assert response.status_code == 200
+    assert sorted(get_pdfs(client, identifier).json()["documents"]) == [
+        "a.pdf",
+        "b.pdf",
+    ]
+
+    response = client.request(
+        "DELETE",
+        "/data/v1/delete_pdfs",
+        json={"identifier": identifier, "pdf_names": ["a.pdf"]},
+    )
+    assert response.status_code == 200
+    assert get_pdfs(client, identifier).json()["documents"] == ["b.pdf"]
+    assert sorted(text.text for text in get_texts(identifier).values()) == [
+        "Third",
+        "not from a PDF",
+    ]
+
+
+def test_source_index_is_rebuilt(client, identifier):
+    add_pdf(client, identifier, "a.pdf", ["First"])
+    with vector_stores.exclusive(identifier):
+        os.remove(os.path.join(database_path(identifier), SOURCE_INDEX_FILENAME))
+
+    assert get_pdfs(client, identifier).json()["documents"] == ["a.pdf"]
+
+
+def test_get_pdfs_of_unknown_database(client, identifier):
+    assert get_pdfs(client, identifier).status_code == 404
+    assert not os.path.isdir(database_path(identifier))
+
+
+def test_pdf_without_text(client, identifier):
+    response = client.post(
+        "/data/v1/add_pdfs",
+        params={"identifier": identifier},
+        files=[("pdfs", ("scan.pdf", make_pdf([""]), "application/pdf"))],
+    )
+
+    assert response.status_code == 400
+    assert "no text pages" in response.json()["detail"]
@@ -0,0 +1,88 @@
+import logging
+
+from fRAGme.models.v1.cmd import ChatAction, Question, RoleEnum, Snippet
+from fRAGme.util.v1 import embedding_pipeline
+from fRAGme.util.v1.embedding_pipeline import count_tokens
+from fRAGme.util.v1.prompt_builder import PROMPT_ENCODING, build_prompt
+
+PAGE = " ".join(f"word{i}" for i in range(100))
+
+
+def snippet(id_: str, text: str, score: float, **metadata) -> Snippet:
+    return Snippet(id=id_, text=text, score=score, metadata=metadata)
+
+
+def question(**kwargs) -> Question:
+    kwargs.setdefault("chat_history", [])
+    return Question(question="What is it?", **kwargs)
+
+
+def test_snippets_are_packed_best_first_into_the_budget():
+    snippets = [snippet(str(i), f"{i} {PAGE}", score=i / 10) for i in range(10)]
+
+    messages, usage = build_prompt(question(max_prompt_tokens=1000), snippets)
+
+    assert usage.budget == 1000
+    assert usage.tokens <= 1000
+    assert usage.snippets + usage.over_budget == 10
+    assert usage.over_budget > 0
+    prompt = messages[-1]["content"]
+    kept = [i for i in range(10) if f"Text: {i} word0" in prompt]
+    assert kept == list(range(10 - usage.snippets, 10))
+    # Blocks are counted one by one, so the total may be off by a token each.
+    total = sum(count_tokens(m["content"], PROMPT_ENCODING) + 4 for m in messages)
+    assert abs(usage.tokens - total) <= usage.snippets
+
+
+def test_history_and_base_prompt_count_against_the_budget():
+    history = [ChatAction(role=RoleEnum.USER, content=PAGE)] * 5
+    snippets = [snippet(str(i), f"{i} {PAGE}", score=1.0) for i in range(10)]
+
+    _, alone = build_prompt(question(max_prompt_tokens=1500), snippets)
+    messages, usage = build_prompt(
+        question(max_prompt_tokens=1500, chat_history=history), snippets
+    )
+
+    assert messages[0]["role"] == RoleEnum.SYSTEM
+    assert usage.tokens <= 1500
+    assert usage.snippets < alone.snippets
+
+
+def test_duplicates_and_overlaps_are_removed():
+    first, second = PAGE[:400], PAGE[300:]
+    snippets = [
+        snippet("a", first, 0.9, source="a.pdf", page=1),
+        snippet("b", first, 0.8, source="a.pdf", page=1),
+        snippet("c", second, 0.7, source="a.pdf", page=1, secret="x"),
+        snippet("d", PAGE[350:], 0.6, source="b.pdf", page=1),
+    ]
+
+    messages, usage = build_prompt(question(), snippets)
+
+    assert usage.deduplicated == 1
+    assert usage.snippets == 3
+    prompt = messages[-1]["content"]
+    # The chunk overlapping the better one of the same page starts where it ends.
+    assert f"Text: {PAGE[400:].strip()}\n" in prompt
+    # Chunks of other pages are kept whole.
+    assert f"Text: {PAGE[350:]}\n" in prompt
+    assert "secret" not in prompt
+    assert "Metadata: {'source': 'a.pdf', 'page': 1}" in prompt
+
+
+def test_token_count_fallback_is_logged(monkeypatch, caplog):
+    def get_encoding(name):
+        raise OSError("offline")
+
+    monkeypatch.setattr(embedding_pipeline.tiktoken, "get_encoding", get_encoding)
+    embedding_pipeline._encoding.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger=embedding_pipeline.__name__):
+            assert count_tokens("x" * 40, "missing") == 11
+            assert count_tokens("x" * 40, "missing") == 11
+    finally:
+        embedding_pipeline._encoding.cache_clear()
+
+    [record] = caplog.records
+    assert "missing" in record.getMessage()
+    assert "offline" in record.getMessage()
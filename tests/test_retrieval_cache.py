@@ -0,0 +1,47 @@
+from fRAGme.models.v1.cmd import Question
+from fRAGme.models.v1.data import Text
+from fRAGme.util.v1.chroma_handler import add_texts, retrieve_snippets
+from fRAGme.util.v1.retrieval_cache import RetrievalCache, retrieval_cache
+
+
+def question(text: str, **kwargs) -> Question:
+    return Question(question=text, chat_history=[], **kwargs)
+
+
+def test_retrieval_cache_versions():
+    cache = RetrievalCache(max_entries=1)
+    cache.put("a", "Question", 2, 1, [("id", 0.5)])
+
+    assert cache.get("a", "question ", 2, 1) == [("id", 0.5)]
+    assert cache.get("a", "question", 3, 1) is None
+    assert cache.get("a", "question", 2, 2) is None
+    assert cache.get("a", "question", 2, 1) is None
+    assert cache.stats()["stale"] == 1
+
+    cache.put("a", "q1", 2, 1, [])
+    cache.put("a", "q2", 2, 1, [])
+    assert cache.get("a", "q1", 2, 1) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_retrieval_results_are_dropped_after_writes(identifier):
+    add_texts([Text(text="the reactor uses cooling pumps")], identifier)
+    ask = question("cooling pumps", k_similar_text_snippets=5)
+
+    assert [s.text for s in retrieve_snippets(ask, identifier)] == [
+        "the reactor uses cooling pumps"
+    ]
+    hits = retrieval_cache.stats()["hits"]
+    retrieve_snippets(ask, identifier)
+    assert retrieval_cache.stats()["hits"] == hits + 1
+
+    add_texts([Text(text="spare cooling pumps are stored offsite")], identifier)
+    assert len(retrieve_snippets(ask, identifier)) == 2
+
+
+def test_cache_stats(client):
+    response = client.get("/cmd/v1/get_cache_stats")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"embedding", "answer", "retrieval"}
+    assert response.json()["retrieval"] == retrieval_cache.stats()
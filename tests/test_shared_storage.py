@@ -0,0 +1,88 @@
+"""
+Tests of several processes sharing the databases on a Chroma server.
+
+The other process is a real Python process writing to the same Chroma server
+and ``DATA_PATH``.
+"""
+
+import os
+import subprocess
+import sys
+
+from fRAGme.models.v1.cmd import ChatAction, Question, RoleEnum
+from fRAGme.util.v1.answer_cache import answer_cache
+from fRAGme.util.v1.chroma_client import get_chroma_client
+from fRAGme.util.v1.chroma_handler import (
+    add_texts,
+    database_path,
+    delete_databases,
+    retrieve_snippets,
+    write_version,
+)
+from fRAGme.models.v1.data import Text
+
+OTHER_PROCESS = """
+import sys
+from fRAGme.models.v1.data import Text
+from fRAGme.util.v1.chroma_handler import add_texts, delete_databases
+
+identifier, recreate, text = sys.argv[1:]
+if recreate == "recreate":
+    delete_databases([identifier])
+add_texts([Text(text=text)], identifier)
+"""
+
+
+def other_process(environment, identifier: str, text: str, recreate: bool = False):
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            OTHER_PROCESS,
+            identifier,
+            "recreate" if recreate else "add",
+            text,
+        ],
+        env=environment,
+        check=True,
+        timeout=120,
+    )
+
+
+def texts(identifier: str, question: str = "pumps"):
+    ask = Question(question=question, chat_history=[], k_similar_text_snippets=10)
+    return sorted(snippet.text for snippet in retrieve_snippets(ask, identifier))
+
+
+def test_writes_of_other_processes_invalidate_caches(http_mode, identifier):
+    add_texts([Text(text="first note on pumps")], identifier)
+    assert texts(identifier) == ["first note on pumps"]
+    ask = Question(question="pumps?", chat_history=[])
+    answer = ChatAction(role=RoleEnum.ASSISTANT, content="first")
+    answer_cache.put(identifier, ask, answer, None, answer_cache.generation(identifier))
+    version = write_version(identifier)
+
+    other_process(http_mode, identifier, "second note on pumps")
+
+    assert write_version(identifier) > version
+    assert answer_cache.get(identifier, ask) is None
+    assert texts(identifier) == ["first note on pumps", "second note on pumps"]
+
+
+def test_databases_recreated_by_other_processes_are_reopened(http_mode, identifier):
+    add_texts([Text(text="old note on pumps")], identifier)
+    assert texts(identifier) == ["old note on pumps"]
+
+    other_process(http_mode, identifier, "new note on pumps", recreate=True)
+
+    assert texts(identifier) == ["new note on pumps"]
+
+
+def test_delete_removes_the_collection(http_mode, identifier):
+    add_texts([Text(text="note on pumps")], identifier)
+    assert identifier in [c.name for c in get_chroma_client().list_collections()]
+
+    delete_databases([identifier])
+
+    assert identifier not in [c.name for c in get_chroma_client().list_collections()]
+    assert not os.path.isdir(database_path(identifier))
@@ -0,0 +1,58 @@
+import os
+import time
+
+from fRAGme.util.v1.chroma_handler import database_path
+from fRAGme.util.v1.tombstones import TombstoneReaper, bury, tombstone_path
+
+
+def test_bury_and_reap(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_PATH", str(tmp_path))
+    directory = tmp_path / "db"
+    directory.mkdir()
+    (directory / "data.bin").write_bytes(b"x" * 1024)
+
+    target = bury(str(directory))
+
+    assert not directory.exists()
+    assert os.path.dirname(target) == tombstone_path()
+    assert os.path.basename(target).startswith("db-")
+    assert TombstoneReaper().reap() == 1
+    assert os.listdir(tombstone_path()) == []
+
+
+def test_reaper_removes_tombstones_when_woken(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_PATH", str(tmp_path))
+    reaper = TombstoneReaper(interval=3600)
+    reaper.start()
+    try:
+        directory = tmp_path / "db"
+        directory.mkdir()
+        target = bury(str(directory))
+        reaper.wake()
+        for _ in range(100):
+            if not os.path.exists(target):
+                break
+            time.sleep(0.05)
+        assert not os.path.exists(target)
+    finally:
+        reaper.shutdown()
+
+
+def test_reap_without_tombstones(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_PATH", str(tmp_path))
+    assert TombstoneReaper().reap() == 0
+
+
+def test_deleted_database_stays_deleted(client, identifier):
+    texts = {"identifier": identifier, "texts": [{"text": "the pump is blue"}]}
+    assert client.post("/data/v1/add_texts", json=texts).status_code == 200
+
+    response = client.request(
+        "DELETE", "/data/v1/delete_databases", json={"identifiers": [identifier]}
+    )
+
+    assert response.status_code == 200
+    assert not os.path.exists(database_path(identifier))
+    response = client.post("/data/v1/get_texts", json={"identifier": identifier})
+    assert response.status_code == 404
+    assert not os.path.exists(database_path(identifier))
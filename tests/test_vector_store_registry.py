@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pytest
+
+from fRAGme.util.v1.store_manifest import DatabaseNotFoundError
+from fRAGme.util.v1.vector_store_registry import VectorStoreRegistry
+
+
+class FakeStore:
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self.closed = False
+
+
+class FakeResource:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def close(store):
+    store.closed = True
+
+
+def test_creates_every_store_once():
+    created = []
+
+    def factory(identifier):
+        created.append(identifier)
+        return FakeStore(identifier)
+
+    registry = VectorStoreRegistry(factory, close)
+    stores = []
+    threads = [
+        threading.Thread(target=lambda: stores.append(registry.get("a")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created == ["a"]
+    assert all(store is stores[0] for store in stores)
+    assert registry.stats()["creations"] == 1
+
+
+def test_evicts_least_recently_used():
+    registry = VectorStoreRegistry(FakeStore, close, max_open=2)
+    a = registry.get("a")
+    b = registry.get("b")
+    registry.get("a")
+    registry.get("c")
+
+    assert b.closed and not a.closed
+    assert "b" not in registry and "a" in registry and "c" in registry
+    assert registry.stats()["evictions"] == 1
+
+
+def test_leased_store_is_closed_on_release():
+    registry = VectorStoreRegistry(FakeStore, close, max_open=1)
+    with registry.acquire("a") as a:
+        registry.get("b")
+        registry.get("c")
+        assert not a.closed
+    assert not a.closed
+    registry.sweep()
+    assert registry.stats()["open"] == 1
+
+    with registry.acquire("d") as d:
+        registry.remove("d")
+        assert not d.closed
+    assert d.closed
+
+
+def test_exclusive_closes_the_store_and_holds_back_leases():
+    registry = VectorStoreRegistry(FakeStore, close)
+    a = registry.get("a")
+    entered = threading.Event()
+
+    def lease():
+        with registry.acquire("a") as store:
+            assert store is not a
+        entered.set()
+
+    with registry.exclusive("a"):
+        assert a.closed
+        thread = threading.Thread(target=lease)
+        thread.start()
+        assert not entered.wait(0.2)
+    thread.join()
+    assert entered.is_set()
+
+
+def test_exclusive_times_out_while_leased():
+    registry = VectorStoreRegistry(FakeStore, close)
+    with registry.acquire("a") as a:
+        with pytest.raises(TimeoutError):
+            with registry.exclusive("a", timeout=0.1):
+                pass
+        assert not a.closed
+    assert "a" in registry
+
+
+def test_resources_are_closed_with_their_store():
+    registry = VectorStoreRegistry(FakeStore, close)
+    with registry.acquire("a") as a:
+        resource = registry.resource(a, "index", FakeResource)
+        assert registry.resource(a, "index", FakeResource) is resource
+    assert not resource.closed
+
+    registry.remove("a")
+    assert a.closed and resource.closed
+    with pytest.raises(KeyError):
+        registry.resource(a, "index", FakeResource)
+
+
+def test_stores_that_do_not_exist_are_not_created():
+    registry = VectorStoreRegistry(FakeStore, close, exists=lambda i: i == "a")
+
+    with pytest.raises(DatabaseNotFoundError):
+        with registry.acquire("b", create=False):
+            pass
+    assert "b" not in registry
+    with registry.acquire("a", create=False) as a:
+        assert a.identifier == "a"
+    with registry.acquire("b") as b:
+        assert b.identifier == "b"
+
+
+def test_store_deleted_while_waiting_is_not_created_again():
+    existing = {"a"}
+    created = []
+
+    def factory(identifier):
+        created.append(identifier)
+        return FakeStore(identifier)
+
+    registry = VectorStoreRegistry(factory, close, exists=existing.__contains__)
+    # Holds a reader between its miss and the creation of the store, until a
+    # delete has taken the identifier exclusively.
+    creation_lock = registry._creation_locks.setdefault("a", threading.Lock())
+    creation_lock.acquire()
+    errors = []
+
+    def read():
+        try:
+            with registry.acquire("a", create=False):
+                pass
+        except DatabaseNotFoundError as e:
+            errors.append(e)
+
+    def delete():
+        with registry.exclusive("a"):
+            existing.discard("a")
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    while registry.stats()["misses"] == 0:
+        time.sleep(0.01)
+    deleter = threading.Thread(target=delete)
+    deleter.start()
+    while "a" not in registry._exclusive:
+        time.sleep(0.01)
+    creation_lock.release()
+    reader.join()
+    deleter.join()
+
+    assert created == []
+    assert len(errors) == 1
+    assert "a" not in registry